@@ -1,31 +1,101 @@
-from datetime import datetime, timedelta
-from typing import Optional
-from jose import JWTError, jwt
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple, Optional
+from jose import JWTError, jwk, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
-from database import get_db
+from database import get_async_db
 from schemas import TokenData
-from utils.auth import get_user_by_email, verify_password
+from utils import metrics
+from utils.auth import get_revocations_async, get_user_by_email_async
+from utils.cache import MISSING, TTLCache
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Verified tokens are kept (by SHA-256 digest) until they expire; 0 disables
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# "database" loads the user row on every request; "stateless" trusts the
+# identity claims of a verified token and only checks recent revocations
+AUTH_MODE = os.getenv("AUTH_MODE", "database")
+REVOCATION_CACHE_TTL = float(os.getenv("REVOCATION_CACHE_TTL", "30"))
+
+_revocation_cache = {"loaded_at": None, "users": {}}
+token_cache = TTLCache(maxsize=max(TOKEN_CACHE_SIZE, 1), ttl=ACCESS_TOKEN_EXPIRE_MINUTES * 60)
 
 security = HTTPBearer()
 
+
+class JWTKeys(NamedTuple):
+    algorithm: str
+    signing_key: Optional[jwk.Key]  # None for verify-only deployments
+    verification_key: jwk.Key
+
+
+_keys: Optional[JWTKeys] = None
+
+
+def _read_key(path: Optional[str]):
+    if not path:
+        return None
+    with open(path) as fp:
+        return fp.read()
+
+
+def load_keys():
+    """Read and parse the JWT keys once; called at startup and on first use.
+
+    HS* algorithms use SECRET_KEY. RS*, PS* and ES* algorithms read PEM files
+    from JWT_PRIVATE_KEY_PATH (to issue tokens) and JWT_PUBLIC_KEY_PATH (to
+    verify them; derived from the private key when unset).
+    """
+    global _keys
+    algorithm = os.getenv("ALGORITHM")
+    if not algorithm:
+        raise RuntimeError("ALGORITHM is not set")
+    if algorithm.startswith("HS"):
+        secret = os.getenv("SECRET_KEY")
+        if not secret:
+            raise RuntimeError("SECRET_KEY is not set")
+        signing_key = verification_key = jwk.construct(secret, algorithm)
+    else:
+        private_pem = _read_key(os.getenv("JWT_PRIVATE_KEY_PATH"))
+        public_pem = _read_key(os.getenv("JWT_PUBLIC_KEY_PATH"))
+        if private_pem is None and public_pem is None:
+            raise RuntimeError(f"{algorithm} needs JWT_PRIVATE_KEY_PATH or JWT_PUBLIC_KEY_PATH")
+        signing_key = jwk.construct(private_pem, algorithm) if private_pem else None
+        verification_key = jwk.construct(public_pem, algorithm) if public_pem else signing_key.public_key()
+    _keys = JWTKeys(algorithm, signing_key, verification_key)
+    clear_token_cache()
+    return _keys
+
+
+def get_keys() -> JWTKeys:
+    return _keys or load_keys()
+
+
+def clear_token_cache():
+    token_cache.clear()
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    keys = get_keys()
+    if keys.signing_key is None:
+        raise RuntimeError("No private key configured to sign tokens")
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+        expire = now + timedelta(minutes=15)
+    # iat keeps its microseconds so a token issued right after a revocation
+    # can be told apart from one issued right before it
+    to_encode.update({"exp": expire, "iat": now.replace(tzinfo=timezone.utc).timestamp()})
+    encoded_jwt = jwt.encode(to_encode, keys.signing_key, algorithm=keys.algorithm)
     return encoded_jwt
 
 def verify_access_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
@@ -34,25 +104,94 @@ def verify_access_token(credentials: HTTPAuthorizationCredentials = Depends(secu
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    token = credentials.credentials
+    digest = hashlib.sha256(token.encode()).digest() if TOKEN_CACHE_SIZE > 0 else None
+    if digest is not None:
+        cached = token_cache.get(digest)
+        if cached is not MISSING:
+            metrics.inc("auth_token_cache_total", result="hit")
+            return cached
+        metrics.inc("auth_token_cache_total", result="miss")
+    keys = get_keys()
     try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
+        with metrics.stage("auth_verify"):
+            payload = jwt.decode(token, keys.verification_key, algorithms=[keys.algorithm])
         email: str = payload.get("sub")
         if email is None:
             raise credential_exception
-        token_data = TokenData(email=email)
+        token_data = TokenData(
+            email=email,
+            user_id=payload.get("uid"),
+            first_name=payload.get("first_name"),
+            last_name=payload.get("last_name"),
+            issued_at=payload.get("iat")
+        )
     except JWTError:
         raise credential_exception
+    if digest is not None and isinstance(payload.get("exp"), (int, float)):
+        # Never serve a token from the cache past its own expiry
+        ttl = payload["exp"] - time.time()
+        if ttl > 0:
+            token_cache.set(digest, token_data, ttl=ttl)
     return token_data
 
-async def get_current_user(token: TokenData = Depends(verify_access_token), db: Session = Depends(get_db)):
+async def get_current_user(token: TokenData = Depends(verify_access_token), db: Session = Depends(get_async_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     email: str = token.email  # Use email from TokenData directly
-    user = get_user_by_email(db, email=email)
+    with metrics.stage("auth_user_lookup"):
+        user = await get_user_by_email_async(db, email=email)
     if user is None:
         raise credentials_exception
     return user
 
+
+async def get_recent_revocations(db: Session):
+    """Revocations that can still affect unexpired tokens, refreshed every REVOCATION_CACHE_TTL seconds."""
+    now = time.monotonic()
+    loaded_at = _revocation_cache["loaded_at"]
+    if loaded_at is None or now - loaded_at >= REVOCATION_CACHE_TTL:
+        since = datetime.utcnow() - timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        _revocation_cache["users"] = await get_revocations_async(db, since)
+        _revocation_cache["loaded_at"] = now
+    return _revocation_cache["users"]
+
+def clear_revocation_cache():
+    _revocation_cache["loaded_at"] = None
+    _revocation_cache["users"] = {}
+
+async def is_revoked(token: TokenData, db: Session):
+    """Whether the token was issued before its user's tokens were last revoked."""
+    if token.user_id is None:
+        return False
+    with metrics.stage("auth_revocations"):
+        revoked_at = (await get_recent_revocations(db)).get(token.user_id)
+    if revoked_at is None:
+        return False
+    return token.issued_at is None or token.issued_at < revoked_at.replace(tzinfo=timezone.utc).timestamp()
+
+async def get_current_identity(token: TokenData = Depends(verify_access_token), db: Session = Depends(get_async_db)):
+    """Identity of the caller for routes that do not need the full user row."""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if await is_revoked(token, db):
+        raise credentials_exception
+    if AUTH_MODE == "stateless" and token.user_id is not None:
+        return token
+    with metrics.stage("auth_user_lookup"):
+        user = await get_user_by_email_async(db, email=token.email)
+    if user is None:
+        raise credentials_exception
+    return TokenData(
+        email=user.email,
+        user_id=user.id,
+        first_name=user.first_name,
+        last_name=user.last_name,
+        issued_at=token.issued_at
+    )
@@ -0,0 +1,64 @@
+"""Per-request cost of bearer token verification, with and without the token cache.
+
+Calls ``auth.verify_access_token`` directly with the same token, the way a
+client replays one token for its whole lifetime. Covers HS256 and an
+RSA key (RS256).
+
+Run from the repository root::
+
+    python -m benchmarks.bench_auth --number 2000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def write_rsa_key(directory):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path = os.path.join(directory, "private.pem")
+    with open(path, "wb") as fp:
+        fp.write(key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ))
+    return path
+
+
+def main(number, repeat):
+    workdir = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+    from fastapi.security import HTTPAuthorizationCredentials
+    import auth
+
+    rsa_key_path = write_rsa_key(workdir)
+    claims = {"sub": "bench@example.com", "uid": 1, "first_name": "Bench", "last_name": "User"}
+    print(f"best of {repeat} x {number} verifications of one token")
+    for algorithm in ("HS256", "RS256"):
+        os.environ["ALGORITHM"] = algorithm
+        os.environ["JWT_PRIVATE_KEY_PATH"] = rsa_key_path
+        auth.load_keys()
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=auth.create_access_token(claims))
+        for cache_size in (0, auth.TOKEN_CACHE_SIZE or 10000):
+            auth.TOKEN_CACHE_SIZE = cache_size
+            auth.clear_token_cache()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                for _ in range(number):
+                    auth.verify_access_token(credentials)
+                timings.append((time.perf_counter() - start) / number)
+            label = "cache on" if cache_size else "cache off"
+            print(f"{algorithm:>6} {label:>9}: {min(timings) * 1e6:8.1f} us/request")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.number, args.repeat)
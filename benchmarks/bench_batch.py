@@ -0,0 +1,79 @@
+"""Compare N single ``/get-calories`` calls with one ``/get-calories/batch`` call.
+
+The app runs in-process against a SQLite database and a local fake USDA
+server. Every call goes through real JWT authentication, and the USDA
+caches are cleared before each measurement so every variant pays the
+upstream latency.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_batch --items 8 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+DISHES = [
+    "rice", "dal", "paneer tikka", "raita", "chapati", "chicken curry", "salad", "mango lassi",
+    "samosa", "idli", "dosa", "sambar", "biryani", "naan", "kheer", "pakora",
+]
+
+
+async def main(items, latency, repeat):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+
+    import httpx
+    from benchmarks.fake_usda import FakeUSDAServer
+    from main import app
+    from utils import food_cache, usda
+
+    meal = [{"dish_name": DISHES[i % len(DISHES)], "mode": "servings", "servings": 1} for i in range(items)]
+
+    with FakeUSDAServer(latency=latency) as server:
+        usda.USDA_SEARCH_URL = server.search_url
+        usda.USDA_FOOD_URL = server.food_url
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            response = await client.post("/auth/register", json={
+                "first_name": "Bench", "last_name": "User", "email": "bench@example.com", "password": "benchmark"
+            })
+            headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+            async def sequential():
+                for item in meal:
+                    (await client.post("/get-calories", json=item, headers=headers)).raise_for_status()
+
+            async def concurrent():
+                responses = await asyncio.gather(*(client.post("/get-calories", json=item, headers=headers) for item in meal))
+                for response in responses:
+                    response.raise_for_status()
+
+            async def batch():
+                (await client.post("/get-calories/batch", json={"items": meal}, headers=headers)).raise_for_status()
+
+            print(f"{items} items, fake USDA latency {latency * 1000:.0f} ms, best of {repeat}")
+            for name, run in (("single calls, sequential", sequential),
+                              ("single calls, concurrent", concurrent),
+                              ("one batch call", batch)):
+                timings = []
+                for _ in range(repeat):
+                    food_cache.clear()
+                    start = time.perf_counter()
+                    await run()
+                    timings.append(time.perf_counter() - start)
+                print(f"{name:>26}: {min(timings) * 1000:8.1f} ms")
+        await usda.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=8, help="dishes per meal")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake USDA latency in seconds")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.items, args.latency, args.repeat))
@@ -0,0 +1,78 @@
+"""Login throughput versus password hashing pool size.
+
+Runs ``/auth/login`` storms in-process against a SQLite database while a
+second task keeps probing ``GET /``, to show how responsive the event loop
+stays. Pool size 0 means the default thread pool instead of processes.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_login --pool-sizes 0 1 2 4 --concurrency 32
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+
+async def main(pool_sizes, concurrency, duration):
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+
+    import httpx
+    from main import app
+    from utils import password_pool
+
+    credentials = {"email": "bench@example.com", "password": "benchmark"}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/register", json={"first_name": "Bench", "last_name": "User", **credentials})
+
+        print(f"{concurrency} concurrent logins, {duration}s per pool size, {os.cpu_count()} CPUs")
+        print(f"{'pool size':>9} {'logins/s':>9} {'503s':>6} {'GET / p95 ms':>13}")
+        for size in pool_sizes:
+            password_pool.shutdown()
+            password_pool.PASSWORD_HASH_WORKERS = size
+            password_pool.PASSWORD_HASH_MAX_PENDING = max(size, 1) * 8
+            # Warm up the worker processes outside the measurement
+            await asyncio.gather(*(client.post("/auth/login", json=credentials) for _ in range(max(size, 1))))
+
+            deadline = time.perf_counter() + duration
+            logins = rejected = 0
+            probes = []
+
+            async def login_worker():
+                nonlocal logins, rejected
+                while time.perf_counter() < deadline:
+                    response = await client.post("/auth/login", json=credentials)
+                    if response.status_code == 503:
+                        rejected += 1
+                        await asyncio.sleep(0.01)
+                    else:
+                        logins += 1
+
+            async def probe():
+                while time.perf_counter() < deadline:
+                    start = time.perf_counter()
+                    await client.get("/")
+                    probes.append((time.perf_counter() - start) * 1000)
+                    await asyncio.sleep(0.01)
+
+            start = time.perf_counter()
+            await asyncio.gather(probe(), *(login_worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            p95 = statistics.quantiles(probes, n=20)[-1] if len(probes) > 1 else float("nan")
+            print(f"{size:>9} {logins / elapsed:>9.1f} {rejected:>6} {p95:>13.1f}")
+        password_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.pool_sizes, args.concurrency, args.duration))
@@ -0,0 +1,107 @@
+"""Serialization time and bytes on the wire for a large ``/get-calories`` result.
+
+Builds a result for a food with ``--nutrients`` nutrients (branded foods
+often carry 100+) and renders it the way each response path does:
+
+- untyped: ``jsonable_encoder`` plus the stdlib ``json`` module (the original route)
+- typed: the route's compiled response model plus ``json``
+- typed + orjson: the same with ``ORJSONResponse`` (``FAST_JSON_RESPONSES=true``)
+- views=total: typed + orjson with only the total nutrient list
+
+Run from the repository root::
+
+    python -m benchmarks.bench_serialization --nutrients 150
+"""
+import argparse
+import asyncio
+import gzip
+import os
+import random
+import tempfile
+import time
+
+
+def make_food_details(nutrients):
+    rng = random.Random(42)
+    return {
+        "servingSize": 85.0,
+        "servingSizeUnit": "g",
+        "householdServingFullText": "1 bar",
+        "foodNutrients": [
+            {
+                "nutrient": {"id": 1000 + i, "name": f"Nutrient {i}, total", "unitName": rng.choice(["g", "mg", "IU"])},
+                "amount": round(rng.uniform(0.01, 500), 3),
+            }
+            for i in range(nutrients)
+        ],
+    }
+
+
+def best_time(fn, number, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
+
+
+def main(nutrients, number, repeat):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse, ORJSONResponse
+    from fastapi.routing import serialize_response
+    from routers.calories import router
+    from utils.lookup import build_calorie_result
+    from schemas import CalorieRequest
+    from utils.compression import brotli
+    from utils.nutrients import ALL_VIEWS
+
+    route = next(r for r in router.routes if r.path == "/get-calories")
+    request = CalorieRequest(dish_name="protein bar", mode="servings", servings=2)
+    best_food = {"fdcId": 123456, "description": "Protein bar, chocolate"}
+    details = make_food_details(nutrients)
+    loop = asyncio.new_event_loop()
+
+    def typed(response_class, views):
+        def render():
+            result = build_calorie_result(request, best_food, details, views)
+            content = loop.run_until_complete(serialize_response(
+                field=route.response_field, response_content=result, exclude_unset=True
+            ))
+            return response_class(content).body
+        return render
+
+    def untyped():
+        result = build_calorie_result(request, best_food, details, ALL_VIEWS)
+        return JSONResponse(jsonable_encoder(result)).body
+
+    variants = [
+        ("untyped + json", untyped),
+        ("typed + json", typed(JSONResponse, ALL_VIEWS)),
+        ("typed + orjson", typed(ORJSONResponse, ALL_VIEWS)),
+        ("views=total + orjson", typed(ORJSONResponse, frozenset({"total"}))),
+    ]
+    print(f"{nutrients} nutrients, best of {repeat} x {number}")
+    print(f"{'variant':<22} {'time/op':>10} {'raw':>9} {'gzip':>9} {'br':>9}")
+    for name, render in variants:
+        body = render()
+        seconds = best_time(render, number, repeat)
+        gz = len(gzip.compress(body, compresslevel=6))
+        br = len(brotli.compress(body, quality=4)) if brotli is not None else None
+        br_text = f"{br:>9}" if br is not None else f"{'n/a':>9}"
+        print(f"{name:<22} {seconds * 1e6:>8.0f}us {len(body):>9} {gz:>9} {br_text}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nutrients", type=int, default=150)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.nutrients, args.number, args.repeat)
@@ -0,0 +1,67 @@
+"""Lookup cost of the food details cache backends.
+
+Compares the in-process ``TTLCache`` with ``ShmCache`` on a hot entry
+(served from the per-process decoded copy) and on a cold one (decompressed
+from the shared mapping), using a USDA-sized details payload.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_shm_cache --nutrients 150 --number 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+from utils.cache import TTLCache
+from utils.shm_cache import ShmCache
+
+
+def food_details(nutrients):
+    return {
+        "fdcId": 1,
+        "description": "Benchmark food",
+        "servingSize": 100,
+        "servingSizeUnit": "g",
+        "foodNutrients": [
+            {"nutrient": {"id": 1000 + i, "name": f"Nutrient {i}", "unitName": "mg", "number": str(i)},
+             "amount": i * 1.5, "type": "FoodNutrient", "id": 50000 + i}
+            for i in range(nutrients)
+        ],
+    }
+
+
+def best_of(fn, number, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
+
+
+def main(nutrients, number, repeat):
+    details = food_details(nutrients)
+    path = os.path.join(tempfile.mkdtemp(), "details")
+    memory = TTLCache(maxsize=2048, ttl=3600)
+    shared = ShmCache(path, size_bytes=16 * 1024 * 1024, slot_size=65536, ttl=3600)
+    cold = ShmCache(path, decoded_size=0)
+    memory.set("details:1", details)
+    shared.set("details:1", details)
+
+    print(f"best of {repeat} x {number} lookups of a {nutrients}-nutrient food")
+    for label, cache in (("TTLCache", memory), ("ShmCache (hot)", shared), ("ShmCache (cold)", cold)):
+        per_lookup = best_of(lambda: cache.get("details:1"), number, repeat)
+        print(f"{label:<18} {per_lookup * 1e6:8.2f} us/lookup")
+    print(f"shared file: {os.path.getsize(path) // 1024} KiB for {shared.maxsize} slots")
+    shared.close()
+    cold.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--nutrients", type=int, default=150)
+    parser.add_argument("--number", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.nutrients, args.number, args.repeat)
@@ -0,0 +1,68 @@
+"""Concurrency benchmark for the USDA client.
+
+Each simulated lookup performs the same two upstream calls as
+``/get-calories`` (search, then food detail) against a local fake USDA
+server. The blocking variant reproduces the previous ``requests.get``
+behaviour inside a coroutine; the async variant uses ``utils.usda``.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_usda_client --latency 0.05 --duration 5
+"""
+import argparse
+import asyncio
+import time
+
+import requests
+
+from benchmarks.fake_usda import FakeUSDAServer
+from utils import usda
+
+
+async def blocking_lookup(server, session):
+    session.get(server.search_url, params={"query": "chicken biryani", "pageSize": 20})
+    session.get(f"{server.food_url}/100000")
+
+
+async def async_lookup(server, session):
+    await usda.search_foods("chicken biryani", page_size=20)
+    await usda.get_food(100000)
+
+
+async def run(lookup, server, session, concurrency, duration):
+    completed = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal completed
+        while time.perf_counter() < deadline:
+            await lookup(server, session)
+            completed += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return completed / (time.perf_counter() - start)
+
+
+async def main(latency, duration, levels):
+    with FakeUSDAServer(latency=latency) as server:
+        usda.USDA_SEARCH_URL = server.search_url
+        usda.USDA_FOOD_URL = server.food_url
+        session = requests.Session()
+        print(f"fake USDA latency: {latency * 1000:.0f} ms per call, {duration}s per run")
+        print(f"{'concurrency':>11} {'blocking req/s':>15} {'async req/s':>12}")
+        for concurrency in levels:
+            blocking = await run(blocking_lookup, server, session, concurrency, duration)
+            pooled = await run(async_lookup, server, None, concurrency, duration)
+            print(f"{concurrency:>11} {blocking:>15.1f} {pooled:>12.1f}")
+        session.close()
+        await usda.close_client()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="fake USDA latency in seconds")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per measurement")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+    asyncio.run(main(args.latency, args.duration, args.concurrency))
@@ -0,0 +1,51 @@
+"""Seeded dish-query datasets with Zipf popularity.
+
+A few dishes account for most lookups and a long tail is requested
+rarely, as in real meal logs. This decides how much the caches and
+request coalescing help. The same seed always gives the same queries.
+
+Write a dataset to a file::
+
+    python -m benchmarks.datasets --size 10000 --seed 1 > queries.txt
+"""
+import argparse
+import itertools
+import random
+
+BASE_DISHES = [
+    "rice", "dal", "paneer tikka", "raita", "chapati", "chicken curry", "salad", "mango lassi",
+    "samosa", "idli", "dosa", "sambar", "biryani", "naan", "kheer", "pakora", "apple", "banana",
+    "oatmeal", "scrambled eggs", "pancakes", "greek yogurt", "caesar salad", "cheeseburger",
+    "pepperoni pizza", "spaghetti bolognese", "chicken noodle soup", "tuna sandwich", "sushi roll",
+    "pad thai", "fried rice", "beef taco", "burrito bowl", "hummus", "falafel", "lentil soup",
+    "grilled salmon", "roast chicken", "mashed potatoes", "french fries", "chocolate cake",
+    "ice cream", "orange juice", "black coffee", "green tea", "protein shake", "peanut butter toast",
+]
+MODIFIERS = ["", "homemade", "spicy", "large", "small", "vegan", "grilled", "baked", "fried", "low fat"]
+
+
+def vocabulary(size: int = None):
+    """Distinct dish names, most common first."""
+    dishes = [f"{modifier} {dish}".strip() for modifier, dish in itertools.product(MODIFIERS, BASE_DISHES)]
+    return dishes[:size] if size else dishes
+
+
+def zipf_queries(count: int, seed: int = 0, exponent: float = 1.1, vocabulary_size: int = None):
+    """``count`` dish names drawn with probability proportional to ``1 / rank ** exponent``."""
+    dishes = vocabulary(vocabulary_size)
+    rng = random.Random(seed)
+    # Shuffle once so popularity does not follow the modifier order
+    rng.shuffle(dishes)
+    weights = [1.0 / rank ** exponent for rank in range(1, len(dishes) + 1)]
+    return rng.choices(dishes, weights=weights, k=count)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--exponent", type=float, default=1.1)
+    parser.add_argument("--vocabulary", type=int, default=None, help="number of distinct dishes")
+    args = parser.parse_args()
+    for query in zipf_queries(args.size, args.seed, args.exponent, args.vocabulary):
+        print(query)
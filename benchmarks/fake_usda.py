@@ -0,0 +1,117 @@
+"""Local stand-in for the USDA FoodData Central API used by the benchmarks.
+
+Serves ``/fdc/v1/foods/search`` and ``/fdc/v1/food/{fdc_id}`` with a fixed
+artificial latency so client-side concurrency can be measured without
+touching the real API or its rate limit. ``error_rate`` makes that share of
+requests fail with a 503, as the real API does under load.
+"""
+import asyncio
+import random
+import socket
+import threading
+import time
+import zlib
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+
+_UNITS = ("g", "mg", "\u00b5g", "IU")
+
+
+def create_app(latency: float = 0.05, error_rate: float = 0.0, nutrients: int = 2, seed: int = None):
+    app = FastAPI()
+    rng = random.Random(seed)
+    # Energy and protein first, then filler nutrients to reach the requested count
+    extra_nutrients = [
+        {"nutrient": {"id": 2000 + i, "name": f"Nutrient {i}", "unitName": _UNITS[i % len(_UNITS)]}, "amount": 0.5 + i}
+        for i in range(max(nutrients - 2, 0))
+    ]
+    app.state.requests = 0
+    app.state.errors = 0
+
+    async def respond():
+        app.state.requests += 1
+        await asyncio.sleep(latency)
+        if error_rate and rng.random() < error_rate:
+            app.state.errors += 1
+            return JSONResponse({"error": "Service Unavailable"}, status_code=503)
+        return None
+
+    @app.get("/fdc/v1/foods/search")
+    async def search(query: str = "", pageSize: int = 20):
+        error = await respond()
+        if error is not None:
+            return error
+        # The first hit matches the query exactly so every dish resolves
+        base_id = zlib.crc32(query.lower().encode()) % 1000000 * 100
+        return {
+            "foods": [
+                {"fdcId": base_id + i, "description": query.capitalize() if i == 0 else f"{query} variant {i}"}
+                for i in range(pageSize)
+            ]
+        }
+
+    @app.get("/fdc/v1/food/{fdc_id}")
+    async def food(fdc_id: int):
+        error = await respond()
+        if error is not None:
+            return error
+        return {
+            "fdcId": fdc_id,
+            "servingSize": 100,
+            "servingSizeUnit": "g",
+            "householdServingFullText": "1 serving",
+            "foodNutrients": [
+                {"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 250.0},
+                {"nutrient": {"id": 1003, "name": "Protein", "unitName": "g"}, "amount": 12.5},
+            ][:nutrients] + extra_nutrients,
+        }
+
+    return app
+
+
+class FakeUSDAServer:
+    """Run the fake API with uvicorn on a background thread.
+
+    Usage::
+
+        with FakeUSDAServer(latency=0.05) as server:
+            usda.USDA_SEARCH_URL = server.search_url
+    """
+
+    def __init__(self, latency: float = 0.05, host: str = "127.0.0.1", error_rate: float = 0.0,
+                 nutrients: int = 2, seed: int = None):
+        self.app = create_app(latency=latency, error_rate=error_rate, nutrients=nutrients, seed=seed)
+        self.host = host
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind((host, 0))
+            self.port = sock.getsockname()[1]
+        config = uvicorn.Config(
+            self.app, host=host, port=self.port, log_level="warning", backlog=2048
+        )
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def search_url(self):
+        return f"{self.base_url}/fdc/v1/foods/search"
+
+    @property
+    def food_url(self):
+        return f"{self.base_url}/fdc/v1/food"
+
+    def __enter__(self):
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
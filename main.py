@@ -1,12 +1,53 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from database import engine, Base
-from routers import auth, calories
+from auth import load_keys
+from database import engine, Base, SessionLocal
+from routers import auth, calories, jobs, meals, metrics, recipes
+from utils import food_index, jobs as job_queue, password_pool, usda, warmup
+from utils.compression import CompressionMiddleware
+from utils.metrics import MetricsMiddleware
+
+load_dotenv()
+
+# gzip (or br, with the brotli package installed) for responses of at least COMPRESSION_MIN_SIZE bytes
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
 
 
 Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title="Meal Calorie Count Generator Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Parse JWT keys once; a misconfigured key fails at startup, not on the first request
+    load_keys()
+    if food_index.FOOD_INDEX_PATH or food_index.FOOD_INDEX_BUILD_ON_STARTUP:
+        db = SessionLocal()
+        try:
+            food_index.load_index(db)
+        finally:
+            db.close()
+    # Warm the caches for popular dishes without holding up readiness
+    background = [asyncio.create_task(warmup.run(SessionLocal))] if warmup.WARMUP_ENABLED else []
+    # Resolve bulk jobs here instead of in a separate `python -m utils.jobs worker`
+    if job_queue.JOBS_IN_PROCESS:
+        background.append(asyncio.create_task(job_queue.run_worker(SessionLocal)))
+    yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    # Release pooled keep-alive connections to USDA
+    await usda.close_client()
+    password_pool.shutdown()
+
+
+app = FastAPI(title="Meal Calorie Count Generator Backend", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -17,8 +58,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=COMPRESSION_MIN_SIZE,
+        gzip_level=COMPRESSION_GZIP_LEVEL,
+        brotli_quality=COMPRESSION_BROTLI_QUALITY,
+    )
+
+# Outermost, so request timings include the other middleware; a no-op unless METRICS_ENABLED
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(auth.router)
 app.include_router(calories.router)
+app.include_router(jobs.router)
+app.include_router(meals.router)
+app.include_router(recipes.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String
+from datetime import datetime
+from sqlalchemy import Boolean, Column, Integer, String, Float, Date, DateTime, JSON, ForeignKey, Index, DDL, event, text
 from database import Base
 
 class User(Base):
@@ -9,3 +10,187 @@ class User(Base):
     last_name = Column(String, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String)
+
+
+class UserRevocation(Base):
+    """Tokens issued to this user before ``revoked_at`` are no longer accepted."""
+    __tablename__ = "user_revocations"
+
+    user_id = Column(Integer, primary_key=True)
+    revoked_at = Column(DateTime, nullable=False)
+
+
+class USDACacheEntry(Base):
+    """Shared cache tier for USDA search results and food details."""
+    __tablename__ = "usda_cache"
+
+    key = Column(String, primary_key=True)
+    payload = Column(JSON)
+    expires_at = Column(DateTime, index=True)
+
+
+class MealEntry(Base):
+    """A dish resolved by /get-calories for a user, with its scaled totals."""
+    __tablename__ = "meal_entries"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    logged_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    dish_name = Column(String, nullable=False)
+    fdc_id = Column(Integer)
+    selected_food = Column(String)
+    mode = Column(String)
+    amount = Column(Float)
+    total_servings = Column(Float)
+    calories = Column(Float)
+
+    __table_args__ = (
+        # Serves history pages (keyset on logged_at, id) and date-range totals
+        Index("ix_meal_entries_user_logged_at", "user_id", "logged_at", "id"),
+    )
+
+
+class MealEntryNutrient(Base):
+    __tablename__ = "meal_entry_nutrients"
+
+    meal_entry_id = Column(Integer, ForeignKey("meal_entries.id", ondelete="CASCADE"), primary_key=True)
+    nutrient_id = Column(Integer, primary_key=True)
+    name = Column(String)
+    unit = Column(String)
+    amount = Column(Float)
+
+
+class DailyNutrientRollup(Base):
+    """Per-user, per-day nutrient sums kept in step with meal_entry_nutrients."""
+    __tablename__ = "daily_nutrient_rollups"
+
+    user_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    nutrient_id = Column(Integer, primary_key=True)
+    name = Column(String)
+    unit = Column(String)
+    amount = Column(Float, nullable=False, default=0.0)
+
+
+class Job(Base):
+    """A bulk calorie lookup resolved by background workers (see utils.jobs)."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued")  # queued, running, completed
+    views = Column(String)  # comma separated nutrient views, None for all
+    total_items = Column(Integer, nullable=False, default=0)
+    done_items = Column(Integer, nullable=False, default=0)
+    failed_items = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class JobItem(Base):
+    """One dish of a job; the queue workers claim items from."""
+    __tablename__ = "job_items"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(Integer, ForeignKey("jobs.id", ondelete="CASCADE"), nullable=False)
+    position = Column(Integer, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, running, done
+    request = Column(JSON, nullable=False)
+    claim_token = Column(String)
+    claimed_at = Column(DateTime)
+    attempts = Column(Integer, nullable=False, default=0)
+    status_code = Column(Integer)
+    result = Column(JSON)
+    error = Column(String)
+
+    __table_args__ = (
+        # Result pages (keyset on position) and the workers' scan for open items
+        Index("ix_job_items_job_position", "job_id", "position", unique=True),
+        Index("ix_job_items_status_id", "status", "id"),
+    )
+
+
+class Recipe(Base):
+    """A user's composite dish with its nutrient totals cached (see utils.recipes)."""
+    __tablename__ = "recipes"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    servings = Column(Float, nullable=False, default=1.0)  # servings the whole recipe makes
+    totals = Column(JSON)  # nutrient records for the whole recipe
+    calories = Column(Float)
+    stale = Column(Boolean, nullable=False, default=True)  # totals need recomputing
+    computed_at = Column(DateTime)
+
+
+class RecipeIngredient(Base):
+    """A food (by fdc_id) or another recipe used in a recipe."""
+    __tablename__ = "recipe_ingredients"
+
+    id = Column(Integer, primary_key=True)
+    recipe_id = Column(Integer, ForeignKey("recipes.id", ondelete="CASCADE"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    fdc_id = Column(Integer, ForeignKey("recipe_foods.fdc_id"), index=True)
+    sub_recipe_id = Column(Integer, ForeignKey("recipes.id"), index=True)
+    mode = Column(String, nullable=False)  # grams or servings, as in CalorieRequest
+    amount = Column(Float, nullable=False)
+
+
+class RecipeFood(Base):
+    """The food details recipe totals were computed from, one row per fdc_id."""
+    __tablename__ = "recipe_foods"
+
+    fdc_id = Column(Integer, primary_key=True)
+    description = Column(String)
+    details = Column(JSON, nullable=False)  # servingSize, servingSizeUnit and foodNutrients
+    fingerprint = Column(String, nullable=False)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+class Food(Base):
+    """A food from a locally ingested FoodData Central export."""
+    __tablename__ = "foods"
+
+    fdc_id = Column(Integer, primary_key=True)
+    description = Column(String, nullable=False)
+    data_type = Column(String)
+    serving_size = Column(Float)
+    serving_size_unit = Column(String)
+    household_serving_full_text = Column(String)
+
+    __table_args__ = (
+        Index(
+            "ix_foods_description_trgm", "description",
+            postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"}
+        ).ddl_if(dialect="postgresql"),
+        Index(
+            "ix_foods_description_fts", text("to_tsvector('english', description)"),
+            postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+class Nutrient(Base):
+    __tablename__ = "nutrients"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)
+    unit_name = Column(String)
+
+
+class FoodNutrient(Base):
+    __tablename__ = "food_nutrients"
+
+    id = Column(Integer, primary_key=True)
+    fdc_id = Column(Integer, ForeignKey("foods.fdc_id"), index=True, nullable=False)
+    nutrient_id = Column(Integer, ForeignKey("nutrients.id"), nullable=False)
+    amount = Column(Float)
+
+
+# Trigram indexes need the pg_trgm extension before the foods table is created
+event.listen(
+    Food.__table__, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql")
+)
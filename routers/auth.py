@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from sqlalchemy.orm import Session
 from schemas import UserCreate, Token, UserResponse, LoginResponse
-from database import get_db
-from schemas import UserCreate, Token, UserResponse
-from utils.auth import create_user, get_user_by_email, verify_password
+from database import get_async_db
+from schemas import UserCreate, Token, TokenData, UserResponse
+from utils.auth import (
+    create_user_async, delete_user_async, get_user_by_email_async, revoke_user_tokens_async, token_claims
+)
+from utils import password_pool
 from models import User
-from auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token
+from auth import ACCESS_TOKEN_EXPIRE_MINUTES, clear_revocation_cache, create_access_token, get_current_identity
 from datetime import timedelta
 from pydantic import BaseModel
 
@@ -17,26 +20,39 @@ class LoginRequest(BaseModel):
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
+async def run_password_job(job):
+    try:
+        return await job
+    except password_pool.PoolSaturated:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
 @router.post("/register", response_model=Token)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = get_user_by_email(db, email=user.email)
+async def register(user: UserCreate, db: Session = Depends(get_async_db)):
+    db_user = await get_user_by_email_async(db, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
-    create_user(db=db, user=user)
+    hashed_password = await run_password_job(password_pool.hash_password(user.password))
+    db_user = await create_user_async(db, user=user, hashed_password=hashed_password)
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(db_user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/login", response_model=LoginResponse)
-def login(user: LoginRequest, db: Session = Depends(get_db)):
+async def login(user: LoginRequest, db: Session = Depends(get_async_db)):
     # Validate credentials
-    db_user = get_user_by_email(db, email=user.email)
-    if not db_user or not verify_password(user.password, db_user.hashed_password):
+    db_user = await get_user_by_email_async(db, email=user.email)
+    if not db_user or not await run_password_job(
+        password_pool.verify_password(user.password, db_user.hashed_password)
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -45,10 +61,27 @@ def login(user: LoginRequest, db: Session = Depends(get_db)):
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data=token_claims(db_user), expires_delta=access_token_expires
     )
     return {
         "access_token": access_token,
         "token_type": "bearer",
         "user": UserResponse.model_validate(db_user)
     }
+
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_tokens(current_user: TokenData = Depends(get_current_identity), db: Session = Depends(get_async_db)):
+    """Sign out everywhere: every token issued to the caller so far stops working."""
+    await revoke_user_tokens_async(db, current_user.user_id)
+    # This worker stops accepting the tokens right away, the others within REVOCATION_CACHE_TTL
+    clear_revocation_cache()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+@router.delete("/me", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_account(current_user: TokenData = Depends(get_current_identity), db: Session = Depends(get_async_db)):
+    db_user = await get_user_by_email_async(db, email=current_user.email)
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    await delete_user_async(db, db_user)
+    clear_revocation_cache()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -1,138 +1,250 @@
-from fastapi import APIRouter, Depends, HTTPException
-import requests
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
 from sqlalchemy.orm import Session
 from database import get_db
-from schemas import CalorieRequest, CalorieResponse
-from utils.calories import select_best_food
-from auth import get_current_user
+from schemas import (
+    CalorieRequest, CalorieBatchItem, CalorieBatchRequest, CalorieBatchResponse, CalorieResult, TokenData
+)
+from utils import food_cache, meal_plans, meals, metrics, usda, warmup
+from utils.lookup import build_calorie_result, lookup_food
+from utils.nutrients import parse_views
+from auth import get_current_identity
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-router = APIRouter(prefix="", tags=["calories"])
-USDA_API_URL = "https://api.nal.usda.gov/fdc/v1/foods/search"
-USDA_API_KEY = os.getenv("USDA_API_KEY")
+# Set to "true" to render calorie responses with orjson instead of the stdlib json module
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
 
-@router.post("/get-calories")
-async def get_calories(request: CalorieRequest, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+router = APIRouter(
+    prefix="", tags=["calories"],
+    default_response_class=ORJSONResponse if FAST_JSON_RESPONSES else JSONResponse
+)
+# Maximum concurrent dish lookups within one batch request
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "10"))
+# Maximum rows of an uploaded meal plan resolved at the same time
+STREAM_CONCURRENCY = int(os.getenv("STREAM_CONCURRENCY", "10"))
 
-    try:
-        if request.servings <= 0:
-            raise HTTPException(status_code=400, detail="Invalid servings: must be positive")
 
-        params = {
-            "query": request.dish_name,
-            "api_key": USDA_API_KEY,
-            "pageSize": 20
-        }
-        response = requests.get(USDA_API_URL, params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=500, detail=f"USDA API error: {response.status_code} - {response.text}")
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Error in get_calories: {str(e)}")
-    except Exception as e:
-        if isinstance(e, HTTPException):
-            raise
-        raise HTTPException(status_code=500, detail=f"Error in get_calories: {str(e)}")
-
-    data = response.json()
-    foods = data.get("foods", [])
-    if not foods:
-        raise HTTPException(status_code=404, detail="Dish not found")
-
-    best_food = select_best_food(foods, request.dish_name)
-    if best_food is None:
-        raise HTTPException(status_code=404, detail="Dish not found")
-    fdc_id = best_food['fdcId']
-
-    # Fetch full details
-    details_url = f"https://api.nal.usda.gov/fdc/v1/food/{fdc_id}"
-    details_params = {"api_key": USDA_API_KEY}
-    details_response = requests.get(details_url, params=details_params)
-    if details_response.status_code != 200:
-        raise HTTPException(status_code=500, detail="USDA details API error")
-
-    food_details = details_response.json()
-    
-    serving_size = food_details.get('servingSize', 100.0)
-    serving_unit = food_details.get('servingSizeUnit', 'g')
-    household_text = food_details.get('householdServingFullText', 'N/A')
-
-    # Collect all nutrients per 100g
-    per_100g_nutrients = []
-    for nutrient in food_details.get('foodNutrients', []):
+@router.get("/get-calories/cache-stats")
+async def get_cache_stats(current_user: TokenData = Depends(get_current_identity)):
+    return dict(food_cache.cache_stats(), upstream=usda.scheduler.stats(), warmup=dict(warmup.last_run))
+
+
+def parse_views_param(views: Optional[str]):
+    try:
+        return parse_views(views)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Typed response models let FastAPI validate and serialize results with one
+# compiled pydantic schema instead of walking them with jsonable_encoder
+@router.post("/get-calories", response_model=CalorieResult, response_model_exclude_unset=True)
+async def get_calories(
+    request: CalorieRequest,
+    views: Optional[str] = Query(None, description="Comma separated subset of per_100g, per_serving, total"),
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    views = parse_views_param(views)
+    if request.servings <= 0:
+        raise HTTPException(status_code=400, detail="Invalid servings: must be positive")
+
+    best_food, food_details = await lookup_food(request.dish_name, db)
+    # Logging stores the totals even when the client did not ask for them
+    with metrics.stage("nutrients"):
+        result = build_calorie_result(request, best_food, food_details, views | {'total'} if request.log else views)
+    if request.log:
+        with metrics.stage("meal_log"):
+            entry = await run_in_threadpool(meals.log_meal, db, current_user.user_id, request, result)
+        result['meal_entry_id'] = entry.id
+        if 'total' not in views:
+            # Only built for the meal log
+            del result['total_nutrients']
+    return result
+
+
+@router.post("/get-calories/batch", response_model=CalorieBatchResponse, response_model_exclude_unset=True)
+async def get_calories_batch(
+    batch: CalorieBatchRequest,
+    views: Optional[str] = Query(None, description="Comma separated subset of per_100g, per_serving, total"),
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    views = parse_views_param(views)
+    # Identical dishes in the batch are looked up once
+    dish_keys = [food_cache.normalize_query(item.dish_name) for item in batch.items]
+    unique_dishes = {}
+    for key, item in zip(dish_keys, batch.items):
+        if item.servings > 0:
+            unique_dishes.setdefault(key, item.dish_name)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def resolve(dish_name):
+        async with semaphore:
+            # Without the request's session: lookups on the database open their own
+            try:
+                return await lookup_food(dish_name)
+            except HTTPException as e:
+                return e
+
+    lookups = dict(zip(
+        unique_dishes,
+        await asyncio.gather(*(resolve(dish_name) for dish_name in unique_dishes.values()))
+    ))
+
+    items = []
+    totals = {}
+    for index, (key, item) in enumerate(zip(dish_keys, batch.items)):
         try:
-            nut_id = nutrient['nutrient']['id']
-            nut_name = nutrient['nutrient']['name']
-            nut_value = nutrient.get('amount', 0.0)  # Use .get() with default value
-            nut_unit = nutrient['nutrient']['unitName']
-
-            # Skip nutrients without amount values
-            if nut_value is None or nut_value == 0.0:
-                continue
-
-            # Handle energy kJ to kcal if needed
-            if nut_id == 1008 and nut_unit == 'kJ':
-                nut_value = round(nut_value / 4.184, 2)
-                nut_unit = 'kcal'
-            per_100g_nutrients.append({
-                'id': nut_id,
-                'name': nut_name,
-                'value': nut_value,
-                'unit': nut_unit
-            })
-        except (KeyError, TypeError) as e:
-            # Skip malformed nutrient data
+            if item.servings <= 0:
+                raise HTTPException(status_code=400, detail="Invalid servings: must be positive")
+            lookup = lookups[key]
+            if isinstance(lookup, HTTPException):
+                raise lookup
+            # Totals are always built: they feed the batch sums and the meal log
+            with metrics.stage("nutrients"):
+                result = build_calorie_result(item, *lookup, views=views | {'total'})
+        except HTTPException as e:
+            items.append({'index': index, 'dish_name': item.dish_name, 'status_code': e.status_code, 'error': e.detail})
             continue
-
-    # Check if we have any nutrients
-    if not per_100g_nutrients:
-        raise HTTPException(status_code=404, detail="No nutrient data available for this food")
-
-    scale_factor_serving = serving_size / 100.0 if serving_unit == 'g' else 1.0
-    per_serving_nutrients = [
-        {
-            'id': nut['id'],
-            'name': nut['name'],
-            'value': round(nut['value'] * scale_factor_serving, 2),
-            'unit': nut['unit']
-        }
-        for nut in per_100g_nutrients
+        items.append({'index': index, 'dish_name': item.dish_name, 'status_code': 200, 'result': result})
+        for nut in result['total_nutrients']:
+            total = totals.setdefault(nut['id'], {'id': nut['id'], 'name': nut['name'], 'value': 0.0, 'unit': nut['unit']})
+            total['value'] += nut['value']
+
+    logged = [
+        (batch.items[item['index']], item['result'])
+        for item in items
+        if 'result' in item and batch.items[item['index']].log
     ]
+    if logged:
+        with metrics.stage("meal_log"):
+            entries = await run_in_threadpool(meals.log_meals, db, current_user.user_id, logged)
+        for (_, result), entry in zip(logged, entries):
+            result['meal_entry_id'] = entry.id
 
-    energy_serving = next((n['value'] for n in per_serving_nutrients if n['id'] == 1008), None)
-
-    if request.mode == 'servings':
-        total_servings = request.servings
-    elif request.mode == 'grams':
-        if serving_unit == 'g':
-            total_servings = request.servings / serving_size
-        else:
-            total_servings = request.servings / 100.0
-    else:
-        total_servings = request.servings
-    total_nutrients = [
-        {
-            'id': nut['id'],
-            'name': nut['name'],
-            'value': round(nut['value'] * total_servings, 2),
-            'unit': nut['unit']
-        }
-        for nut in per_serving_nutrients
-    ]
+    if 'total' not in views:
+        for item in items:
+            item.get('result', {}).pop('total_nutrients', None)
 
+    total_nutrients = [dict(total, value=round(total['value'], 2)) for total in totals.values()]
     return {
-        'dish_name': request.dish_name,
-        'selected_food': best_food.get('description', 'N/A'),
-        'fdc_id': fdc_id,
-        'serving_size': f"{serving_size} {serving_unit}",
-        'household_serving_text': household_text,
-        'total_servings': total_servings,
-        'per_100g_nutrients': per_100g_nutrients,
-        'per_serving_nutrients': per_serving_nutrients,
+        'items': items,
         'total_nutrients': total_nutrients,
-        'mode': request.mode,
-        'amount': request.servings,
-        'computed_total_nutrients': total_nutrients
+        'total_calories': next((n['value'] for n in total_nutrients if n['id'] == 1008), 0.0),
+        'succeeded': sum(1 for item in items if item['status_code'] == 200),
+        'failed': sum(1 for item in items if item['status_code'] != 200),
     }
+
+
+class _DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse whose content still reads the request body.
+
+    Below ASGI spec 2.4 Starlette listens for a disconnect while streaming,
+    and that listener would swallow the body messages. Here a disconnect
+    surfaces as ClientDisconnect from the body reader or from ``send``.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+def _stream_line(index: int, dish_name: str, status_code: int, **fields) -> str:
+    item = CalorieBatchItem.model_validate(dict(fields, index=index, dish_name=dish_name, status_code=status_code))
+    return item.model_dump_json(exclude_unset=True) + "\n"
+
+
+def _validation_detail(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+
+
+async def _resolve_row(index: int, row, views) -> str:
+    dish_name = str(row.get('dish_name') or '') if isinstance(row, dict) else ''
+    try:
+        if isinstance(row, meal_plans.PlanError):
+            raise HTTPException(status_code=400, detail=str(row))
+        try:
+            item = CalorieRequest.model_validate(row)
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=_validation_detail(e))
+        if item.servings <= 0:
+            raise HTTPException(status_code=400, detail="Invalid servings: must be positive")
+        # The request's own session is closed once streaming starts
+        lookup = await lookup_food(item.dish_name)
+        with metrics.stage("nutrients"):
+            result = build_calorie_result(item, *lookup, views=views)
+    except HTTPException as e:
+        return _stream_line(index, dish_name, e.status_code, error=e.detail)
+    except Exception as e:
+        return _stream_line(index, dish_name, 500, error=f"Error in get_calories: {str(e)}")
+    return _stream_line(index, dish_name, 200, result=result)
+
+
+async def _stream_results(chunks, fmt: str, views):
+    """Resolve rows as they are read, at most STREAM_CONCURRENCY at a time,
+    yielding each result line as soon as it is ready."""
+    pending = set()
+    index = 0
+    try:
+        try:
+            async for index, row in meal_plans.iter_rows(meal_plans.iter_lines(chunks), fmt):
+                for task in [task for task in pending if task.done()]:
+                    pending.discard(task)
+                    yield task.result()
+                if len(pending) >= STREAM_CONCURRENCY:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                pending.add(asyncio.create_task(_resolve_row(index, row, views)))
+                index += 1
+        except meal_plans.PlanError as e:
+            error = _stream_line(index, '', 413, error=str(e))
+        else:
+            error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+        if error is not None:
+            yield error
+    finally:
+        # The client went away: stop resolving the rows still in flight
+        for task in pending:
+            task.cancel()
+
+
+@router.post(
+    "/get-calories/stream",
+    response_class=StreamingResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {
+        "application/x-ndjson": {"schema": CalorieRequest.model_json_schema()},
+        "text/csv": {"schema": {"type": "string"}},
+    }}},
+)
+async def stream_calories(
+    request: Request,
+    views: Optional[str] = Query(None, description="Comma separated subset of per_100g, per_serving, total"),
+    current_user: TokenData = Depends(get_current_identity),
+):
+    """Resolve an NDJSON or CSV meal plan of any size, streaming one NDJSON
+    result per row (in completion order, tagged with the row index).
+
+    Rows are never logged to the meal history.
+    """
+    views = parse_views_param(views)
+    fmt = "csv" if request.headers.get("content-type", "").startswith("text/csv") else "ndjson"
+    return _DuplexStreamingResponse(_stream_results(request.stream(), fmt, views), media_type="application/x-ndjson")
@@ -0,0 +1,84 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import get_db
+from schemas import JobCreate, TokenData
+from auth import get_current_identity
+from routers.calories import parse_views_param
+from utils import jobs
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _job_status(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'views': job.views,
+        'total_items': job.total_items,
+        'done_items': job.done_items,
+        'failed_items': job.failed_items,
+        'progress': round(job.done_items / job.total_items, 4) if job.total_items else 1.0,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def _get_job_or_404(db: Session, job_id: int, user_id: int):
+    job = jobs.get_job(db, job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.post("", status_code=202)
+async def create_job(
+    body: JobCreate,
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    """Queue a bulk calorie lookup; poll ``GET /jobs/{id}`` for progress.
+
+    Items are resolved like ``/get-calories`` items but never logged to the meal history.
+    """
+    parse_views_param(body.views)
+    job = await run_in_threadpool(jobs.create_job, db, current_user.user_id, body.items, body.views)
+    return _job_status(job)
+
+
+@router.get("/{job_id}")
+def get_job_status(
+    job_id: int,
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    return _job_status(_get_job_or_404(db, job_id, current_user.user_id))
+
+
+@router.get("/{job_id}/results")
+def get_job_results(
+    job_id: int,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[int] = Query(None, description="next_cursor of the previous page"),
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    job = _get_job_or_404(db, job_id, current_user.user_id)
+    items, next_cursor = jobs.list_results(db, job.id, limit=limit, after=cursor)
+    return {
+        'job': _job_status(job),
+        'items': [
+            {
+                'index': item.position,
+                'dish_name': item.request.get('dish_name'),
+                'status': item.status,
+                'status_code': item.status_code,
+                'result': item.result,
+                'error': item.error,
+            }
+            for item in items
+        ],
+        'next_cursor': next_cursor,
+    }
@@ -0,0 +1,68 @@
+from datetime import date, datetime, timedelta
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from database import get_db
+from schemas import TokenData
+from auth import get_current_identity
+from utils.meals import get_meal_nutrients, list_meals
+from utils.rollups import rollup_totals
+
+router = APIRouter(prefix="/meals", tags=["meals"])
+
+# Longest date range a single summary request may cover
+MAX_SUMMARY_DAYS = 366
+
+
+@router.get("")
+def get_meal_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    try:
+        entries, next_cursor = list_meals(db, current_user.user_id, limit=limit, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    nutrients = get_meal_nutrients(db, [entry.id for entry in entries])
+    return {
+        'items': [
+            {
+                'id': entry.id,
+                'logged_at': entry.logged_at.isoformat(),
+                'dish_name': entry.dish_name,
+                'fdc_id': entry.fdc_id,
+                'selected_food': entry.selected_food,
+                'mode': entry.mode,
+                'amount': entry.amount,
+                'total_servings': entry.total_servings,
+                'calories': entry.calories,
+                'total_nutrients': nutrients.get(entry.id, []),
+            }
+            for entry in entries
+        ],
+        'next_cursor': next_cursor,
+    }
+
+
+@router.get("/summary")
+def get_meal_summary(
+    period: Literal["day", "week"] = "day",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=6 if period == "day" else 27)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    if (end - start).days >= MAX_SUMMARY_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be shorter than {MAX_SUMMARY_DAYS} days")
+    return {
+        'period': period,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'totals': rollup_totals(db, current_user.user_id, start, end, period),
+    }
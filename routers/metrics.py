@@ -0,0 +1,13 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+from utils import metrics
+
+router = APIRouter(tags=["metrics"])
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus scrape endpoint; 404 unless METRICS_ENABLED."""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
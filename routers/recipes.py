@@ -0,0 +1,157 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from database import get_db
+from models import Recipe, RecipeIngredient
+from schemas import RecipeCreate, TokenData
+from auth import get_current_identity
+from utils.lookup import fetch_food_details, lookup_food
+from utils import recipes
+
+router = APIRouter(prefix="/recipes", tags=["recipes"])
+
+
+def _get_recipe_or_404(db: Session, recipe_id: int, user_id: int):
+    recipe = db.execute(
+        select(Recipe).where(Recipe.id == recipe_id, Recipe.user_id == user_id)
+    ).scalar_one_or_none()
+    if recipe is None:
+        raise HTTPException(status_code=404, detail="Recipe not found")
+    return recipe
+
+
+def _recipe_summary(recipe: Recipe):
+    return {
+        'id': recipe.id,
+        'name': recipe.name,
+        'servings': recipe.servings,
+        'calories': recipe.calories,
+        'computed_at': recipe.computed_at.isoformat() if recipe.computed_at else None,
+    }
+
+
+def _recipe_detail(db: Session, recipe: Recipe):
+    ingredients = db.execute(
+        select(RecipeIngredient).where(RecipeIngredient.recipe_id == recipe.id).order_by(RecipeIngredient.position)
+    ).scalars().all()
+    return dict(
+        _recipe_summary(recipe),
+        ingredients=[
+            {'fdc_id': ingredient.fdc_id, 'recipe_id': ingredient.sub_recipe_id,
+             'mode': ingredient.mode, 'amount': ingredient.amount}
+            for ingredient in ingredients
+        ],
+        total_nutrients=recipe.totals,
+        per_serving_nutrients=recipes.per_serving(recipe),
+    )
+
+
+async def _resolve_ingredients(body: RecipeCreate, db: Session):
+    """Foods to snapshot and ``(fdc_id, sub_recipe_id, mode, amount)`` rows for the body."""
+    foods = {}
+    rows = []
+    for ingredient in body.ingredients:
+        if ingredient.recipe_id is not None:
+            rows.append((None, ingredient.recipe_id, ingredient.mode, ingredient.amount))
+            continue
+        if ingredient.dish_name is not None:
+            best_food, details = await lookup_food(ingredient.dish_name, db)
+            fdc_id, description = best_food['fdcId'], best_food.get('description')
+        else:
+            fdc_id = ingredient.fdc_id
+            details = await fetch_food_details(fdc_id, db)
+            description = details.get('description')
+        foods[fdc_id] = (description, details)
+        rows.append((fdc_id, None, ingredient.mode, ingredient.amount))
+    return foods, rows
+
+
+def _save_recipe(db: Session, user_id: int, recipe: Recipe, body: RecipeCreate, foods: dict, rows):
+    sub_ids = {sub_id for _, sub_id, _, _ in rows if sub_id is not None}
+    owned = set(db.execute(
+        select(Recipe.id).where(Recipe.id.in_(sub_ids), Recipe.user_id == user_id)
+    ).scalars())
+    if sub_ids - owned:
+        raise HTTPException(status_code=400, detail=f"Unknown recipe ids: {sorted(sub_ids - owned)}")
+    recipe.name = body.name
+    recipe.servings = body.servings
+    if recipe.id is None:
+        db.add(recipe)
+        db.flush()
+    for fdc_id, (description, details) in foods.items():
+        recipes.store_food(db, fdc_id, description, details)
+    try:
+        recipes.set_ingredients(db, recipe, rows)
+    except recipes.RecipeCycleError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    # The saved recipe is recomputed now; recipes that include it are recomputed on their next read
+    recipes.compute_totals(db, recipe)
+    db.commit()
+    return _recipe_detail(db, recipe)
+
+
+@router.post("", status_code=201)
+async def create_recipe(
+    body: RecipeCreate,
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    foods, rows = await _resolve_ingredients(body, db)
+    recipe = Recipe(user_id=current_user.user_id)
+    return await run_in_threadpool(_save_recipe, db, current_user.user_id, recipe, body, foods, rows)
+
+
+@router.put("/{recipe_id}")
+async def update_recipe(
+    recipe_id: int,
+    body: RecipeCreate,
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    recipe = await run_in_threadpool(_get_recipe_or_404, db, recipe_id, current_user.user_id)
+    foods, rows = await _resolve_ingredients(body, db)
+    return await run_in_threadpool(_save_recipe, db, current_user.user_id, recipe, body, foods, rows)
+
+
+@router.get("")
+def list_recipes(
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    rows = db.execute(
+        select(Recipe).where(Recipe.user_id == current_user.user_id).order_by(Recipe.id)
+    ).scalars()
+    return {'items': [_recipe_summary(recipe) for recipe in rows]}
+
+
+@router.get("/{recipe_id}")
+def get_recipe(
+    recipe_id: int,
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    recipe = _get_recipe_or_404(db, recipe_id, current_user.user_id)
+    if recipe.stale:
+        recipes.compute_totals(db, recipe)
+        db.commit()
+    return _recipe_detail(db, recipe)
+
+
+@router.delete("/{recipe_id}", status_code=204)
+def delete_recipe(
+    recipe_id: int,
+    current_user: TokenData = Depends(get_current_identity),
+    db: Session = Depends(get_db)
+):
+    recipe = _get_recipe_or_404(db, recipe_id, current_user.user_id)
+    used_by = db.execute(
+        select(RecipeIngredient.recipe_id).where(RecipeIngredient.sub_recipe_id == recipe.id).limit(1)
+    ).scalar_one_or_none()
+    if used_by is not None:
+        raise HTTPException(status_code=409, detail=f"Recipe is used by recipe {used_by}")
+    db.execute(RecipeIngredient.__table__.delete().where(RecipeIngredient.recipe_id == recipe.id))
+    db.delete(recipe)
+    db.commit()
+    return Response(status_code=204)
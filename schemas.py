@@ -1,5 +1,5 @@
-from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, ConfigDict, Field, model_validator
+from typing import List, Literal, Optional
 
 
 class UserBase(BaseModel):
@@ -25,12 +25,88 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    issued_at: Optional[float] = None
 
 
 class CalorieRequest(BaseModel):
     dish_name: str
     mode: str
     servings: float
+    log: bool = False  # store the result in the user's meal history
+
+
+class CalorieBatchRequest(BaseModel):
+    items: List[CalorieRequest] = Field(min_length=1, max_length=100)
+
+
+class JobCreate(BaseModel):
+    items: List[CalorieRequest] = Field(min_length=1, max_length=50000)
+    views: Optional[str] = None  # comma separated subset of per_100g, per_serving, total
+
+
+class RecipeIngredientIn(BaseModel):
+    """A food given by ``fdc_id`` or resolved from ``dish_name``, or a saved recipe."""
+    fdc_id: Optional[int] = None
+    dish_name: Optional[str] = None
+    recipe_id: Optional[int] = None
+    mode: Literal["grams", "servings"] = "grams"
+    amount: float = Field(gt=0)
+
+    @model_validator(mode="after")
+    def check_source(self):
+        if sum(source is not None for source in (self.fdc_id, self.dish_name, self.recipe_id)) != 1:
+            raise ValueError("Give exactly one of fdc_id, dish_name or recipe_id")
+        if self.recipe_id is not None and self.mode != "servings":
+            raise ValueError("Recipes used as ingredients are measured in servings")
+        return self
+
+
+class RecipeCreate(BaseModel):
+    name: str
+    servings: float = Field(1.0, gt=0)  # servings the whole recipe makes
+    ingredients: List[RecipeIngredientIn] = Field(min_length=1, max_length=100)
+
+
+class NutrientAmount(BaseModel):
+    id: int
+    name: str
+    value: float
+    unit: str
+
+
+class CalorieResult(BaseModel):
+    dish_name: str
+    selected_food: Optional[str] = None
+    fdc_id: int
+    serving_size: str
+    household_serving_text: Optional[str] = None
+    total_servings: float
+    # Present depending on the requested views
+    per_100g_nutrients: Optional[List[NutrientAmount]] = None
+    per_serving_nutrients: Optional[List[NutrientAmount]] = None
+    total_nutrients: Optional[List[NutrientAmount]] = None
+    mode: str
+    amount: float
+    meal_entry_id: Optional[int] = None
+
+
+class CalorieBatchItem(BaseModel):
+    index: int
+    dish_name: str
+    status_code: int
+    result: Optional[CalorieResult] = None
+    error: Optional[str] = None
+
+
+class CalorieBatchResponse(BaseModel):
+    items: List[CalorieBatchItem]
+    total_nutrients: List[NutrientAmount]
+    total_calories: float
+    succeeded: int
+    failed: int
 
 
 class CalorieResponse(BaseModel):
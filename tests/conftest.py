@@ -1,10 +1,11 @@
 import pytest
 import os
+from unittest.mock import MagicMock
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from fastapi.testclient import TestClient
 from main import app
-from database import Base, get_db
+from database import Base, get_async_db, get_db
 
 # Set test environment variables
 os.environ["SECRET_KEY"] = "test_secret_key"
@@ -14,6 +15,13 @@ os.environ["DATABASE_URL"] = "sqlite:///./test.db"
 # Test database URL (use SQLite for testing)
 TEST_DATABASE_URL = "sqlite:///./test.db"
 
+# Foods served by the mock_usda fixture, by search query
+USDA_FOODS = {
+    "rice": {"fdcId": 1, "description": "Rice", "energy": 130.0},
+    "dal": {"fdcId": 2, "description": "Dal", "energy": 116.0},
+    "apple": {"fdcId": 12345, "description": "Apple, raw", "energy": 52.0},
+}
+
 @pytest.fixture(scope="session")
 def test_engine():
     engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
@@ -47,6 +55,7 @@ def client(test_db):
 
     # Mock user for authentication
     from models import User
+    from schemas import TokenData
     mock_user = User(
         id=1,
         first_name="Test",
@@ -58,9 +67,56 @@ def client(test_db):
     def override_get_current_user():
         return mock_user
 
+    def override_get_current_identity():
+        return TokenData(
+            email=mock_user.email,
+            user_id=mock_user.id,
+            first_name=mock_user.first_name,
+            last_name=mock_user.last_name
+        )
+
+    # Start every test with empty USDA caches and a closed circuit breaker
+    from utils import food_cache, usda
+    food_cache.clear()
+    usda.policy.breaker.reset()
+
     app.dependency_overrides[get_db] = override_get_db
-    from auth import get_current_user
+    app.dependency_overrides[get_async_db] = override_get_db
+    from auth import get_current_identity, get_current_user
     app.dependency_overrides[get_current_user] = override_get_current_user
+    app.dependency_overrides[get_current_identity] = override_get_current_identity
 
     with TestClient(app) as c:
         yield c
+
+@pytest.fixture
+def mock_usda(mocker):
+    """Patch the USDA API to serve ``foods``: searches by lowercased query, details by fdcId.
+
+    Returns the patched ``httpx.AsyncClient.get``. Tests can add to its
+    ``foods`` dict, or set ``gate`` to an asyncio.Event responses wait for.
+    """
+    async def get(url, params=None, **kwargs):
+        if mock.gate is not None:
+            await mock.gate.wait()
+        response = MagicMock(status_code=200)
+        if "search" in url:
+            food = mock.foods.get(params["query"].strip().lower())
+            foods = [{"fdcId": food["fdcId"], "description": food["description"]}] if food else []
+            response.json.return_value = {"foods": foods}
+            return response
+        fdc_id = int(url.rsplit("/", 1)[1])
+        food = next((food for food in mock.foods.values() if food["fdcId"] == fdc_id), None)
+        if food is None:
+            return MagicMock(status_code=404, text="Not found")
+        response.json.return_value = {
+            "servingSize": 100,
+            "servingSizeUnit": "g",
+            "foodNutrients": [{"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": food["energy"]}]
+        }
+        return response
+
+    mock = mocker.patch("httpx.AsyncClient.get", side_effect=get)
+    mock.foods = dict(USDA_FOODS)
+    mock.gate = None
+    return mock
@@ -102,3 +102,178 @@ def test_login_invalid_data(client):
 
     response = client.post("/auth/login", json=login_data)
     assert response.status_code == 422  # Validation error
+
+
+def register_and_get_token(client, email="erin@example.com"):
+    user_data = {
+        "first_name": "Erin",
+        "last_name": "Lee",
+        "email": email,
+        "password": "password123"
+    }
+    return client.post("/auth/register", json=user_data).json()["access_token"]
+
+
+@pytest.fixture
+def real_identity(client):
+    import auth
+    from main import app
+    app.dependency_overrides.pop(auth.get_current_identity)
+    auth.clear_revocation_cache()
+    yield auth
+    auth.clear_revocation_cache()
+
+
+def test_stateless_identity_skips_user_query(client, real_identity, monkeypatch):
+    token = register_and_get_token(client)
+    monkeypatch.setattr(real_identity, "AUTH_MODE", "stateless")
+
+    async def fail_lookup(*args, **kwargs):
+        raise AssertionError("user row should not be loaded")
+
+    monkeypatch.setattr(real_identity, "get_user_by_email_async", fail_lookup)
+    response = client.get("/get-calories/cache-stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+
+def test_stateless_identity_rejects_revoked_user(client, test_db, real_identity, monkeypatch):
+    from datetime import datetime, timedelta
+    from models import UserRevocation
+    from utils.auth import get_user_by_email
+    token = register_and_get_token(client)
+    monkeypatch.setattr(real_identity, "AUTH_MODE", "stateless")
+    user_id = get_user_by_email(test_db, "erin@example.com").id
+    # Revoked in the next second, after the token was issued
+    test_db.merge(UserRevocation(user_id=user_id, revoked_at=datetime.utcnow() + timedelta(seconds=1)))
+    test_db.commit()
+
+    response = client.get("/get-calories/cache-stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_stateless_identity_accepts_token_issued_after_revocation(client, test_db, real_identity, monkeypatch):
+    from utils.auth import get_user_by_email, revoke_user_tokens, token_claims
+    register_and_get_token(client)
+    monkeypatch.setattr(real_identity, "AUTH_MODE", "stateless")
+    user = get_user_by_email(test_db, "erin@example.com")
+    revoke_user_tokens(test_db, user.id)
+    # Logging in again, usually within the same second as the revocation
+    token = real_identity.create_access_token(token_claims(user))
+
+    response = client.get("/get-calories/cache-stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+
+
+def test_token_issued_just_before_revocation_is_rejected(client, test_db, real_identity, monkeypatch):
+    from datetime import datetime, timedelta
+    from jose import jwt
+    from models import UserRevocation
+    from utils.auth import get_user_by_email
+    token = register_and_get_token(client)
+    monkeypatch.setattr(real_identity, "AUTH_MODE", "stateless")
+    user_id = get_user_by_email(test_db, "erin@example.com").id
+    # Revoked a millisecond after the token was issued, within the same second or not
+    issued_at = datetime.utcfromtimestamp(jwt.get_unverified_claims(token)["iat"])
+    test_db.merge(UserRevocation(user_id=user_id, revoked_at=issued_at + timedelta(milliseconds=1)))
+    test_db.commit()
+
+    response = client.get("/get-calories/cache-stats", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_revoke_endpoint_signs_out_everywhere(client, real_identity):
+    token = register_and_get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.post("/auth/revoke", headers=headers).status_code == 204
+    assert client.get("/get-calories/cache-stats", headers=headers).status_code == 401
+
+    login = client.post("/auth/login", json={"email": "erin@example.com", "password": "password123"})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    assert client.get("/get-calories/cache-stats", headers=headers).status_code == 200
+
+
+def test_delete_account_removes_the_users_data(client, test_db, real_identity):
+    from models import DailyNutrientRollup, MealEntry, MealEntryNutrient, User
+    from schemas import CalorieRequest
+    from utils.auth import get_user_by_email
+    from utils.meals import log_meal
+    token = register_and_get_token(client)
+    user_id = get_user_by_email(test_db, "erin@example.com").id
+    result = {
+        "fdc_id": 1, "selected_food": "Rice", "total_servings": 1.0,
+        "total_nutrients": [{"id": 1008, "name": "Energy", "value": 130.0, "unit": "kcal"}],
+    }
+    log_meal(test_db, user_id, CalorieRequest(dish_name="rice", mode="servings", servings=1), result)
+
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.delete("/auth/me", headers=headers).status_code == 204
+    assert test_db.query(User).count() == 0
+    assert test_db.query(MealEntry).count() == 0
+    assert test_db.query(MealEntryNutrient).count() == 0
+    assert test_db.query(DailyNutrientRollup).count() == 0
+    assert client.get("/get-calories/cache-stats", headers=headers).status_code == 401
+
+
+def test_database_identity_rejects_deleted_user(client, test_db, real_identity):
+    from utils.auth import delete_user, get_user_by_email
+    token = register_and_get_token(client)
+    headers = {"Authorization": f"Bearer {token}"}
+    assert client.get("/get-calories/cache-stats", headers=headers).status_code == 200
+
+    delete_user(test_db, get_user_by_email(test_db, "erin@example.com"))
+    assert client.get("/get-calories/cache-stats", headers=headers).status_code == 401
+
+
+def test_verified_tokens_are_cached_until_expiry(monkeypatch):
+    import time
+    from datetime import timedelta
+    from fastapi.security import HTTPAuthorizationCredentials
+    import auth
+
+    auth.load_keys()
+    token = auth.create_access_token({"sub": "erin@example.com", "uid": 7}, expires_delta=timedelta(minutes=5))
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+    assert auth.verify_access_token(credentials).user_id == 7
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("cached token should not be decoded again")
+
+    monkeypatch.setattr(auth.jwt, "decode", fail_decode)
+    assert auth.verify_access_token(credentials).user_id == 7
+    _, expires_at = next(iter(auth.token_cache._data.values()))
+    assert expires_at - time.monotonic() <= 5 * 60
+
+
+def test_rejected_tokens_are_not_cached():
+    from fastapi.security import HTTPAuthorizationCredentials
+    import auth
+
+    auth.clear_token_cache()
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="not-a-token")
+    with pytest.raises(HTTPException):
+        auth.verify_access_token(credentials)
+    assert len(auth.token_cache) == 0
+
+
+def test_asymmetric_keys(tmp_path, monkeypatch):
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from fastapi.security import HTTPAuthorizationCredentials
+    import auth
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    private_path = tmp_path / "private.pem"
+    private_path.write_bytes(private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+    monkeypatch.setenv("ALGORITHM", "RS256")
+    monkeypatch.setenv("JWT_PRIVATE_KEY_PATH", str(private_path))
+    try:
+        keys = auth.load_keys()
+        assert keys.algorithm == "RS256"
+        token = auth.create_access_token({"sub": "erin@example.com", "uid": 7})
+        credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+        assert auth.verify_access_token(credentials).email == "erin@example.com"
+    finally:
+        monkeypatch.undo()
+        auth.load_keys()
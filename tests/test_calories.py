@@ -35,7 +35,7 @@ def test_get_calories_success(client, mocker):
             return mock_details_response
         return MagicMock(status_code=404)
 
-    mocker.patch("requests.get", side_effect=mock_get)
+    mocker.patch("httpx.AsyncClient.get", side_effect=mock_get)
     request_data = {
         "dish_name": "Apple",
         "mode": "servings",
@@ -67,7 +67,7 @@ def test_get_calories_no_foods_found(client, mocker):
     mock_search_response.json.return_value = {
         "foods": []
     }
-    mocker.patch("requests.get", return_value=mock_search_response)
+    mocker.patch("httpx.AsyncClient.get", return_value=mock_search_response)
     request_data = {
         "dish_name": "NonexistentFood",
         "mode": "servings",
@@ -83,7 +83,7 @@ def test_get_calories_usda_api_error(client, mocker):
     mock_response = MagicMock()
     mock_response.status_code = 500
     mock_response.text = "Internal Server Error"
-    mocker.patch("requests.get", return_value=mock_response)
+    mocker.patch("httpx.AsyncClient.get", return_value=mock_response)
     request_data = {
         "dish_name": "Apple",
         "mode": "servings",
@@ -116,7 +116,7 @@ def test_get_calories_details_api_error(client, mocker):
             return mock_details_response
         return MagicMock(status_code=404)
 
-    mocker.patch("requests.get", side_effect=mock_get)
+    mocker.patch("httpx.AsyncClient.get", side_effect=mock_get)
     request_data = {
         "dish_name": "Apple",
         "mode": "servings",
@@ -160,7 +160,7 @@ def test_get_calories_grams_mode(client, mocker):
             return mock_details_response
         return MagicMock(status_code=404)
 
-    mocker.patch("requests.get", side_effect=mock_get)
+    mocker.patch("httpx.AsyncClient.get", side_effect=mock_get)
     request_data = {
         "dish_name": "Apple",
         "mode": "grams",
@@ -201,7 +201,7 @@ def test_get_calories_no_nutrients(client, mocker):
             return mock_details_response
         return MagicMock(status_code=404)
 
-    mocker.patch("requests.get", side_effect=mock_get)
+    mocker.patch("httpx.AsyncClient.get", side_effect=mock_get)
     request_data = {
         "dish_name": "Test Food",
         "mode": "servings",
@@ -221,7 +221,7 @@ def test_get_calories_no_suitable_match(client, mocker):
             {"description": "Rice paper", "fdcId": 12345}
         ]
     }
-    mocker.patch("requests.get", return_value=mock_search_response)
+    mocker.patch("httpx.AsyncClient.get", return_value=mock_search_response)
     request_data = {
         "dish_name": "Paper Plane",  # Non-existent or poor match
         "mode": "servings",
@@ -240,3 +240,141 @@ def test_get_calories_invalid_request_data(client, mocker):
     }
     response = client.post("/get-calories", json=request_data)
     assert response.status_code == 422  # Validation error
+
+
+def test_get_calories_uses_cache(client, mocker):
+    mock_search_response = MagicMock()
+    mock_search_response.status_code = 200
+    mock_search_response.json.return_value = {
+        "foods": [{"description": "Apple, raw", "fdcId": 12345}]
+    }
+    mock_details_response = MagicMock()
+    mock_details_response.status_code = 200
+    mock_details_response.json.return_value = {
+        "servingSize": 100,
+        "servingSizeUnit": "g",
+        "foodNutrients": [
+            {"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 52.0}
+        ]
+    }
+
+    def mock_get(url, params=None):
+        if "search" in url:
+            return mock_search_response
+        return mock_details_response
+
+    mock = mocker.patch("httpx.AsyncClient.get", side_effect=mock_get)
+    request_data = {"dish_name": "Apple", "mode": "servings", "servings": 1.0}
+    first = client.post("/get-calories", json=request_data)
+    second = client.post("/get-calories", json={**request_data, "dish_name": " apple "})
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json()["fdc_id"] == 12345
+    assert mock.call_count == 2  # one search and one details fetch
+
+    stats = client.get("/get-calories/cache-stats").json()
+    assert stats["search"]["hits"] == 1
+    assert stats["details"]["hits"] == 1
+
+
+def test_get_calories_negative_cache(client, mocker):
+    mock_search_response = MagicMock()
+    mock_search_response.status_code = 200
+    mock_search_response.json.return_value = {"foods": []}
+    mock = mocker.patch("httpx.AsyncClient.get", return_value=mock_search_response)
+    request_data = {"dish_name": "NonexistentFood", "mode": "servings", "servings": 1.0}
+    assert client.post("/get-calories", json=request_data).status_code == 404
+    response = client.post("/get-calories", json=request_data)
+    assert response.status_code == 404
+    assert "Dish not found" in response.json()["detail"]
+    assert mock.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_share_upstream_call(mocker):
+    import asyncio
+    from utils.lookup import fetch_search_results
+    from utils import food_cache
+    food_cache.clear()
+
+    async def slow_get(url, params=None):
+        await asyncio.sleep(0.01)
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"foods": [{"description": "Apple, raw", "fdcId": 12345}]}
+        return response
+
+    mock = mocker.patch("httpx.AsyncClient.get", side_effect=slow_get)
+    results = await asyncio.gather(*(fetch_search_results(name, None) for name in ["Apple", "apple", " APPLE"]))
+    assert all(foods[0]["fdcId"] == 12345 for foods in results)
+    assert mock.call_count == 1
+    food_cache.clear()
+
+
+def test_get_calories_views(client, mocker):
+    mock_search_response = MagicMock(status_code=200)
+    mock_search_response.json.return_value = {"foods": [{"description": "Apple, raw", "fdcId": 12345}]}
+    mock_details_response = MagicMock(status_code=200)
+    mock_details_response.json.return_value = {
+        "servingSize": 150,
+        "servingSizeUnit": "g",
+        "foodNutrients": [
+            {"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 52},
+            {"nutrient": {"id": 1003, "name": "Protein", "unitName": "g"}, "amount": 0.26},
+        ]
+    }
+    mocker.patch(
+        "httpx.AsyncClient.get",
+        side_effect=lambda url, params=None: mock_search_response if "search" in url else mock_details_response
+    )
+    request_data = {"dish_name": "Apple", "mode": "servings", "servings": 3}
+
+    data = client.post("/get-calories", json=request_data).json()
+    assert data["per_100g_nutrients"][0] == {"id": 1008, "name": "Energy", "value": 52, "unit": "kcal"}
+    assert [n["value"] for n in data["per_serving_nutrients"]] == [78.0, 0.39]
+    assert [n["value"] for n in data["total_nutrients"]] == [234.0, 1.17]
+    assert "computed_total_nutrients" not in data
+
+    data = client.post("/get-calories", params={"views": "total"}, json=request_data).json()
+    assert [n["value"] for n in data["total_nutrients"]] == [234.0, 1.17]
+    assert "per_100g_nutrients" not in data and "per_serving_nutrients" not in data
+
+    data = client.post("/get-calories", params={"views": "per_serving"}, json=request_data).json()
+    assert list(k for k in data if k.endswith("_nutrients")) == ["per_serving_nutrients"]
+
+    # Logging builds the totals internally; neither total list may leak into the response
+    data = client.post("/get-calories", params={"views": "per_100g,per_serving"}, json=dict(request_data, log=True)).json()
+    assert list(k for k in data if k.endswith("_nutrients")) == ["per_100g_nutrients", "per_serving_nutrients"]
+
+    response = client.post("/get-calories", params={"views": "total,calories"}, json=request_data)
+    assert response.status_code == 400
+
+
+def test_stale_details_are_served_while_usda_is_down(client, mocker):
+    from utils import food_cache, usda
+    food_cache.search_cache.set("search:apple", [{"fdcId": 12345, "description": "Apple"}], ttl=0)
+    food_cache.details_cache.set("details:12345", {
+        "servingSize": 100,
+        "servingSizeUnit": "g",
+        "foodNutrients": [{"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 52.0}]
+    }, ttl=0)
+    mocker.patch("httpx.AsyncClient.get", return_value=MagicMock(status_code=503, text="down"))
+    mocker.patch.object(usda.policy, "backoff", 0.001)
+
+    request_data = {"dish_name": "Apple", "mode": "servings", "servings": 1, "log": False}
+    response = client.post("/get-calories", json=request_data)
+    assert response.status_code == 200
+    assert response.json()["total_nutrients"][0]["value"] == 52.0
+    assert food_cache.cache_stats()["details"]["stale_hits"] == 1
+
+
+def test_open_circuit_fails_fast(client, mocker):
+    from utils import usda
+    mock_get = mocker.patch("httpx.AsyncClient.get")
+    for _ in range(usda.policy.breaker.failure_threshold):
+        usda.policy.breaker.record_failure()
+
+    request_data = {"dish_name": "Apple", "mode": "servings", "servings": 1}
+    response = client.post("/get-calories", json=request_data)
+    assert response.status_code == 503
+    assert "Retry-After" in response.headers
+    assert mock_get.call_count == 0
@@ -0,0 +1,101 @@
+def test_batch_success_and_totals(client, mock_usda):
+    response = client.post("/get-calories/batch", json={"items": [
+        {"dish_name": "rice", "mode": "servings", "servings": 2},
+        {"dish_name": "dal", "mode": "grams", "servings": 50},
+    ]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 2
+    assert data["failed"] == 0
+    assert [item["result"]["fdc_id"] for item in data["items"]] == [1, 2]
+    assert data["total_calories"] == 318.0
+    assert data["total_nutrients"] == [{"id": 1008, "name": "Energy", "value": 318.0, "unit": "kcal"}]
+
+
+def test_batch_views_subset_with_log(client, mock_usda):
+    response = client.post("/get-calories/batch", params={"views": "per_100g,per_serving"}, json={"items": [
+        {"dish_name": "rice", "mode": "servings", "servings": 2, "log": True},
+    ]})
+    assert response.status_code == 200
+    result = response.json()["items"][0]["result"]
+    assert list(k for k in result if k.endswith("_nutrients")) == ["per_100g_nutrients", "per_serving_nutrients"]
+    assert response.json()["total_calories"] == 260.0
+
+
+def test_batch_deduplicates_dishes(client, mock_usda):
+    response = client.post("/get-calories/batch", json={"items": [
+        {"dish_name": "rice", "mode": "servings", "servings": 1},
+        {"dish_name": " Rice ", "mode": "servings", "servings": 3},
+    ]})
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["result"]["total_servings"] for item in data["items"]] == [1, 3]
+    assert mock_usda.call_count == 2  # one search and one details fetch
+
+
+def test_batch_per_item_errors(client, mock_usda):
+    response = client.post("/get-calories/batch", json={"items": [
+        {"dish_name": "rice", "mode": "servings", "servings": 1},
+        {"dish_name": "NonexistentFood", "mode": "servings", "servings": 1},
+        {"dish_name": "dal", "mode": "servings", "servings": 0},
+    ]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data["succeeded"] == 1
+    assert data["failed"] == 2
+    assert data["items"][1] == {
+        "index": 1, "dish_name": "NonexistentFood", "status_code": 404, "error": "Dish not found"
+    }
+    assert data["items"][2]["status_code"] == 400
+    assert data["total_calories"] == 130.0
+
+
+def test_batch_empty(client):
+    response = client.post("/get-calories/batch", json={"items": []})
+    assert response.status_code == 422
+
+
+def test_batch_lookups_use_their_own_sessions(client, test_db, mocker, monkeypatch, mock_usda):
+    from utils import lookup, providers
+    from utils.providers import StaticProvider
+
+    class Session:
+        closed = False
+
+        def close(self):
+            self.closed = True
+
+    class DatabaseProvider(StaticProvider):
+        name = "database"
+        uses_db = True
+
+        async def search(self, dish_name, db):
+            sessions.append(db)
+            return await super().search(dish_name, db)
+
+    sessions = []
+    opened = mocker.patch.object(lookup, "SessionLocal", side_effect=Session)
+    monkeypatch.setattr(providers, "_resolvers", {})
+    monkeypatch.setitem(providers._providers, "database", DatabaseProvider([
+        {"fdcId": food["fdcId"], "description": food["description"], "foodNutrients": [
+            {"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": food["energy"]}
+        ]}
+        for food in mock_usda.foods.values()
+    ]))
+    monkeypatch.setattr(lookup, "FOOD_DATA_SOURCE", "database")
+    items = {"items": [
+        {"dish_name": "rice", "mode": "servings", "servings": 1},
+        {"dish_name": "dal", "mode": "servings", "servings": 1},
+    ]}
+    response = client.post("/get-calories/batch", json=items)
+    assert response.status_code == 200
+    assert response.json()["succeeded"] == 2
+    assert len(sessions) == 2 and sessions[0] is not sessions[1]
+    assert test_db not in sessions
+    assert all(session.closed for session in sessions)
+
+    # Providers that do not query the database get no session at all
+    monkeypatch.setattr(lookup, "FOOD_DATA_SOURCE", "usda")
+    opened.reset_mock()
+    assert client.post("/get-calories/batch", json=items).json()["succeeded"] == 2
+    opened.assert_not_called()
@@ -0,0 +1,66 @@
+import json
+
+
+def _results(response):
+    return sorted((json.loads(line) for line in response.text.splitlines()), key=lambda item: item["index"])
+
+
+def test_stream_ndjson(client, mock_usda):
+    rows = [
+        {"dish_name": "rice", "mode": "servings", "servings": 2},
+        {"dish_name": "dal", "mode": "grams", "servings": 50},
+        {"dish_name": "pizza", "mode": "servings", "servings": 1},
+        {"dish_name": "rice", "mode": "servings", "servings": 0},
+        {"dish_name": "rice"},
+    ]
+    body = "\n".join(json.dumps(row) for row in rows) + "\n\nnot json\n"
+    response = client.post(
+        "/get-calories/stream", params={"views": "total"}, content=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    items = _results(response)
+    assert [item["index"] for item in items] == [0, 1, 2, 3, 4, 5]
+    assert [item["status_code"] for item in items] == [200, 200, 404, 400, 422, 400]
+    assert items[0]["result"]["total_nutrients"][0]["value"] == 260.0
+    assert "per_100g_nutrients" not in items[0]["result"]
+    assert items[1]["result"]["total_nutrients"][0]["value"] == 58.0
+    assert "servings" in items[4]["error"]
+    assert items[5]["error"] == "Invalid JSON"
+    # Repeated dishes are served from the cache
+    assert mock_usda.call_count == 5
+
+
+def test_stream_csv(client, mock_usda):
+    body = '﻿Dish_Name,mode,servings\nrice,servings,1\n"dal",grams,200\n'.encode()
+    response = client.post("/get-calories/stream", content=body, headers={"Content-Type": "text/csv"})
+    items = _results(response)
+    assert [(item["dish_name"], item["result"]["total_nutrients"][0]["value"]) for item in items] == [
+        ("rice", 130.0), ("dal", 232.0)
+    ]
+
+
+def test_stream_bounded_concurrency(client, mocker):
+    import asyncio
+    from routers import calories
+    mocker.patch.object(calories, "STREAM_CONCURRENCY", 3)
+    in_flight = peak = 0
+
+    async def slow_lookup(dish_name):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        raise calories.HTTPException(status_code=404, detail="Dish not found")
+
+    mocker.patch.object(calories, "lookup_food", side_effect=slow_lookup)
+
+    def body():
+        for i in range(50):
+            yield json.dumps({"dish_name": f"dish {i}", "mode": "servings", "servings": 1}).encode() + b"\n"
+
+    response = client.post("/get-calories/stream", content=body())
+    assert len(response.text.splitlines()) == 50
+    assert peak == 3
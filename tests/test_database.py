@@ -0,0 +1,63 @@
+import pytest
+import database
+from database import async_database_url, engine_options
+
+
+def test_async_database_url():
+    assert async_database_url("postgresql://u:p@db:5432/mealdb") == "postgresql+asyncpg://u:p@db:5432/mealdb"
+    assert async_database_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+
+
+def test_engine_options_postgres(monkeypatch):
+    monkeypatch.setattr(database, "DB_POOL_SIZE", 20)
+    monkeypatch.setattr(database, "DB_MAX_OVERFLOW", 0)
+    monkeypatch.setattr(database, "DB_STATEMENT_TIMEOUT_MS", 5000)
+    options = engine_options("postgresql://u:p@db/mealdb")
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 0
+    assert options["connect_args"] == {"options": "-c statement_timeout=5000"}
+    async_options = engine_options("postgresql+asyncpg://u:p@db/mealdb", is_async=True)
+    assert async_options["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+
+
+def test_engine_options_sqlite():
+    options = engine_options("sqlite:///./test.db")
+    assert "pool_size" not in options
+    assert "connect_args" not in options
+
+
+@pytest.mark.asyncio
+async def test_async_user_helpers(test_engine):
+    from datetime import datetime, timedelta
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from schemas import UserCreate
+    from utils.auth import create_user_async, get_revocations_async, get_user_by_email_async, revoke_user_tokens
+
+    async_engine = create_async_engine(async_database_url(str(test_engine.url)))
+    session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    try:
+        async with session_factory() as db:
+            user = UserCreate(first_name="Gina", last_name="Park", email="gina@example.com", password="password123")
+            created = await create_user_async(db, user, hashed_password="hashed")
+            found = await get_user_by_email_async(db, "gina@example.com")
+            assert found.id == created.id
+            assert await get_user_by_email_async(db, "nobody@example.com") is None
+
+            await db.run_sync(lambda sync_db: revoke_user_tokens(sync_db, created.id))
+            revocations = await get_revocations_async(db, datetime.utcnow() - timedelta(minutes=1))
+            assert created.id in revocations
+    finally:
+        await async_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_get_async_db_falls_back_to_sync_session(monkeypatch):
+    from sqlalchemy.orm import Session
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    sessions = database.get_async_db()
+    db = await sessions.__anext__()
+    assert isinstance(db, Session)
+    closed = []
+    monkeypatch.setattr(db, "close", lambda: closed.append(True))
+    await sessions.aclose()
+    assert closed == [True]
@@ -0,0 +1,46 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+from schemas import CalorieRequest
+from utils import jobs
+
+
+@pytest.mark.asyncio
+async def test_job_lifecycle(client, test_db, mock_usda):
+    response = client.post("/jobs", json={"views": "total", "items": [
+        {"dish_name": "rice", "mode": "servings", "servings": 2},
+        {"dish_name": "pizza", "mode": "servings", "servings": 1},
+        {"dish_name": "dal", "mode": "grams", "servings": 50},
+    ]})
+    assert response.status_code == 202
+    job = response.json()
+    assert (job["status"], job["total_items"], job["progress"]) == ("queued", 3, 0.0)
+
+    page = client.get(f"/jobs/{job['id']}/results").json()
+    assert [item["status"] for item in page["items"]] == ["queued"] * 3
+
+    processed = await jobs.drain(sessionmaker(bind=test_db.get_bind()), batch_size=2)
+    assert processed == 3
+
+    test_db.expire_all()
+    status = client.get(f"/jobs/{job['id']}").json()
+    assert status["status"] == "completed"
+    assert (status["done_items"], status["failed_items"], status["progress"]) == (3, 1, 1.0)
+    assert status["finished_at"] is not None
+
+    first = client.get(f"/jobs/{job['id']}/results", params={"limit": 2}).json()
+    assert [item["index"] for item in first["items"]] == [0, 1]
+    assert first["items"][0]["result"]["total_nutrients"][0]["value"] == 260.0
+    assert "per_100g_nutrients" not in first["items"][0]["result"]
+    assert (first["items"][1]["status_code"], first["items"][1]["error"]) == (404, "Dish not found")
+    second = client.get(f"/jobs/{job['id']}/results", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [item["dish_name"] for item in second["items"]] == ["dal"]
+    assert second["next_cursor"] is None
+
+
+def test_job_validation_and_ownership(client, test_db):
+    item = {"dish_name": "rice", "mode": "servings", "servings": 1}
+    assert client.post("/jobs", json={"items": []}).status_code == 422
+    assert client.post("/jobs", json={"items": [item], "views": "calories"}).status_code == 400
+    job = jobs.create_job(test_db, 2, [CalorieRequest(**item)])
+    assert client.get(f"/jobs/{job.id}").status_code == 404
+    assert client.get(f"/jobs/{job.id}/results").status_code == 404
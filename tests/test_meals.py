@@ -0,0 +1,87 @@
+from datetime import datetime
+from schemas import CalorieRequest
+from utils.meals import log_meal
+
+
+def make_result(fdc_id=1, energy=100.0, protein=5.0):
+    return {
+        "fdc_id": fdc_id,
+        "selected_food": "Rice",
+        "total_servings": 1.0,
+        "total_nutrients": [
+            {"id": 1008, "name": "Energy", "value": energy, "unit": "kcal"},
+            {"id": 1003, "name": "Protein", "value": protein, "unit": "g"},
+        ],
+    }
+
+
+def log(test_db, logged_at, user_id=1, **kwargs):
+    request = CalorieRequest(dish_name="rice", mode="servings", servings=1)
+    return log_meal(test_db, user_id, request, make_result(**kwargs), logged_at=logged_at)
+
+
+def test_get_calories_logs_meal(client, test_db, mock_usda):
+    response = client.post("/get-calories", json={"dish_name": "Apple", "mode": "servings", "servings": 2, "log": True})
+    assert response.status_code == 200
+    assert "meal_entry_id" in response.json()
+    # Lookups are not logged unless asked to
+    response = client.post("/get-calories", json={"dish_name": "Apple", "mode": "servings", "servings": 1})
+    assert "meal_entry_id" not in response.json()
+
+    history = client.get("/meals").json()
+    assert len(history["items"]) == 1
+    item = history["items"][0]
+    assert item["fdc_id"] == 12345
+    assert item["calories"] == 104.0
+    assert item["total_nutrients"] == [{"id": 1008, "name": "Energy", "value": 104.0, "unit": "kcal"}]
+
+
+def test_meal_history_keyset_pagination(client, test_db):
+    for hour in range(5):
+        log(test_db, datetime(2026, 10, 1, hour))
+    log(test_db, datetime(2026, 10, 1, 12), user_id=2)
+
+    first = client.get("/meals", params={"limit": 2}).json()
+    assert [item["logged_at"] for item in first["items"]] == ["2026-10-01T04:00:00", "2026-10-01T03:00:00"]
+    second = client.get("/meals", params={"limit": 2, "cursor": first["next_cursor"]}).json()
+    assert [item["logged_at"] for item in second["items"]] == ["2026-10-01T02:00:00", "2026-10-01T01:00:00"]
+    last = client.get("/meals", params={"limit": 2, "cursor": second["next_cursor"]}).json()
+    assert len(last["items"]) == 1
+    assert last["next_cursor"] is None
+
+
+def test_meal_history_invalid_cursor(client):
+    response = client.get("/meals", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_meal_summary_daily(client, test_db):
+    log(test_db, datetime(2026, 10, 5, 8), energy=100.0)
+    log(test_db, datetime(2026, 10, 5, 20), energy=250.5)
+    log(test_db, datetime(2026, 10, 6, 9), energy=80.0, protein=2.0)
+    log(test_db, datetime(2026, 10, 9, 9), energy=999.0)  # outside the range
+
+    response = client.get("/meals/summary", params={"start": "2026-10-05", "end": "2026-10-06"})
+    assert response.status_code == 200
+    totals = response.json()["totals"]
+    assert [day["period_start"] for day in totals] == ["2026-10-05", "2026-10-06"]
+    assert totals[0]["calories"] == 350.5
+    assert {"id": 1003, "name": "Protein", "value": 10.0, "unit": "g"} in totals[0]["nutrients"]
+    assert totals[1]["calories"] == 80.0
+
+
+def test_meal_summary_weekly(client, test_db):
+    log(test_db, datetime(2026, 10, 5, 8))   # Monday
+    log(test_db, datetime(2026, 10, 11, 8))  # Sunday of the same week
+    log(test_db, datetime(2026, 10, 12, 8))  # next Monday
+
+    response = client.get("/meals/summary", params={"period": "week", "start": "2026-10-01", "end": "2026-10-14"})
+    totals = response.json()["totals"]
+    assert [(week["period_start"], week["calories"]) for week in totals] == [
+        ("2026-10-05", 200.0), ("2026-10-12", 100.0)
+    ]
+
+
+def test_meal_summary_invalid_range(client):
+    response = client.get("/meals/summary", params={"start": "2026-10-06", "end": "2026-10-05"})
+    assert response.status_code == 400
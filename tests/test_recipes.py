@@ -0,0 +1,54 @@
+def _smoothie(client):
+    return client.post("/recipes", json={"name": "Rice bowl", "servings": 2, "ingredients": [
+        {"dish_name": "rice", "mode": "grams", "amount": 200},
+        {"fdc_id": 2, "mode": "servings", "amount": 1},
+    ]})
+
+
+def test_create_and_read_recipe(client, mock_usda):
+    response = _smoothie(client)
+    assert response.status_code == 201
+    recipe = response.json()
+    assert recipe["calories"] == 376.0
+    assert recipe["total_nutrients"] == [{"id": 1008, "name": "Energy", "value": 376.0, "unit": "kcal"}]
+    assert recipe["per_serving_nutrients"][0]["value"] == 188.0
+    assert [i["fdc_id"] for i in recipe["ingredients"]] == [1, 2]
+
+    calls = mock_usda.call_count
+    assert client.get(f"/recipes/{recipe['id']}").json()["calories"] == 376.0
+    assert mock_usda.call_count == calls
+    assert client.get("/recipes").json()["items"][0]["name"] == "Rice bowl"
+
+
+def test_nested_recipes_and_cycles(client, mock_usda):
+    bowl = _smoothie(client).json()
+    meal = client.post("/recipes", json={"name": "Meal prep", "ingredients": [
+        {"recipe_id": bowl["id"], "mode": "servings", "amount": 3},
+        {"dish_name": "dal", "mode": "grams", "amount": 100},
+    ]}).json()
+    assert meal["calories"] == 3 * 188.0 + 116.0
+
+    # Editing the inner recipe is reflected in the outer one on its next read
+    response = client.put(f"/recipes/{bowl['id']}", json={"name": "Rice bowl", "servings": 2, "ingredients": [
+        {"fdc_id": 1, "mode": "grams", "amount": 100},
+    ]})
+    assert response.json()["calories"] == 130.0
+    assert client.get(f"/recipes/{meal['id']}").json()["calories"] == 3 * 65.0 + 116.0
+
+    response = client.put(f"/recipes/{bowl['id']}", json={"name": "Loop", "ingredients": [
+        {"recipe_id": meal["id"], "mode": "servings", "amount": 1},
+    ]})
+    assert response.status_code == 400
+    assert client.get(f"/recipes/{bowl['id']}").json()["name"] == "Rice bowl"
+    assert client.delete(f"/recipes/{bowl['id']}").status_code == 409
+    assert client.delete(f"/recipes/{meal['id']}").status_code == 204
+    assert client.delete(f"/recipes/{bowl['id']}").status_code == 204
+
+
+def test_recipe_validation(client):
+    assert client.post("/recipes", json={"name": "x", "ingredients": [
+        {"fdc_id": 1, "dish_name": "rice", "amount": 1}
+    ]}).status_code == 422
+    assert client.post("/recipes", json={"name": "x", "ingredients": [
+        {"recipe_id": 999, "mode": "servings", "amount": 1}
+    ]}).status_code == 400
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+from utils import food_cache
+from utils.cache import MISSING, TTLCache
+
+
+def test_ttl_cache_hit_and_miss():
+    cache = TTLCache(maxsize=10, ttl=60)
+    assert cache.get("apple") is MISSING
+    cache.set("apple", {"fdcId": 1})
+    assert cache.get("apple") == {"fdcId": 1}
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+
+def test_ttl_cache_expiry():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("apple", 1, ttl=0)
+    assert cache.get("apple") is MISSING
+
+
+def test_ttl_cache_stale_window():
+    cache = TTLCache(maxsize=10, ttl=60, stale_ttl=60)
+    cache.set("apple", 1, ttl=0)
+    assert cache.get("apple") is MISSING
+    assert cache.get_stale("apple") == 1
+    assert cache.stale_hits == 1
+
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("apple", 1, ttl=0)
+    assert cache.get_stale("apple") is MISSING
+
+
+def test_ttl_cache_lru_eviction():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")  # "b" is now least recently used
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_ttl_cache_stores_falsy_values():
+    cache = TTLCache()
+    cache.set("nothing", [])
+    assert cache.get("nothing") == []
+
+
+@pytest.mark.asyncio
+async def test_search_key_is_normalized():
+    food_cache.clear()
+    await food_cache.set_search("Chicken  Biryani ", [{"fdcId": 1, "description": "Chicken biryani"}])
+    assert await food_cache.get_search("chicken biryani") == [{"fdcId": 1, "description": "Chicken biryani"}]
+
+
+@pytest.mark.asyncio
+async def test_database_tier(test_db, monkeypatch):
+    from models import MealEntry
+    monkeypatch.setattr(food_cache, "FOOD_CACHE_DB_ENABLED", True)
+    monkeypatch.setattr(food_cache, "SessionLocal", sessionmaker(bind=test_db.get_bind()))
+    food_cache.clear()
+    # The cache writes with a session of its own and never commits the caller's
+    test_db.add(MealEntry(user_id=1, dish_name="pending"))
+    await food_cache.set_details(12345, {"servingSize": 100})
+    test_db.rollback()
+    assert test_db.query(MealEntry).count() == 0
+
+    # A fresh in-process tier falls through to the database and promotes the entry
+    food_cache.details_cache.clear()
+    assert await food_cache.get_details(12345) == {"servingSize": 100}
+    assert food_cache.db_stats["hits"] == 1
+    assert await food_cache.get_details(12345) == {"servingSize": 100}
+    assert food_cache.details_cache.hits == 1
+    assert await food_cache.get_details(99999) is MISSING
+    assert food_cache.db_stats["misses"] == 1
@@ -1,5 +1,5 @@
 import pytest
-from utils.calories import select_best_food
+from utils.calories import score_matrix, select_best_food, select_best_foods
 
 
 def test_select_best_food_exact_match():
@@ -75,3 +75,31 @@ def test_select_best_food_different_word_order():
     # Test matching with different word order
     best = select_best_food(foods, "mutton biryani")
     assert best["description"] == "Biryani, mutton"
+
+
+def test_select_best_foods_batch():
+    foods = [
+        {"description": "Biryani, mutton"},
+        {"description": "Chicken biryani"},
+        {"description": "Pizza, cheese"}
+    ]
+    best = select_best_foods(foods, ["mutton biryani", "cheese pizza", "Paneer tikka"])
+    assert best[0]["description"] == "Biryani, mutton"
+    assert best[1]["description"] == "Pizza, cheese"
+    assert best[2] is None
+
+
+def test_score_matrix_shape_and_rounding():
+    scores = score_matrix(["apple", "aple"], ["Apple, raw", "Banana, raw", ""])
+    assert scores.shape == (2, 3)
+    assert scores[0, 0] == 71
+    assert scores[1, 0] == 62
+    assert scores[0, 2] == 0
+
+
+def test_select_best_food_tie_keeps_first():
+    foods = [
+        {"description": "Raw apple", "fdcId": 1},
+        {"description": "Apple raw", "fdcId": 2}
+    ]
+    assert select_best_food(foods, "apple raw")["fdcId"] == 1
@@ -0,0 +1,43 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from utils.compression import CompressionMiddleware, choose_encoding
+
+
+def make_client():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/big")
+    def big():
+        return {"nutrients": [{"id": i, "name": "Energy", "value": 1.0, "unit": "kcal"} for i in range(50)]}
+
+    @app.get("/small")
+    def small():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br", brotli_available=True) == "br"
+    assert choose_encoding("gzip, deflate, br", brotli_available=False) == "gzip"
+    assert choose_encoding("br;q=0.5, gzip", brotli_available=True) == "gzip"
+    assert choose_encoding("gzip;q=0", brotli_available=False) is None
+    assert choose_encoding("*", brotli_available=False) == "gzip"
+    assert choose_encoding("identity", brotli_available=True) is None
+    assert choose_encoding("", brotli_available=True) is None
+
+
+def test_compresses_large_responses():
+    client = make_client()
+    response = client.get("/big", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert int(response.headers["content-length"]) < len(response.content)
+    assert len(response.json()["nutrients"]) == 50
+
+
+def test_skips_small_or_unaccepted_responses():
+    client = make_client()
+    assert "content-encoding" not in client.get("/small", headers={"Accept-Encoding": "gzip"}).headers
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
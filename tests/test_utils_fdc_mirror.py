@@ -0,0 +1,99 @@
+import io
+import json
+import pytest
+from utils import fdc_mirror
+from utils.fdc_ingest import ingest, iter_json_array
+
+
+FOODS = [
+    {
+        "fdcId": 1001,
+        "description": "Apple, raw",
+        "dataType": "Foundation",
+        "foodNutrients": [
+            {"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 52.0},
+            {"nutrient": {"id": 1003, "name": "Protein", "unitName": "g"}, "amount": 0.3}
+        ]
+    },
+    {
+        "fdcId": 1002,
+        "description": "Chicken biryani",
+        "dataType": "Branded",
+        "servingSize": 250,
+        "servingSizeUnit": "g",
+        "householdServingFullText": "1 cup",
+        "foodNutrients": [
+            {"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 180.0},
+            {"nutrient": {"id": 1003, "name": "Protein", "unitName": "g"}}
+        ]
+    }
+]
+
+
+@pytest.fixture
+def json_export(tmp_path):
+    path = tmp_path / "foundation.json"
+    path.write_text(json.dumps({"FoundationFoods": FOODS}))
+    return str(path)
+
+
+def test_iter_json_array_small_chunks():
+    fp = io.StringIO(json.dumps({"FoundationFoods": FOODS}, indent=2))
+    assert list(iter_json_array(fp, chunk_size=7)) == FOODS
+
+
+def test_iter_json_array_empty():
+    assert list(iter_json_array(io.StringIO('{"SurveyFoods": []}'))) == []
+
+
+def test_ingest_json(test_db, json_export):
+    counts = ingest(test_db, json_export, batch_size=1)
+    assert counts == {"foods": 2, "nutrients": 2, "food_nutrients": 3}
+
+
+def test_ingest_csv(test_db, tmp_path):
+    (tmp_path / "nutrient.csv").write_text('"id","name","unit_name"\n"1008","Energy","KCAL"\n')
+    (tmp_path / "food.csv").write_text(
+        '"fdc_id","data_type","description"\n"2001","branded_food","Paneer tikka"\n'
+    )
+    (tmp_path / "branded_food.csv").write_text(
+        '"fdc_id","serving_size","serving_size_unit","household_serving_fulltext"\n"2001","120","g","4 pieces"\n'
+    )
+    (tmp_path / "food_nutrient.csv").write_text(
+        '"id","fdc_id","nutrient_id","amount"\n"1","2001","1008","210"\n"2","2001","1008",""\n'
+    )
+    counts = ingest(test_db, str(tmp_path))
+    assert counts == {"foods": 1, "nutrients": 1, "food_nutrients": 1}
+
+    details = fdc_mirror.get_food_details(test_db, 2001)
+    assert details["servingSize"] == 120
+    assert details["householdServingFullText"] == "4 pieces"
+    assert details["foodNutrients"][0]["amount"] == 210
+
+
+def test_search_and_details(test_db, json_export):
+    ingest(test_db, json_export)
+    foods = fdc_mirror.search_foods(test_db, "biryani")
+    assert foods == [{"fdcId": 1002, "description": "Chicken biryani"}]
+
+    details = fdc_mirror.get_food_details(test_db, 1001)
+    assert details["description"] == "Apple, raw"
+    assert "servingSize" not in details
+    assert {n["nutrient"]["id"] for n in details["foodNutrients"]} == {1008, 1003}
+    assert fdc_mirror.get_food_details(test_db, 9999) is None
+
+
+def test_get_calories_local_source(client, test_db, json_export, mocker, monkeypatch):
+    from utils import lookup
+    ingest(test_db, json_export)
+    monkeypatch.setattr(lookup, "FOOD_DATA_SOURCE", "local")
+    mock_get = mocker.patch("httpx.AsyncClient.get")
+
+    response = client.post("/get-calories", json={
+        "dish_name": "chicken biryani", "mode": "servings", "servings": 2
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["fdc_id"] == 1002
+    assert data["total_nutrients"][0]["value"] == 900.0
+    mock_get.assert_not_called()
@@ -0,0 +1,80 @@
+import pytest
+from utils import food_index
+from utils.calories import select_best_food
+from utils.food_index import FoodIndex
+
+FOODS = [
+    (1, "Apple, raw"),
+    (2, "Banana, raw"),
+    (3, "Chicken biryani"),
+    (4, "Biryani, mutton"),
+    (5, "Pizza, cheese"),
+]
+
+
+def test_resolve_matches_select_best_food():
+    index = FoodIndex.build(FOODS)
+    foods = [{"fdcId": fdc_id, "description": description} for fdc_id, description in FOODS]
+    for query in ["apple", "Aple", "mutton biryani", "cheese pizza", "Paneer tikka"]:
+        best = select_best_food(foods, query)
+        assert index.resolve(query) == (best["fdcId"] if best else None)
+
+
+def test_search_returns_usda_shape():
+    index = FoodIndex.build(FOODS)
+    results = index.search("biryani", limit=2)
+    assert {food["fdcId"] for food in results} == {3, 4}
+    assert results[0]["description"] in ("Chicken biryani", "Biryani, mutton")
+
+
+def test_search_no_candidates():
+    index = FoodIndex.build(FOODS)
+    assert index.search("xyz") == []
+    assert index.resolve("xyz") is None
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "foods.idx")
+    FoodIndex.build(FOODS).save(path)
+    index = FoodIndex.load(path)
+    assert len(index) == len(FOODS)
+    assert index.description(2) == "Chicken biryani"
+    assert index.processed_text(2) == "biryani chicken"
+    assert index.resolve("chicken biryani") == 3
+
+
+def test_load_rejects_other_files(tmp_path):
+    path = tmp_path / "not_an_index"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        FoodIndex.load(str(path))
+
+
+def test_build_from_db(test_db):
+    from models import Food
+    test_db.add_all([Food(fdc_id=fdc_id, description=description) for fdc_id, description in FOODS])
+    test_db.commit()
+    index = FoodIndex.build_from_db(test_db)
+    assert len(index) == len(FOODS)
+    assert index.resolve("banana") == 2
+
+
+def test_get_calories_uses_index(client, test_db, mocker, monkeypatch):
+    from models import Food, FoodNutrient, Nutrient
+    from utils import lookup
+    test_db.add(Food(fdc_id=3, description="Chicken biryani"))
+    test_db.add(Nutrient(id=1008, name="Energy", unit_name="kcal"))
+    test_db.add(FoodNutrient(fdc_id=3, nutrient_id=1008, amount=180.0))
+    test_db.commit()
+    monkeypatch.setattr(lookup, "FOOD_DATA_SOURCE", "local")
+    food_index.set_index(FoodIndex.build(FOODS))
+    search = mocker.patch("utils.fdc_mirror.search_foods")
+    try:
+        response = client.post("/get-calories", json={
+            "dish_name": "chicken biryani", "mode": "servings", "servings": 1
+        })
+    finally:
+        food_index.set_index(None)
+    assert response.status_code == 200
+    assert response.json()["fdc_id"] == 3
+    search.assert_not_called()
@@ -0,0 +1,45 @@
+import pytest
+from datetime import datetime, timedelta
+from models import Job, JobItem
+from schemas import CalorieRequest
+from utils import jobs
+
+
+def _requests(count):
+    return [CalorieRequest(dish_name=f"dish {i}", mode="servings", servings=1) for i in range(count)]
+
+
+def test_claims_do_not_overlap(test_db):
+    job = jobs.create_job(test_db, 1, _requests(5))
+    first_token, first = jobs.claim_items(test_db, limit=3)
+    second_token, second = jobs.claim_items(test_db, limit=3)
+    assert len(first) == 3 and len(second) == 2
+    assert not {row[0] for row in first} & {row[0] for row in second}
+    assert jobs.claim_items(test_db)[1] == []
+    test_db.refresh(job)
+    assert job.status == "running" and job.started_at is not None
+
+
+def test_expired_claims_are_retried_and_stale_results_ignored(test_db):
+    job = jobs.create_job(test_db, 1, _requests(1))
+    old_token, claimed = jobs.claim_items(test_db)
+    item_id = claimed[0][0]
+    test_db.query(JobItem).update({"claimed_at": datetime.utcnow() - timedelta(seconds=jobs.JOB_LEASE_SECONDS + 1)})
+    test_db.commit()
+
+    token, reclaimed = jobs.claim_items(test_db)
+    assert [row[0] for row in reclaimed] == [item_id]
+    assert reclaimed[0][3] == 2  # attempts
+    assert jobs.complete_items(test_db, old_token, [(item_id, job.id, 200, {}, None)]) == 0
+    assert jobs.complete_items(test_db, token, [(item_id, job.id, 404, None, "Dish not found")]) == 1
+
+    job = test_db.get(Job, job.id)
+    test_db.refresh(job)
+    assert (job.status, job.done_items, job.failed_items) == ("completed", 1, 1)
+
+
+@pytest.mark.asyncio
+async def test_items_give_up_after_max_attempts():
+    assert await jobs.resolve_item({}, jobs.JOB_MAX_ATTEMPTS + 1, None, None) == (
+        500, None, f"Gave up after {jobs.JOB_MAX_ATTEMPTS} attempts"
+    )
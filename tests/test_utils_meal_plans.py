@@ -0,0 +1,38 @@
+import pytest
+from utils.meal_plans import PlanError, iter_lines, iter_rows
+
+
+async def _chunks(*chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _collect(gen):
+    return [item async for item in gen]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_across_chunks():
+    lines = await _collect(iter_lines(_chunks(b'{"a"', b': 1}\r\n{"b": 2}\n', b"tail")))
+    assert lines == [b'{"a": 1}', b'{"b": 2}', b"tail"]
+
+
+@pytest.mark.asyncio
+async def test_iter_lines_rejects_long_lines():
+    with pytest.raises(PlanError):
+        await _collect(iter_lines(_chunks(b"x" * 10, b"x" * 10), max_line_bytes=16))
+
+
+@pytest.mark.asyncio
+async def test_iter_rows_csv():
+    lines = _chunks(b"dish_name, Mode ,servings", b"", b'"rice, white",servings,2', b"\xff")
+    rows = await _collect(iter_rows(lines, "csv"))
+    assert rows[0] == (0, {"dish_name": "rice, white", "mode": "servings", "servings": "2"})
+    assert rows[1][0] == 1 and isinstance(rows[1][1], PlanError)
+
+
+@pytest.mark.asyncio
+async def test_iter_rows_ndjson():
+    rows = await _collect(iter_rows(_chunks(b'\xef\xbb\xbf{"dish_name": "rice"}', b"[1]", b"{")))
+    assert rows[0] == (0, {"dish_name": "rice"})
+    assert [str(row) for _, row in rows[1:]] == ["Each line must be a JSON object", "Invalid JSON"]
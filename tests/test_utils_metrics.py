@@ -0,0 +1,63 @@
+import pytest
+from utils import metrics
+
+
+@pytest.fixture
+def enabled_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.reset()
+    metrics.inc("things_total")
+    with metrics.stage("work"):
+        pass
+    assert metrics.stage("work") is metrics.stage("other")
+    assert metrics.render() == "\n"
+
+
+def test_render_prometheus_text(enabled_metrics):
+    metrics.inc("things_total", kind='a"b')
+    metrics.inc("things_total", 2, kind='a"b')
+    metrics.observe("latency_seconds", 0.003)
+    metrics.observe("latency_seconds", 20.0)
+    text = metrics.render()
+    assert "# TYPE things_total counter" in text
+    assert 'things_total{kind="a\\"b"} 3' in text
+    assert 'latency_seconds_bucket{le="0.0025"} 0' in text
+    assert 'latency_seconds_bucket{le="0.005"} 1' in text
+    assert 'latency_seconds_bucket{le="10.0"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in text
+    assert "latency_seconds_count 2" in text
+
+
+def test_calorie_request_reports_stages(client, mock_usda, enabled_metrics):
+    response = client.post("/get-calories", json={"dish_name": "Apple", "mode": "servings", "servings": 1, "log": True})
+    assert response.status_code == 200
+    stages = [part.split(";")[0] for part in response.headers["server-timing"].split(", ")]
+    for stage in ("usda_search", "match", "usda_details", "nutrients", "meal_log", "total"):
+        assert stage in stages
+
+    text = client.get("/metrics").text
+    assert 'http_requests_total{method="POST",route="/get-calories",status="200"} 1' in text
+    assert 'stage_duration_seconds_count{stage="usda_search"} 1' in text
+
+
+def test_get_db_counts_sessions(enabled_metrics):
+    from database import get_db
+    sessions = get_db()
+    next(sessions)
+    sessions.close()
+    text = metrics.render()
+    assert 'db_sessions_total{kind="sync"} 1' in text
+    assert 'stage="db_session_open"' not in text
+    assert 'stage_duration_seconds_count{stage="db_session_close"} 1' in text
+
+
+def test_metrics_endpoint_hidden_when_disabled(client, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    assert client.get("/metrics").status_code == 404
@@ -0,0 +1,61 @@
+import random
+import numpy as np
+import pytest
+from utils.nutrients import ALL_VIEWS, NutrientTable, normalize_details, normalize_nutrients, parse_views, round2
+
+
+def nutrient(nut_id, name, unit, amount):
+    return {"nutrient": {"id": nut_id, "name": name, "unitName": unit}, "amount": amount}
+
+
+def test_round2_matches_builtin_round():
+    rng = random.Random(7)
+    values = [round(rng.uniform(0, 500), 3) * round(rng.uniform(0, 5), 2) for _ in range(20000)]
+    values += [1.115, 2.675, 0.285, 1.005, 0.0]
+    assert round2(np.array(values)).tolist() == [round(value, 2) for value in values]
+
+
+def test_parse_skips_empty_and_malformed_and_converts_kj():
+    table = NutrientTable.parse([
+        nutrient(1008, "Energy", "kJ", 418.4),
+        nutrient(1003, "Protein", "g", 0.0),
+        nutrient(1004, "Fat", "g", None),
+        {"amount": 3.0},
+        nutrient(1005, "Carbohydrate", "g", 12),
+    ])
+    assert table.ids == [1008, 1005]
+    assert table.units == ["kcal", "g"]
+    assert table.values == [100.0, 12]
+    assert table.records(table.scale(table.per_100g, 1.5)) == [
+        {"id": 1008, "name": "Energy", "value": 150.0, "unit": "kcal"},
+        {"id": 1005, "name": "Carbohydrate", "value": 18.0, "unit": "g"},
+    ]
+
+
+def test_parse_views():
+    assert parse_views(None) == ALL_VIEWS
+    assert parse_views("total, per_serving") == {"total", "per_serving"}
+    with pytest.raises(ValueError):
+        parse_views("total,calories")
+
+
+def test_normalize_nutrients_converts_flat_shapes():
+    detail = nutrient(1003, "Protein", "g", 3.1)
+    normalized = normalize_nutrients([
+        detail,
+        {"nutrientId": 1008, "nutrientName": "Energy", "unitName": "KCAL", "value": 52},
+        {"id": 1093, "name": "Sodium, Na", "unit": "MG", "amount": 1.0},
+        {"nutrientName": "No id", "value": 1.0},
+    ])
+    assert normalized[0] is detail
+    assert normalized[1:] == [
+        nutrient(1008, "Energy", "kcal", 52),
+        nutrient(1093, "Sodium, Na", "mg", 1.0),
+    ]
+
+
+def test_normalize_details_keeps_normalized_details():
+    details = {"servingSize": 100, "foodNutrients": [nutrient(1008, "Energy", "kcal", 52.0)]}
+    assert normalize_details(details) is details
+    abridged = {"foodNutrients": [{"nutrientId": 1008, "nutrientName": "Energy", "unitName": "KJ", "value": 418.4}]}
+    assert normalize_details(abridged)["foodNutrients"] == [nutrient(1008, "Energy", "kJ", 418.4)]
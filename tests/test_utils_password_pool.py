@@ -0,0 +1,42 @@
+import pytest
+from utils import password_pool
+from utils.auth import pwd_context
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_in_process_pool():
+    try:
+        hashed = await password_pool.hash_password("password123")
+        assert pwd_context.verify("password123", hashed)
+        assert await password_pool.verify_password("password123", hashed)
+        assert not await password_pool.verify_password("wrongpassword", hashed)
+    finally:
+        password_pool.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_hash_in_thread_pool(monkeypatch):
+    monkeypatch.setattr(password_pool, "PASSWORD_HASH_WORKERS", 0)
+    hashed = await password_pool.hash_password("password123")
+    assert await password_pool.verify_password("password123", hashed)
+    assert password_pool.get_executor() is None
+
+
+@pytest.mark.asyncio
+async def test_saturated_pool_fails_fast(monkeypatch):
+    monkeypatch.setattr(password_pool, "PASSWORD_HASH_MAX_PENDING", 0)
+    with pytest.raises(password_pool.PoolSaturated):
+        await password_pool.hash_password("password123")
+    assert password_pool.pending() == 0
+
+
+def test_login_returns_503_when_saturated(client, monkeypatch):
+    monkeypatch.setattr(password_pool, "PASSWORD_HASH_MAX_PENDING", 0)
+    response = client.post("/auth/register", json={
+        "first_name": "Frank",
+        "last_name": "Ocean",
+        "email": "frank@example.com",
+        "password": "password123"
+    })
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,252 @@
+import asyncio
+import json
+import time
+import pytest
+from fastapi.concurrency import run_in_threadpool
+from fastapi import HTTPException
+from utils import providers
+from utils.providers import FoodProvider, ProviderResolver, StaticProvider
+
+
+def food(fdc_id, description, kcal):
+    return {
+        "fdcId": fdc_id,
+        "description": description,
+        "servingSize": 100,
+        "servingSizeUnit": "g",
+        "foodNutrients": [{"id": 1008, "name": "Energy", "unit": "KCAL", "amount": kcal}],
+    }
+
+
+class SlowProvider(FoodProvider):
+    """Wraps a provider, answering searches after ``delay`` seconds."""
+
+    def __init__(self, name, inner, delay=0.0, error=None):
+        self.name = name
+        self.inner = inner
+        self.delay = delay
+        self.error = error
+        self.cancelled = False
+
+    async def search(self, dish_name, db):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return await self.inner.search(dish_name, db)
+
+    async def details(self, fdc_id, db):
+        return await self.inner.details(fdc_id, db)
+
+
+FAST = StaticProvider([food(1, "Apple, raw", 52.0)])
+EXACT = StaticProvider([food(2, "Apple pie", 237.0), food(3, "Apples, raw, with skin", 52.0)])
+
+
+def test_providers_must_implement_both_lookups():
+    class SearchOnly(FoodProvider):
+        name = "search-only"
+
+        async def search(self, dish_name, db):
+            return []
+
+    with pytest.raises(TypeError):
+        SearchOnly()
+
+
+@pytest.mark.asyncio
+async def test_stages_are_named_after_providers(monkeypatch):
+    from utils import lookup, metrics
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.reset()
+    monkeypatch.setattr(providers, "_resolvers", {})
+    providers.register_provider(StaticProvider([food(7, "Chicken biryani", 180.0)]))
+    monkeypatch.setattr(lookup, "FOOD_DATA_SOURCE", "static")
+    try:
+        await lookup.lookup_food("chicken biryani", None)
+        text = metrics.render()
+    finally:
+        providers._providers.pop("static")
+        metrics.reset()
+    assert 'stage_duration_seconds_count{stage="static_search"} 1' in text
+    assert 'stage_duration_seconds_count{stage="static_details"} 1' in text
+    assert "usda_" not in text
+
+
+def test_static_provider_loads_and_normalizes(tmp_path):
+    path = tmp_path / "foods.json"
+    path.write_text(json.dumps({"foods": [food(7, "Chicken biryani", 180.0)]}))
+    provider = StaticProvider.load(str(path))
+
+    assert asyncio.run(provider.search("biryani", None)) == [{"fdcId": 7, "description": "Chicken biryani"}]
+    assert asyncio.run(provider.search("pizza", None)) == []
+    details = asyncio.run(provider.details(7, None))
+    assert details["foodNutrients"] == [{"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": 180.0}]
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(provider.details(8, None))
+    assert e.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_first_strategy_takes_first_match_and_cancels_the_rest():
+    slow = SlowProvider("slow", EXACT, delay=5)
+    resolver = ProviderResolver([slow, SlowProvider("fast", FAST)], strategy="first")
+
+    best_food, details = await resolver.resolve("apple", None)
+    assert best_food["fdcId"] == 1
+    assert details["fdcId"] == 1
+    await asyncio.sleep(0)
+    assert slow.cancelled
+
+
+@pytest.mark.asyncio
+async def test_best_strategy_takes_best_score_within_deadline():
+    providers_ = [SlowProvider("fast", FAST), SlowProvider("exact", StaticProvider([food(4, "Apple", 50.0)]), delay=0.01)]
+    best_food, _ = await ProviderResolver(providers_, strategy="best", deadline=1.0).resolve("apple", None)
+    assert best_food["fdcId"] == 4
+
+    # Past the deadline the first match wins, even if a better one would follow
+    providers_[0].delay = 0.05
+    providers_[1].delay = 0.5
+    best_food, _ = await ProviderResolver(providers_, strategy="best", deadline=0.01).resolve("apple", None)
+    assert best_food["fdcId"] == 1
+
+
+@pytest.mark.asyncio
+async def test_resolver_falls_back_and_reports_errors():
+    down = SlowProvider("down", FAST, error=HTTPException(status_code=503, detail="USDA is temporarily unavailable"))
+    resolver = ProviderResolver([down, SlowProvider("static", EXACT)])
+    best_food, _ = await resolver.resolve("apple raw skin", None)
+    assert best_food["fdcId"] == 3
+
+    # No provider has the dish: the broken provider's error wins over "not found"
+    with pytest.raises(HTTPException) as e:
+        await resolver.resolve("unobtainium", None)
+    assert e.value.status_code == 503
+
+    with pytest.raises(HTTPException) as e:
+        await ProviderResolver([FAST, EXACT]).resolve("unobtainium", None)
+    assert e.value.status_code == 404
+
+    assert (await ProviderResolver([FAST, EXACT]).details(2, None))["fdcId"] == 2
+
+
+class Session:
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ThreadedDBProvider(StaticProvider):
+    """Searches in a worker thread for ``delay`` seconds, like the local mirror."""
+
+    uses_db = True
+
+    def __init__(self, foods, delay=0.0):
+        super().__init__(foods)
+        self.delay = delay
+        self.sessions = []
+        # (session, session closed) when the worker thread let go of the session
+        self.released = []
+
+    async def search(self, dish_name, db):
+        self.sessions.append(db)
+
+        def query():
+            time.sleep(self.delay)
+            self.released.append((db, db.closed))
+        await run_in_threadpool(query)
+        return await super().search(dish_name, db)
+
+
+@pytest.mark.asyncio
+async def test_resolver_gives_db_providers_their_own_sessions():
+    opened = []
+
+    def session_factory():
+        opened.append(Session())
+        return opened[-1]
+
+    first, second = ThreadedDBProvider([food(1, "Apple", 52.0)]), ThreadedDBProvider([food(2, "Apple", 52.0)])
+    request_db = Session()
+    resolver = ProviderResolver([first, second, SlowProvider("static", FAST)], "best")
+    await resolver.resolve("apple", request_db, session_factory)
+    assert first.sessions == [opened[0]] and second.sessions == [opened[1]]
+    assert all(session.closed for session in opened) and not request_db.closed
+
+
+@pytest.mark.asyncio
+async def test_losing_db_provider_keeps_its_session_until_its_thread_is_done():
+    opened = []
+
+    def session_factory():
+        opened.append(Session())
+        return opened[-1]
+
+    slow = ThreadedDBProvider([food(2, "Apple", 52.0)], delay=0.2)
+    resolver = ProviderResolver([slow, SlowProvider("fast", FAST)], "first")
+    best_food, _ = await resolver.resolve("apple", Session(), session_factory)
+    assert best_food["fdcId"] == 1
+    # The fast provider won while the loser's thread still holds its own session
+    assert slow.released == [] and not opened[0].closed
+    while not opened[0].closed:
+        await asyncio.sleep(0.01)
+    assert slow.released == [(opened[0], False)]
+
+    # Sharing the caller's session, the resolver waits for the loser to let go of it
+    request_db = Session()
+    best_food, _ = await resolver.resolve("apple", request_db)
+    assert best_food["fdcId"] == 1
+    assert slow.sessions[-1] is request_db
+    assert slow.released[-1] == (request_db, False)
+
+
+@pytest.mark.asyncio
+async def test_usda_provider_caches_when_the_first_caller_is_cancelled(mock_usda):
+    from utils import food_cache
+    food_cache.clear()
+    release = mock_usda.gate = asyncio.Event()
+    provider = providers.USDAProvider()
+    first = asyncio.ensure_future(provider.search("apple", None))
+    second = asyncio.ensure_future(provider.search("apple", None))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    release.set()
+    assert (await second)[0]["fdcId"] == 12345
+    assert (await food_cache.get_search("apple"))[0]["fdcId"] == 12345
+    food_cache.clear()
+
+
+def test_get_resolver_builds_providers_by_name(monkeypatch, tmp_path):
+    monkeypatch.setattr(providers, "_providers", {})
+    monkeypatch.setattr(providers, "_resolvers", {})
+    with pytest.raises(ValueError):
+        providers.get_resolver("usda,carrier-pigeon")
+
+    path = tmp_path / "foods.json"
+    path.write_text(json.dumps([food(7, "Chicken biryani", 180.0)]))
+    monkeypatch.setattr(providers, "STATIC_FOODS_PATH", str(path))
+    resolver = providers.get_resolver("static, local")
+    assert [provider.name for provider in resolver.providers] == ["static", "local"]
+    assert providers.get_resolver("static, local") is resolver
+
+
+def test_get_calories_fans_out_to_providers(client, mock_usda, monkeypatch):
+    from utils import lookup
+    monkeypatch.setattr(providers, "_resolvers", {})
+    providers.register_provider(SlowProvider("slow", FAST, delay=5))
+    providers.register_provider(StaticProvider([food(7, "Chicken biryani", 180.0)]))
+    monkeypatch.setattr(lookup, "FOOD_DATA_SOURCE", "slow,static")
+    try:
+        response = client.post("/get-calories", json={"dish_name": "chicken biryani", "mode": "servings", "servings": 2})
+    finally:
+        providers._providers.pop("slow")
+        providers._providers.pop("static")
+    assert response.status_code == 200
+    assert response.json()["fdc_id"] == 7
+    assert response.json()["total_nutrients"][0] == {"id": 1008, "name": "Energy", "value": 360.0, "unit": "kcal"}
+    mock_usda.assert_not_called()
@@ -0,0 +1,74 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+import pytest
+from utils.ratelimit import BACKGROUND, INTERACTIVE, PriorityScheduler, RateLimited, TokenBucket, background_priority
+from utils.upstream import UpstreamPolicy
+
+
+def test_token_bucket_refills():
+    bucket = TokenBucket(rate=10, capacity=2)
+    now = bucket.updated
+    bucket.take()
+    bucket.take()
+    assert bucket.available(now) == 0
+    assert bucket.time_until(1, now) == pytest.approx(0.1)
+    assert bucket.available(now + 1) == 2
+    assert TokenBucket(rate=0, capacity=1).available() == float("inf")
+
+
+@pytest.mark.asyncio
+async def test_spreads_requests_over_keys():
+    scheduler = PriorityScheduler(["a", "b"], rate_per_hour=1, burst=1)
+    keys = {(await scheduler.acquire())[0], (await scheduler.acquire())[0]}
+    assert keys == {"a", "b"}
+    with pytest.raises(RateLimited):
+        await scheduler.acquire(timeout=0.01)
+
+
+@pytest.mark.asyncio
+async def test_interactive_goes_before_background():
+    scheduler = PriorityScheduler(["a"], rate_per_hour=36000, burst=1)  # one token per 100 ms
+    await scheduler.acquire()
+    order = []
+
+    async def lookup(name, priority):
+        await scheduler.acquire(priority=priority, timeout=2)
+        order.append(name)
+
+    background = asyncio.ensure_future(lookup("background", BACKGROUND))
+    await asyncio.sleep(0)
+    interactive = asyncio.ensure_future(lookup("interactive", INTERACTIVE))
+    await asyncio.sleep(0)
+    assert scheduler.stats()["queued"] == {"interactive": 1, "background": 1}
+    await asyncio.gather(background, interactive)
+    assert order == ["interactive", "background"]
+
+
+@pytest.mark.asyncio
+async def test_background_leaves_a_reserve():
+    scheduler = PriorityScheduler(["a"], rate_per_hour=1, burst=5, background_reserve=0.4)
+    with background_priority():
+        for _ in range(3):
+            await scheduler.acquire()
+        with pytest.raises(RateLimited):
+            await scheduler.acquire(timeout=0.01)
+    # Interactive lookups can still use the reserve
+    await scheduler.acquire()
+    await scheduler.acquire()
+
+
+@pytest.mark.asyncio
+async def test_policy_sends_scheduled_key_and_backs_off_on_429():
+    scheduler = PriorityScheduler(["a", "b"], rate_per_hour=3600, burst=5)
+    policy = UpstreamPolicy("test", retries=1, backoff=0.001, backoff_max=0.001, scheduler=scheduler)
+    client = MagicMock()
+    client.get = AsyncMock(side_effect=[
+        MagicMock(status_code=429, headers={"Retry-After": "120"}),
+        MagicMock(status_code=200),
+    ])
+    response = await policy.get(client, "http://usda/search", params={"query": "apple"})
+    assert response.status_code == 200
+    first, second = (call.kwargs["params"] for call in client.get.call_args_list)
+    assert first["query"] == "apple"
+    assert {first["api_key"], second["api_key"]} == {"a", "b"}
+    assert scheduler.stats()["tokens"][["a", "b"].index(first["api_key"])] < 0
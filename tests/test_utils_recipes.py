@@ -0,0 +1,70 @@
+from models import Recipe
+from utils import recipes
+
+
+def _details(energy):
+    return {
+        "servingSize": 100,
+        "servingSizeUnit": "g",
+        "foodNutrients": [{"nutrient": {"id": 1008, "name": "Energy", "unitName": "kcal"}, "amount": energy}],
+    }
+
+
+def _recipe(db, name, rows):
+    recipe = Recipe(user_id=1, name=name, servings=1.0)
+    db.add(recipe)
+    db.flush()
+    recipes.set_ingredients(db, recipe, rows)
+    return recipe
+
+
+def test_changed_food_flags_dependent_recipes(test_db):
+    recipes.store_food(test_db, 1, "Rice", _details(130.0))
+    inner = _recipe(test_db, "inner", [(1, None, "grams", 100)])
+    outer = _recipe(test_db, "outer", [(None, inner.id, "servings", 2)])
+    recipes.recompute_stale(test_db)
+    assert (inner.calories, outer.calories) == (130.0, 260.0)
+
+    # Same nutrients in a new shape: nothing to recompute
+    recipes.store_food(test_db, 1, "Rice", dict(_details(130.0), description="Rice", servingSize=100.0))
+    assert not inner.stale and not outer.stale
+
+    recipes.store_food(test_db, 1, "Rice", _details(140.0))
+    test_db.flush()
+    assert inner.stale and outer.stale
+    assert recipes.recompute_stale(test_db) == 2
+    assert (inner.calories, outer.calories) == (140.0, 280.0)
+
+
+def test_shared_sub_recipes_are_computed_once(test_db, mocker):
+    recipes.store_food(test_db, 1, "Rice", _details(130.0))
+    base = _recipe(test_db, "base", [(1, None, "grams", 100)])
+    left = _recipe(test_db, "left", [(None, base.id, "servings", 1)])
+    right = _recipe(test_db, "right", [(None, base.id, "servings", 1)])
+    top = _recipe(test_db, "top", [(None, left.id, "servings", 1), (None, right.id, "servings", 1)])
+    spy = mocker.spy(recipes, "_food_totals")
+    assert recipes.compute_totals(test_db, top)[0]["value"] == 260.0
+    assert spy.call_count == 1
+
+
+def test_cycles_are_rejected(test_db):
+    a = _recipe(test_db, "a", [])
+    b = _recipe(test_db, "b", [(None, a.id, "servings", 1)])
+    try:
+        recipes.set_ingredients(test_db, a, [(None, b.id, "servings", 1)])
+    except recipes.RecipeCycleError:
+        pass
+    else:
+        raise AssertionError("cycle was accepted")
+
+
+def test_recipe_totals_leave_the_live_table_cache_alone(test_db):
+    from utils import food_cache, lookup
+    food_cache.clear()
+    live = _details(130.0)
+    table = food_cache.get_table(1, live, lookup.parse_nutrients)
+    recipes.store_food(test_db, 1, "Rice", _details(130.0))
+    _recipe(test_db, "rice bowl", [(1, None, "grams", 100)])
+    recipes.recompute_stale(test_db)
+
+    assert food_cache.get_table(1, live, lookup.parse_nutrients) is table
@@ -0,0 +1,87 @@
+from datetime import date, datetime
+from models import DailyNutrientRollup
+from schemas import CalorieRequest
+from utils.meals import log_meal, log_meals
+from utils.rollups import rebuild_rollups, rollup_totals
+
+
+def make_result(energy=100.0, protein=5.0):
+    return {
+        "fdc_id": 1,
+        "selected_food": "Rice",
+        "total_servings": 1.0,
+        "total_nutrients": [
+            {"id": 1008, "name": "Energy", "value": energy, "unit": "kcal"},
+            {"id": 1003, "name": "Protein", "value": protein, "unit": "g"},
+        ],
+    }
+
+
+def log(test_db, logged_at, user_id=1, **kwargs):
+    request = CalorieRequest(dish_name="rice", mode="servings", servings=1)
+    return log_meal(test_db, user_id, request, make_result(**kwargs), logged_at=logged_at)
+
+
+def rollup_rows(test_db):
+    rows = test_db.query(DailyNutrientRollup).order_by(
+        DailyNutrientRollup.user_id, DailyNutrientRollup.day, DailyNutrientRollup.nutrient_id
+    )
+    return [(row.user_id, row.day, row.nutrient_id, row.amount) for row in rows]
+
+
+def test_log_meals_updates_rollups(test_db):
+    log(test_db, datetime(2026, 10, 5, 8), energy=100.0, protein=1.0)
+    log(test_db, datetime(2026, 10, 5, 20), energy=50.0, protein=2.0)
+    request = CalorieRequest(dish_name="rice", mode="servings", servings=1)
+    log_meals(test_db, 1, [(request, make_result(energy=10.0)), (request, make_result(energy=20.0))],
+              logged_at=datetime(2026, 10, 6, 9))
+
+    assert rollup_rows(test_db) == [
+        (1, date(2026, 10, 5), 1003, 3.0),
+        (1, date(2026, 10, 5), 1008, 150.0),
+        (1, date(2026, 10, 6), 1003, 10.0),
+        (1, date(2026, 10, 6), 1008, 30.0),
+    ]
+
+
+def summary(period_start, energy, protein):
+    return {
+        'period_start': period_start,
+        'calories': energy,
+        'nutrients': [
+            {'id': 1003, 'name': 'Protein', 'value': protein, 'unit': 'g'},
+            {'id': 1008, 'name': 'Energy', 'value': energy, 'unit': 'kcal'},
+        ],
+    }
+
+
+def test_rollup_totals_sum_days_and_weeks(test_db):
+    for day in range(1, 15):
+        log(test_db, datetime(2026, 10, day, 12), energy=float(day), protein=0.5)
+        log(test_db, datetime(2026, 10, day, 18), user_id=2, energy=1000.0)
+
+    start, end = date(2026, 10, 3), date(2026, 10, 12)
+    assert rollup_totals(test_db, 1, start, end, "day") == [
+        summary(f"2026-10-{day:02d}", float(day), 0.5) for day in range(3, 13)
+    ]
+    # Weeks start on Monday; the first and last are cut at start and end
+    assert rollup_totals(test_db, 1, start, end, "week") == [
+        summary("2026-09-28", 7.0, 1.0),
+        summary("2026-10-05", 56.0, 3.5),
+        summary("2026-10-12", 12.0, 0.5),
+    ]
+
+
+def test_rebuild_rollups(test_db):
+    log(test_db, datetime(2026, 10, 5, 8), energy=100.0)
+    log(test_db, datetime(2026, 10, 5, 9), user_id=2, energy=70.0)
+    expected = rollup_rows(test_db)
+
+    test_db.query(DailyNutrientRollup).delete()
+    test_db.add(DailyNutrientRollup(user_id=1, day=date(2026, 1, 1), nutrient_id=1008, amount=5.0))
+    test_db.commit()
+
+    rebuild_rollups(test_db, user_id=1)
+    assert rollup_rows(test_db) == [row for row in expected if row[0] == 1]
+    rebuild_rollups(test_db)
+    assert rollup_rows(test_db) == expected
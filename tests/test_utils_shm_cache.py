@@ -0,0 +1,108 @@
+import multiprocessing
+import struct
+import time
+import pytest
+from utils.cache import MISSING
+from utils.shm_cache import ShmCache
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def test_set_get_delete(path):
+    cache = ShmCache(path, size_bytes=64 * 1024, slot_size=1024)
+    assert cache.get("a") is MISSING
+    assert cache.set("a", {"foods": [{"fdcId": 1}]})
+    assert cache.get("a") == {"foods": [{"fdcId": 1}]}
+    assert cache.get("a") is cache.get("a")  # decoded once per process
+    assert (cache.hits, cache.misses, len(cache)) == (3, 1, 1)
+    cache.set("a", [])
+    assert cache.get("a") == []
+    cache.delete("a")
+    assert cache.get("a") is MISSING
+    cache.close()
+
+
+def test_ttl_and_stale_window(path):
+    cache = ShmCache(path, size_bytes=64 * 1024, slot_size=1024, stale_ttl=60)
+    cache.set("a", 1, ttl=0)
+    assert cache.get("a") is MISSING
+    assert cache.get_stale("a") == 1
+    cache.set("b", 2, ttl=-61)
+    assert cache.get_stale("b") is MISSING
+    cache.close()
+
+
+def test_lru_eviction_within_a_set(path):
+    cache = ShmCache(path, size_bytes=2 * 1024, slot_size=1024, ways=2)
+    assert (cache.sets, cache.ways) == (1, 2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is MISSING
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    cache.close()
+
+
+def test_oversized_values_are_not_cached(path):
+    cache = ShmCache(path, size_bytes=64 * 1024, slot_size=128)
+    assert not cache.set("a", [str(i) * 50 for i in range(100)])
+    assert cache.get("a") is MISSING
+    cache.close()
+
+
+def test_existing_file_geometry_wins(path):
+    first = ShmCache(path, size_bytes=64 * 1024, slot_size=1024)
+    first.set("a", 1)
+    second = ShmCache(path, size_bytes=1024 * 1024, slot_size=4096)
+    assert (second.sets, second.slot_size) == (first.sets, first.slot_size)
+    assert second.get("a") == 1
+    first.close()
+    second.close()
+
+
+def test_slot_left_mid_write_is_recovered(path):
+    cache = ShmCache(path)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    # A writer that died mid-write leaves the slot's sequence number odd
+    offset, seq, _ = cache._decoded["a"]
+    struct.pack_into("<Q", cache._mm, offset, seq + 1)
+    assert ShmCache(path).get("a") is MISSING
+
+    cache.set("a", 2)
+    assert ShmCache(path).get("a") == 2
+    cache.close()
+
+
+def _writer(path, worker, rounds):
+    cache = ShmCache(path)
+    for i in range(rounds):
+        # Every value is self-consistent, so a torn read would be detected
+        cache.set(f"key-{i % 8}", {"worker": worker, "items": [worker * 1000 + i] * 50})
+    cache.close()
+
+
+def test_concurrent_writers_and_readers(path):
+    cache = ShmCache(path, size_bytes=8 * 1024, slot_size=1024, ways=2)
+    context = multiprocessing.get_context("fork")
+    writers = [context.Process(target=_writer, args=(path, worker, 300)) for worker in range(1, 4)]
+    for writer in writers:
+        writer.start()
+    seen = 0
+    while any(writer.is_alive() for writer in writers):
+        for i in range(8):
+            value = cache.get(f"key-{i}")
+            if value is not MISSING:
+                seen += 1
+                assert len(set(value["items"])) == 1
+                assert value["items"][0] // 1000 == value["worker"]
+    for writer in writers:
+        writer.join()
+        assert writer.exitcode == 0
+    assert seen > 0
+    cache.close()
@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from utils.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch(value):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return value * 2
+
+    results = await asyncio.gather(*(flight.do("key", fetch, 21) for _ in range(10)))
+    assert [result for result, _ in results] == [42] * 10
+    assert [leader for _, leader in results].count(True) == 1
+    assert calls == 1
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_errors_propagate_to_all_callers():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream down")
+
+    results = await asyncio.gather(*(flight.do("key", fail) for _ in range(3)), return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_cancel_others():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "done"
+
+    first = asyncio.ensure_future(flight.do("key", fetch))
+    second = asyncio.ensure_future(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await second == ("done", False)
+    assert first.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_last_cancelled_waiter_cancels_call():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    waiter = asyncio.ensure_future(flight.do("key", fetch))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert len(flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_caller_after_cancel_starts_new_call():
+    flight = SingleFlight()
+    started = asyncio.Event()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        started.set()
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            # Slow cleanup: the cancelled call is still running for a while
+            await asyncio.sleep(0.01)
+            raise
+        return "done"
+
+    waiter = asyncio.ensure_future(flight.do("key", fetch))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.sleep(0)
+    assert len(flight) == 0
+
+    async def quick():
+        return "fresh"
+
+    assert await flight.do("key", quick) == ("fresh", True)
+
+
+@pytest.mark.asyncio
+async def test_new_call_after_completion():
+    flight = SingleFlight()
+
+    async def fetch(value):
+        return value
+
+    assert await flight.do("key", fetch, 1) == (1, True)
+    assert await flight.do("key", fetch, 2) == (2, True)
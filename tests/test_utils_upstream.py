@@ -0,0 +1,96 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+import httpx
+import pytest
+from utils.upstream import CircuitBreaker, CircuitOpenError, DeadlineExceeded, UpstreamPolicy
+
+
+def make_policy(**kwargs):
+    options = dict(deadline=1.0, retries=2, backoff=0.001, backoff_max=0.001)
+    options.update(kwargs)
+    return UpstreamPolicy("test", **options)
+
+
+def client_returning(*results):
+    client = MagicMock()
+    client.get = AsyncMock(side_effect=list(results))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_retries_server_errors():
+    client = client_returning(MagicMock(status_code=503), httpx.ConnectError("refused"), MagicMock(status_code=200))
+    response = await make_policy().get(client, "http://usda/search", params={"query": "apple"})
+    assert response.status_code == 200
+    assert client.get.await_count == 3
+    assert client.get.call_args.kwargs["params"] == {"query": "apple"}
+
+
+@pytest.mark.asyncio
+async def test_client_errors_are_not_retried():
+    client = client_returning(MagicMock(status_code=404))
+    assert (await make_policy().get(client, "http://usda/food/1")).status_code == 404
+    assert client.get.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_retries():
+    client = client_returning(*[MagicMock(status_code=500)] * 3)
+    assert (await make_policy().get(client, "http://usda/search")).status_code == 500
+
+    client = client_returning(*[httpx.ReadTimeout("slow")] * 3)
+    with pytest.raises(httpx.ReadTimeout):
+        await make_policy().get(client, "http://usda/search")
+
+
+@pytest.mark.asyncio
+async def test_deadline_bounds_a_hung_call():
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(10)
+
+    client = MagicMock()
+    client.get = hang
+    with pytest.raises(DeadlineExceeded):
+        await make_policy(deadline=0.05).get(client, "http://usda/search")
+
+
+@pytest.mark.asyncio
+async def test_circuit_opens_and_recovers(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    policy = make_policy(retries=0, breaker=breaker)
+    client = client_returning(MagicMock(status_code=503), MagicMock(status_code=503), MagicMock(status_code=200))
+    await policy.get(client, "http://usda/search")
+    await policy.get(client, "http://usda/search")
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        await policy.get(client, "http://usda/search")
+    assert client.get.await_count == 2
+
+    # After the reset timeout one probe goes through and closes the circuit
+    breaker.opened_at -= 30
+    assert (await policy.get(client, "http://usda/search")).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_allows_one_probe():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+@pytest.mark.asyncio
+async def test_probe_slot_is_released_on_unexpected_errors():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    policy = make_policy(retries=0, breaker=breaker)
+    client = client_returning(RuntimeError("boom"), MagicMock(status_code=200))
+    with pytest.raises(RuntimeError):
+        await policy.get(client, "http://usda/search")
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # The failed probe did not keep the slot
+    assert (await policy.get(client, "http://usda/search")).status_code == 200
+    assert breaker.state == CircuitBreaker.CLOSED
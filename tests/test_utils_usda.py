@@ -0,0 +1,29 @@
+import pytest
+from utils import usda
+
+
+@pytest.mark.asyncio
+async def test_get_client_is_shared():
+    client = usda.get_client()
+    assert usda.get_client() is client
+    await usda.close_client()
+    assert usda.get_client() is not client
+    await usda.close_client()
+
+
+@pytest.mark.asyncio
+async def test_search_foods_params(mock_usda):
+    await usda.search_foods("Apple", page_size=5)
+    url = mock_usda.call_args.args[0]
+    params = mock_usda.call_args.kwargs["params"]
+    assert url == usda.USDA_SEARCH_URL
+    assert params["query"] == "Apple"
+    assert params["pageSize"] == 5
+    await usda.close_client()
+
+
+@pytest.mark.asyncio
+async def test_get_food_url(mock_usda):
+    await usda.get_food(12345)
+    assert mock_usda.call_args.args[0] == f"{usda.USDA_FOOD_URL}/12345"
+    await usda.close_client()
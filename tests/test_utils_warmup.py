@@ -0,0 +1,53 @@
+import pytest
+from sqlalchemy.orm import sessionmaker
+from models import MealEntry
+from utils import food_cache, warmup
+from utils.cache import MISSING
+
+
+def test_dishes_to_warm_orders_seed_then_popular(test_db, tmp_path):
+    for dish, count in [("Apple", 3), ("banana", 5), ("Rice", 1)]:
+        for i in range(count):
+            test_db.add(MealEntry(user_id=1, dish_name=dish if i else dish.upper()))
+    test_db.commit()
+    seed = tmp_path / "seed.txt"
+    seed.write_text("# breakfast\nOatmeal\n\n apple \n")
+
+    assert warmup.popular_dishes(test_db, 2) == ["banana", "apple"]
+    assert warmup.dishes_to_warm(test_db, 3, str(seed)) == ["Oatmeal", "apple", "banana"]
+    assert warmup.dishes_to_warm(test_db, 10, None) == ["banana", "apple", "rice"]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_fills_caches(test_db, mock_usda):
+    food_cache.clear()
+    factory = sessionmaker(bind=test_db.get_bind())
+
+    counts = await warmup.warm_up(["apple", "rice", "unobtainium"], factory, concurrency=2)
+    assert counts == {"warmed": 2, "skipped": 0, "not_found": 1, "failed": 0}
+    assert food_cache.get_resolved("APPLE")["fdcId"] == 12345
+    assert await food_cache.get_details(12345) is not MISSING
+    assert len(food_cache.table_cache) == 2
+
+    calls = mock_usda.call_count
+    assert (await warmup.warm_up(["Apple"], factory))["skipped"] == 1
+    assert mock_usda.call_count == calls
+    food_cache.clear()
+
+
+@pytest.mark.asyncio
+async def test_run_records_last_run(test_db, mock_usda):
+    food_cache.clear()
+    test_db.add(MealEntry(user_id=1, dish_name="apple"))
+    test_db.commit()
+
+    result = await warmup.run(sessionmaker(bind=test_db.get_bind()), limit=5, seed_file=None)
+    assert result["status"] == "done" and result["dishes"] == 1 and result["warmed"] == 1
+    assert warmup.last_run == result
+    food_cache.clear()
+
+
+def test_cache_stats_show_last_run(client, monkeypatch):
+    monkeypatch.setattr(warmup, "last_run", {"status": "done", "dishes": 3, "warmed": 2, "not_found": 1})
+    stats = client.get("/get-calories/cache-stats").json()
+    assert stats["warmup"] == {"status": "done", "dishes": 3, "warmed": 2, "not_found": 1}
@@ -1,5 +1,11 @@
+from datetime import datetime
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from models import User
+from models import (
+    DailyNutrientRollup, Job, JobItem, MealEntry, MealEntryNutrient, Recipe, RecipeIngredient, User, UserRevocation
+)
 from passlib.context import CryptContext
 from schemas import UserCreate
 
@@ -8,8 +14,12 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def create_user(db: Session, user: UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+def hash_password(password: str):
+    return pwd_context.hash(password)
+
+def create_user(db: Session, user: UserCreate, hashed_password: str = None):
+    if hashed_password is None:
+        hashed_password = hash_password(user.password)
     db_user = User(
         first_name=user.first_name,
         last_name=user.last_name,
@@ -23,3 +33,77 @@ def create_user(db: Session, user: UserCreate):
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
+
+def token_claims(user: User):
+    """Identity claims embedded in access tokens for stateless authentication."""
+    return {
+        "sub": user.email,
+        "uid": user.id,
+        "first_name": user.first_name,
+        "last_name": user.last_name
+    }
+
+def revoke_user_tokens(db: Session, user_id: int):
+    db.merge(UserRevocation(user_id=user_id, revoked_at=datetime.utcnow()))
+    db.commit()
+
+def delete_user(db: Session, user: User):
+    """Delete a user with their meals, rollups, jobs and recipes, and revoke their tokens."""
+    meal_ids = select(MealEntry.id).where(MealEntry.user_id == user.id)
+    job_ids = select(Job.id).where(Job.user_id == user.id)
+    recipe_ids = select(Recipe.id).where(Recipe.user_id == user.id)
+    for stmt in (
+        delete(MealEntryNutrient).where(MealEntryNutrient.meal_entry_id.in_(meal_ids)),
+        delete(MealEntry).where(MealEntry.user_id == user.id),
+        delete(DailyNutrientRollup).where(DailyNutrientRollup.user_id == user.id),
+        delete(JobItem).where(JobItem.job_id.in_(job_ids)),
+        delete(Job).where(Job.user_id == user.id),
+        delete(RecipeIngredient).where(RecipeIngredient.recipe_id.in_(recipe_ids)),
+        delete(Recipe).where(Recipe.user_id == user.id),
+    ):
+        db.execute(stmt, execution_options={"synchronize_session": False})
+    db.delete(user)
+    revoke_user_tokens(db, user.id)
+
+def get_revocations(db: Session, since: datetime):
+    rows = db.query(UserRevocation).filter(UserRevocation.revoked_at >= since).all()
+    return {row.user_id: row.revoked_at for row in rows}
+
+# Variants of the lookups above for database.get_async_db, which yields an
+# AsyncSession when the async engine is enabled and a Session otherwise
+
+async def get_user_by_email_async(db, email: str):
+    if isinstance(db, AsyncSession):
+        result = await db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+    return await run_in_threadpool(get_user_by_email, db, email)
+
+async def create_user_async(db, user: UserCreate, hashed_password: str):
+    if not isinstance(db, AsyncSession):
+        return await run_in_threadpool(create_user, db, user, hashed_password)
+    db_user = User(
+        first_name=user.first_name,
+        last_name=user.last_name,
+        email=user.email,
+        hashed_password=hashed_password
+    )
+    db.add(db_user)
+    await db.commit()
+    await db.refresh(db_user)
+    return db_user
+
+async def get_revocations_async(db, since: datetime):
+    if not isinstance(db, AsyncSession):
+        return await run_in_threadpool(get_revocations, db, since)
+    result = await db.execute(select(UserRevocation).where(UserRevocation.revoked_at >= since))
+    return {row.user_id: row.revoked_at for row in result.scalars()}
+
+async def revoke_user_tokens_async(db, user_id: int):
+    if not isinstance(db, AsyncSession):
+        return await run_in_threadpool(revoke_user_tokens, db, user_id)
+    return await db.run_sync(revoke_user_tokens, user_id)
+
+async def delete_user_async(db, user: User):
+    if not isinstance(db, AsyncSession):
+        return await run_in_threadpool(delete_user, db, user)
+    return await db.run_sync(delete_user, user)
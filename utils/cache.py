@@ -0,0 +1,78 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+# Returned by TTLCache.get on a miss so cached falsy values ([] for a
+# negative lookup) can be told apart from absent keys
+MISSING = object()
+
+
+class TTLCache:
+    """In-process LRU cache whose entries expire after a time-to-live.
+
+    With ``stale_ttl`` an expired entry is kept that much longer. ``get``
+    ignores it, but ``get_stale`` can still return it, so callers can serve
+    stale data while revalidating.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600.0, stale_ttl: float = 0.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            value, expires_at = entry
+            now = time.monotonic()
+            if expires_at <= now:
+                if expires_at + self.stale_ttl <= now:
+                    del self._data[key]
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key):
+        """The entry's value even if expired, within its stale window, or MISSING."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at + self.stale_ttl <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self.stale_hits += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.stale_hits = 0
@@ -1,14 +1,56 @@
-from fuzzywuzzy import fuzz
+import re
+import numpy as np
+from rapidfuzz import fuzz, process
+
+# Text normalization matches lowercasing followed by fuzzywuzzy's
+# token_sort_ratio (force_ascii=True): drop Latin-1 supplement characters,
+# replace non-word characters with spaces, then sort the tokens.
+_LATIN1_TABLE = dict.fromkeys(range(128, 256))
+_NON_WORD = re.compile(r"(?ui)\W")
+
+
+def process_text(text: str) -> str:
+    """Normalize and token-sort a string for matching."""
+    text = _NON_WORD.sub(" ", text.lower().translate(_LATIN1_TABLE)).lower().strip()
+    return " ".join(sorted(text.split()))
+
+
+def score_matrix(queries, choices, processed: bool = False):
+    """Score every query against every choice in one native call.
+
+    Returns an ``len(queries) x len(choices)`` integer array of
+    token-sort-ratio scores (0-100) rounded the same way as fuzzywuzzy.
+    Pass ``processed=True`` when both sides already went through
+    :func:`process_text`.
+    """
+    if not processed:
+        queries = [process_text(query) for query in queries]
+        choices = [process_text(choice) for choice in choices]
+    if not queries or not choices:
+        return np.zeros((len(queries), len(choices)), dtype=np.int64)
+    scores = process.cdist(queries, choices, scorer=fuzz.ratio, dtype=np.float64, workers=1)
+    # fuzzywuzzy short-circuits identical strings, including two empty ones, to 100
+    empty_queries = np.fromiter((not query for query in queries), dtype=bool, count=len(queries))
+    empty_choices = np.fromiter((not choice for choice in choices), dtype=bool, count=len(choices))
+    scores[np.outer(empty_queries, empty_choices)] = 100
+    return np.round(scores).astype(np.int64)
+
+
+def best_match_indices(scores, threshold=60):
+    """Index of the first highest-scoring choice per query, or -1 below threshold."""
+    if scores.shape[1] == 0:
+        return np.full(scores.shape[0], -1, dtype=np.int64)
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(scores.shape[0]), best]
+    return np.where((best_scores > 0) & (best_scores >= threshold), best, -1)
+
+
+def select_best_foods(foods, queries, threshold=60):
+    """Pick the best matching food for each query, or None when nothing reaches threshold."""
+    descriptions = [food.get("description", "") for food in foods]
+    indices = best_match_indices(score_matrix(queries, descriptions), threshold)
+    return [foods[index] if index >= 0 else None for index in indices]
+
 
 def select_best_food(foods, query, threshold=60):
-    best_food = None
-    best_score = 0
-    query_lower = query.lower()
-    for food in foods:
-        desc = food.get("description", "").lower()
-        score = fuzz.token_sort_ratio(query_lower, desc)
-        if score > best_score and score >= threshold:
-            best_score = score
-            best_food = food
-
-    return best_food
+    return select_best_foods(foods, [query], threshold)[0]
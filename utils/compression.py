@@ -0,0 +1,109 @@
+"""Response compression negotiated from ``Accept-Encoding``.
+
+Buffered responses of at least ``minimum_size`` bytes are compressed with
+brotli when the client accepts ``br`` and the ``brotli`` package is
+installed, and with gzip otherwise. Streaming responses pass through
+untouched.
+"""
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Media types worth compressing; images and archives are already compressed
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def parse_accept_encoding(value: str):
+    """Map each accepted coding to its q-value, skipping ``q=0``."""
+    accepted = {}
+    for part in value.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                continue
+        if q > 0:
+            accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str, brotli_available: bool = None):
+    """Preferred supported coding for an ``Accept-Encoding`` header, or None."""
+    if brotli_available is None:
+        brotli_available = brotli is not None
+    accepted = parse_accept_encoding(accept_encoding or "")
+    wildcard = accepted.get("*", 0.0)
+    candidates = (["br"] if brotli_available else []) + ["gzip"]
+    best, best_q = None, 0.0
+    for coding in candidates:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str, gzip_level: int = 6, brotli_quality: int = 4) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=brotli_quality)
+    return gzip.compress(body, compresslevel=gzip_level, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or "content-encoding" in headers
+                or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body = compress(body, encoding, self.gzip_level, self.brotli_quality)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
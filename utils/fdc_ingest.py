@@ -0,0 +1,230 @@
+"""Load a FoodData Central bulk export into the local foods tables.
+
+Supports the CSV export (a directory containing ``food.csv``,
+``nutrient.csv``, ``food_nutrient.csv`` and optionally ``branded_food.csv``)
+and the JSON export (a single file such as
+``FoodData_Central_foundation_food_json_*.json``). Both are streamed and
+inserted in batches so a multi-GB export never has to fit in memory.
+
+Usage::
+
+    python -m utils.fdc_ingest path/to/export [--batch-size 5000] [--replace]
+"""
+import argparse
+import csv
+import json
+import os
+from sqlalchemy import delete, insert, update
+from sqlalchemy.orm import Session
+from database import Base, SessionLocal, engine
+from models import Food, FoodNutrient, Nutrient
+
+DEFAULT_BATCH_SIZE = 5000
+_JSON_CHUNK_SIZE = 1 << 20
+
+
+def _float_or_none(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def iter_json_array(fp, chunk_size: int = _JSON_CHUNK_SIZE):
+    """Yield the objects of the first JSON array in ``fp`` one at a time.
+
+    FDC JSON exports are a single object wrapping one large array
+    (``{"FoundationFoods": [...]}``), so only the current element and one
+    read chunk are ever held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    eof = False
+
+    def fill():
+        nonlocal buffer, eof
+        chunk = fp.read(chunk_size)
+        if chunk:
+            buffer += chunk
+        else:
+            eof = True
+
+    while "[" not in buffer:
+        if eof:
+            return
+        fill()
+    buffer = buffer[buffer.index("[") + 1:]
+
+    while True:
+        # Skip separators between elements
+        stripped = buffer.lstrip(" \t\r\n,")
+        if not stripped and not eof:
+            buffer = ""
+            fill()
+            continue
+        buffer = stripped
+        if not buffer or buffer[0] == "]":
+            return
+        try:
+            obj, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        buffer = buffer[end:]
+        yield obj
+
+
+class _Loader:
+    """Accumulates rows and writes them in batches, nutrients first."""
+
+    def __init__(self, db: Session, batch_size: int):
+        self.db = db
+        self.batch_size = batch_size
+        self.known_nutrients = {nut_id for (nut_id,) in db.query(Nutrient.id)}
+        self.nutrients = []
+        self.foods = []
+        self.food_nutrients = []
+        self.counts = {"foods": 0, "nutrients": 0, "food_nutrients": 0}
+
+    def add_nutrient(self, nut_id, name, unit_name):
+        if nut_id in self.known_nutrients:
+            return
+        self.known_nutrients.add(nut_id)
+        self.nutrients.append({"id": nut_id, "name": name, "unit_name": unit_name})
+
+    def add_food(self, row):
+        self.foods.append(row)
+        if len(self.foods) >= self.batch_size:
+            self.flush()
+
+    def add_food_nutrient(self, row):
+        self.food_nutrients.append(row)
+        if len(self.food_nutrients) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model, rows, name in (
+            (Nutrient, self.nutrients, "nutrients"),
+            (Food, self.foods, "foods"),
+            (FoodNutrient, self.food_nutrients, "food_nutrients"),
+        ):
+            if rows:
+                self.db.execute(insert(model), rows)
+                self.counts[name] += len(rows)
+                rows.clear()
+        self.db.commit()
+
+
+def ingest_json(db: Session, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    loader = _Loader(db, batch_size)
+    with open(path, encoding="utf-8") as fp:
+        for item in iter_json_array(fp):
+            fdc_id = item.get("fdcId")
+            if fdc_id is None:
+                continue
+            loader.add_food({
+                "fdc_id": fdc_id,
+                "description": item.get("description", ""),
+                "data_type": item.get("dataType"),
+                "serving_size": _float_or_none(item.get("servingSize")),
+                "serving_size_unit": item.get("servingSizeUnit"),
+                "household_serving_full_text": item.get("householdServingFullText"),
+            })
+            for food_nutrient in item.get("foodNutrients", []):
+                nutrient = food_nutrient.get("nutrient") or {}
+                amount = _float_or_none(food_nutrient.get("amount"))
+                if nutrient.get("id") is None or amount is None:
+                    continue
+                loader.add_nutrient(nutrient["id"], nutrient.get("name", ""), nutrient.get("unitName"))
+                loader.add_food_nutrient({"fdc_id": fdc_id, "nutrient_id": nutrient["id"], "amount": amount})
+    loader.flush()
+    return loader.counts
+
+
+def _iter_csv(path):
+    with open(path, newline="", encoding="utf-8") as fp:
+        yield from csv.DictReader(fp)
+
+
+def ingest_csv(db: Session, directory: str, batch_size: int = DEFAULT_BATCH_SIZE):
+    loader = _Loader(db, batch_size)
+    for row in _iter_csv(os.path.join(directory, "nutrient.csv")):
+        loader.add_nutrient(int(row["id"]), row["name"], row.get("unit_name"))
+
+    for row in _iter_csv(os.path.join(directory, "food.csv")):
+        loader.add_food({
+            "fdc_id": int(row["fdc_id"]),
+            "description": row.get("description", ""),
+            "data_type": row.get("data_type"),
+        })
+    loader.flush()
+
+    branded_path = os.path.join(directory, "branded_food.csv")
+    if os.path.exists(branded_path):
+        servings = []
+        for row in _iter_csv(branded_path):
+            servings.append({
+                "fdc_id": int(row["fdc_id"]),
+                "serving_size": _float_or_none(row.get("serving_size")),
+                "serving_size_unit": row.get("serving_size_unit") or None,
+                "household_serving_full_text": row.get("household_serving_fulltext") or None,
+            })
+            if len(servings) >= batch_size:
+                db.execute(update(Food), servings)
+                db.commit()
+                servings.clear()
+        if servings:
+            db.execute(update(Food), servings)
+            db.commit()
+
+    for row in _iter_csv(os.path.join(directory, "food_nutrient.csv")):
+        amount = _float_or_none(row.get("amount"))
+        if amount is None:
+            continue
+        loader.add_food_nutrient({
+            "fdc_id": int(row["fdc_id"]),
+            "nutrient_id": int(row["nutrient_id"]),
+            "amount": amount,
+        })
+    loader.flush()
+    return loader.counts
+
+
+def clear_mirror(db: Session):
+    db.execute(delete(FoodNutrient))
+    db.execute(delete(Food))
+    db.execute(delete(Nutrient))
+    db.commit()
+
+
+def ingest(db: Session, path: str, batch_size: int = DEFAULT_BATCH_SIZE, replace: bool = False):
+    if replace:
+        clear_mirror(db)
+    if os.path.isdir(path):
+        return ingest_csv(db, path, batch_size=batch_size)
+    return ingest_json(db, path, batch_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a FoodData Central export into the local database")
+    parser.add_argument("path", help="CSV export directory or JSON export file")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--replace", action="store_true", help="delete previously ingested foods first")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        counts = ingest(db, args.path, batch_size=args.batch_size, replace=args.replace)
+    finally:
+        db.close()
+    print(f"Ingested {counts['foods']} foods, {counts['nutrients']} nutrients "
+          f"and {counts['food_nutrients']} food nutrients")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from sqlalchemy import or_, select, func, text
+from sqlalchemy.orm import Session
+from models import Food, FoodNutrient, Nutrient
+
+# Postgres candidates come from the trigram and full-text GIN indexes on
+# foods.description; select_best_food does the final ranking
+_PG_SEARCH = text("""
+    SELECT fdc_id, description
+    FROM foods
+    WHERE description % :query
+       OR to_tsvector('english', description) @@ plainto_tsquery('english', :query)
+    ORDER BY similarity(description, :query) DESC
+    LIMIT :limit
+""")
+
+
+def search_foods(db: Session, query: str, limit: int = 20):
+    """Return USDA-search-shaped candidates (fdcId, description) for a dish name."""
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(_PG_SEARCH, {"query": query, "limit": limit}).all()
+    else:
+        # SQLite fallback: any query token appearing in the description
+        tokens = [token for token in query.lower().split() if token]
+        if not tokens:
+            return []
+        stmt = (
+            select(Food.fdc_id, Food.description)
+            .where(or_(*[func.lower(Food.description).contains(token) for token in tokens]))
+            .limit(limit)
+        )
+        rows = db.execute(stmt).all()
+    return [{"fdcId": fdc_id, "description": description} for fdc_id, description in rows]
+
+
+def get_food_details(db: Session, fdc_id: int):
+    """Return a USDA-food-detail-shaped dict for a locally stored food, or None."""
+    food = db.get(Food, fdc_id)
+    if food is None:
+        return None
+    rows = db.execute(
+        select(Nutrient.id, Nutrient.name, Nutrient.unit_name, FoodNutrient.amount)
+        .join(FoodNutrient, FoodNutrient.nutrient_id == Nutrient.id)
+        .where(FoodNutrient.fdc_id == fdc_id)
+    ).all()
+    details = {
+        "fdcId": food.fdc_id,
+        "description": food.description,
+        "dataType": food.data_type,
+        "foodNutrients": [
+            {"nutrient": {"id": nut_id, "name": name, "unitName": unit}, "amount": amount}
+            for nut_id, name, unit, amount in rows
+        ],
+    }
+    # Only include serving fields the export provided, matching the USDA API
+    if food.serving_size is not None:
+        details["servingSize"] = food.serving_size
+    if food.serving_size_unit is not None:
+        details["servingSizeUnit"] = food.serving_size_unit
+    if food.household_serving_full_text is not None:
+        details["householdServingFullText"] = food.household_serving_full_text
+    return details
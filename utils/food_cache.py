@@ -0,0 +1,199 @@
+import os
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import SQLAlchemyError
+from database import SessionLocal
+from models import USDACacheEntry
+from utils.cache import MISSING, TTLCache
+
+load_dotenv()
+
+FOOD_CACHE_MAXSIZE = int(os.getenv("FOOD_CACHE_MAXSIZE", "2048"))
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "86400"))
+DETAILS_CACHE_TTL = float(os.getenv("DETAILS_CACHE_TTL", "604800"))
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "3600"))
+# How long past expiry an entry may still be served while it is refreshed; 0 disables
+STALE_CACHE_TTL = float(os.getenv("STALE_CACHE_TTL", "604800"))
+# Set to "true" to share cached USDA responses between workers through the database
+FOOD_CACHE_DB_ENABLED = os.getenv("FOOD_CACHE_DB_ENABLED", "false").lower() == "true"
+
+# "memory" keeps a cache per process; "shm" shares search results, details and
+# resolved dishes between the workers on a host (see utils.shm_cache)
+FOOD_CACHE_BACKEND = os.getenv("FOOD_CACHE_BACKEND", "memory")
+SHM_CACHE_PATH = os.getenv("SHM_CACHE_PATH", "/dev/shm/meal-calorie-cache")
+SHM_CACHE_BYTES = int(os.getenv("SHM_CACHE_BYTES", str(64 * 1024 * 1024)))  # per table
+SHM_CACHE_SLOT_BYTES = int(os.getenv("SHM_CACHE_SLOT_BYTES", "16384"))  # largest compressed details entry
+
+
+def _make_cache(name: str, ttl: float, stale_ttl: float = 0.0, slot_size: int = 2048):
+    if FOOD_CACHE_BACKEND == "shm":
+        from utils.shm_cache import ShmCache
+        return ShmCache(
+            f"{SHM_CACHE_PATH}-{name}", size_bytes=SHM_CACHE_BYTES, slot_size=slot_size,
+            ttl=ttl, stale_ttl=stale_ttl
+        )
+    return TTLCache(maxsize=FOOD_CACHE_MAXSIZE, ttl=ttl, stale_ttl=stale_ttl)
+
+
+search_cache = _make_cache("search", SEARCH_CACHE_TTL, STALE_CACHE_TTL)
+details_cache = _make_cache("details", DETAILS_CACHE_TTL, STALE_CACHE_TTL, slot_size=SHM_CACHE_SLOT_BYTES)
+# Pre-scored matches (dish -> best candidate)
+resolved_cache = _make_cache("resolved", SEARCH_CACHE_TTL, slot_size=1024)
+# Parsed nutrient tables are Python objects, so they always stay in-process
+table_cache = TTLCache(maxsize=FOOD_CACHE_MAXSIZE, ttl=DETAILS_CACHE_TTL)
+db_stats = {"hits": 0, "misses": 0, "errors": 0}
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def _search_key(query: str) -> str:
+    return f"search:{normalize_query(query)}"
+
+
+def _details_key(fdc_id) -> str:
+    return f"details:{fdc_id}"
+
+
+# The database tier runs in the threadpool, each access with a short-lived
+# session of its own, so it neither blocks the event loop nor commits the
+# session of the request that happens to read or fill the cache
+
+
+def _db_get(key: str, stale: bool = False):
+    db = SessionLocal()
+    try:
+        entry = db.get(USDACacheEntry, key)
+    except SQLAlchemyError:
+        db_stats["errors"] += 1
+        return MISSING, None
+    finally:
+        db.close()
+    if entry is not None:
+        valid_until = entry.expires_at + timedelta(seconds=STALE_CACHE_TTL) if stale else entry.expires_at
+    if entry is None or valid_until <= datetime.utcnow():
+        db_stats["misses"] += 1
+        return MISSING, None
+    db_stats["hits"] += 1
+    return entry.payload, (entry.expires_at - datetime.utcnow()).total_seconds()
+
+
+def _db_set(key: str, payload, ttl: float):
+    db = SessionLocal()
+    try:
+        db.merge(USDACacheEntry(
+            key=key,
+            payload=payload,
+            expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+        ))
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        db_stats["errors"] += 1
+    finally:
+        db.close()
+
+
+async def _get(cache: TTLCache, key: str):
+    value = cache.get(key)
+    if value is not MISSING or not FOOD_CACHE_DB_ENABLED:
+        return value
+    value, remaining = await run_in_threadpool(_db_get, key)
+    if value is not MISSING:
+        # Promote to the in-process tier for the rest of the entry's lifetime
+        cache.set(key, value, ttl=remaining)
+    return value
+
+
+async def _get_stale(cache: TTLCache, key: str):
+    value = cache.get_stale(key)
+    if value is not MISSING or not FOOD_CACHE_DB_ENABLED:
+        return value
+    value, _ = await run_in_threadpool(_db_get, key, True)
+    return value
+
+
+async def _set(cache: TTLCache, key: str, value, ttl: float):
+    cache.set(key, value, ttl=ttl)
+    if FOOD_CACHE_DB_ENABLED:
+        await run_in_threadpool(_db_set, key, value, ttl)
+
+
+async def get_search(query: str):
+    """Cached search candidates for a query, [] for a cached "not found", or MISSING."""
+    return await _get(search_cache, _search_key(query))
+
+
+async def set_search(query: str, foods: list):
+    # Only the fields used for matching are kept to keep entries small
+    candidates = [
+        {"fdcId": food.get("fdcId"), "description": food.get("description", "")}
+        for food in foods
+    ]
+    ttl = SEARCH_CACHE_TTL if candidates else NEGATIVE_CACHE_TTL
+    # The match was scored against the previous candidates
+    resolved_cache.delete(_search_key(query))
+    await _set(search_cache, _search_key(query), candidates, ttl)
+
+
+async def get_stale_search(query: str):
+    """Search candidates past their TTL but within STALE_CACHE_TTL, or MISSING."""
+    return await _get_stale(search_cache, _search_key(query))
+
+
+async def get_details(fdc_id):
+    return await _get(details_cache, _details_key(fdc_id))
+
+
+async def get_stale_details(fdc_id):
+    return await _get_stale(details_cache, _details_key(fdc_id))
+
+
+async def set_details(fdc_id, details: dict):
+    await _set(details_cache, _details_key(fdc_id), details, DETAILS_CACHE_TTL)
+
+
+def get_resolved(query: str):
+    """The best candidate previously selected for a query, or MISSING."""
+    return resolved_cache.get(_search_key(query))
+
+
+def set_resolved(query: str, food: dict):
+    resolved_cache.set(_search_key(query), food)
+
+
+def get_table(fdc_id, details: dict, parse):
+    """``parse(details)`` for a food, reused while the same details object is cached."""
+    cached = table_cache.get(_details_key(fdc_id))
+    if cached is not MISSING and cached[0] is details:
+        return cached[1]
+    table = parse(details)
+    table_cache.set(_details_key(fdc_id), (details, table))
+    return table
+
+
+def cache_stats():
+    return {
+        "search": {
+            "hits": search_cache.hits, "misses": search_cache.misses,
+            "stale_hits": search_cache.stale_hits, "size": len(search_cache),
+        },
+        "details": {
+            "hits": details_cache.hits, "misses": details_cache.misses,
+            "stale_hits": details_cache.stale_hits, "size": len(details_cache),
+        },
+        "resolved": {"hits": resolved_cache.hits, "misses": resolved_cache.misses, "size": len(resolved_cache)},
+        "database": dict(db_stats, enabled=FOOD_CACHE_DB_ENABLED),
+        "backend": FOOD_CACHE_BACKEND,
+    }
+
+
+def clear():
+    search_cache.clear()
+    details_cache.clear()
+    resolved_cache.clear()
+    table_cache.clear()
+    for name in db_stats:
+        db_stats[name] = 0
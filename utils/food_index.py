@@ -0,0 +1,254 @@
+"""Precomputed in-memory index of food descriptions for dish resolution.
+
+Descriptions are normalized and token-sorted once (see
+``utils.calories.process_text``) and kept in flat arrays: one UTF-8 blob
+per text column plus an offsets array, instead of a Python object per food.
+A trigram inverted index prunes the candidates before fuzzy scoring.
+
+An index can be saved as a snapshot file and loaded with ``mmap`` so all
+uvicorn workers on a host share the same read-only pages::
+
+    python -m utils.food_index build food_index.bin
+
+and then start the app with ``FOOD_INDEX_PATH=food_index.bin``.
+"""
+import argparse
+import mmap
+import os
+import struct
+import zlib
+from array import array
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models import Food
+from utils.calories import best_match_indices, process_text, score_matrix
+
+load_dotenv()
+
+FOOD_INDEX_PATH = os.getenv("FOOD_INDEX_PATH")
+FOOD_INDEX_BUILD_ON_STARTUP = os.getenv("FOOD_INDEX_BUILD_ON_STARTUP", "false").lower() == "true"
+
+_MAGIC = b"FOODIDX1"
+# magic, foods, trigram keys, postings, processed blob bytes, description blob bytes
+_HEADER = struct.Struct("<8sQQQQQ")
+# Trigrams present in more than this share of foods are skipped when rarer ones exist
+_MAX_TRIGRAM_SHARE = 0.05
+
+_index = None
+
+
+def _trigram_codes(text: str):
+    padded = f" {text} "
+    return {zlib.crc32(padded[i:i + 3].encode("utf-8")) for i in range(len(padded) - 2)}
+
+
+def _pack_texts(texts):
+    offsets = array("q", [0])
+    blob = bytearray()
+    for text in texts:
+        blob += text.encode("utf-8")
+        offsets.append(len(blob))
+    return offsets, bytes(blob)
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+class FoodIndex:
+    def __init__(self, fdc_ids, processed_offsets, processed_blob, description_offsets,
+                 description_blob, keys, posting_offsets, postings, _mmap=None):
+        self.fdc_ids = fdc_ids
+        self._processed_offsets = processed_offsets
+        self._processed_blob = processed_blob
+        self._description_offsets = description_offsets
+        self._description_blob = description_blob
+        self.keys = keys
+        self._posting_offsets = posting_offsets
+        self._postings = postings
+        self._mmap = _mmap
+        self._max_postings = max(1, int(len(fdc_ids) * _MAX_TRIGRAM_SHARE))
+
+    def __len__(self):
+        return len(self.fdc_ids)
+
+    @classmethod
+    def build(cls, foods):
+        """Build an index from an iterable of ``(fdc_id, description)`` pairs."""
+        fdc_ids = array("q")
+        descriptions = []
+        processed = []
+        pairs = array("Q")
+        for doc, (fdc_id, description) in enumerate(foods):
+            text = process_text(description or "")
+            fdc_ids.append(fdc_id)
+            descriptions.append(description or "")
+            processed.append(text)
+            pairs.extend((code << 32) | doc for code in _trigram_codes(text))
+
+        pairs = np.sort(np.frombuffer(pairs, dtype=np.uint64)) if pairs else np.zeros(0, dtype=np.uint64)
+        codes = (pairs >> np.uint64(32)).astype(np.uint32)
+        postings = (pairs & np.uint64(0xFFFFFFFF)).astype(np.int32)
+        keys, starts = np.unique(codes, return_index=True)
+        posting_offsets = np.append(starts, len(postings)).astype(np.int64)
+
+        processed_offsets, processed_blob = _pack_texts(processed)
+        description_offsets, description_blob = _pack_texts(descriptions)
+        return cls(
+            np.frombuffer(fdc_ids, dtype=np.int64), np.frombuffer(processed_offsets, dtype=np.int64),
+            processed_blob, np.frombuffer(description_offsets, dtype=np.int64), description_blob,
+            keys, posting_offsets, postings
+        )
+
+    @classmethod
+    def build_from_db(cls, db: Session, batch_size: int = 10000):
+        rows = db.execute(
+            select(Food.fdc_id, Food.description).order_by(Food.fdc_id).execution_options(yield_per=batch_size)
+        )
+        return cls.build(rows)
+
+    def save(self, path: str):
+        sections = [
+            self.fdc_ids, self._processed_offsets, self._description_offsets,
+            self.keys, self._posting_offsets, self._postings,
+        ]
+        header = _HEADER.pack(
+            _MAGIC, len(self.fdc_ids), len(self.keys), len(self._postings),
+            len(self._processed_blob), len(self._description_blob)
+        )
+        with open(path, "wb") as fp:
+            fp.write(header)
+            for section in sections:
+                data = np.ascontiguousarray(section).tobytes()
+                fp.write(data + b"\0" * (_align(len(data)) - len(data)))
+            for blob in (self._processed_blob, self._description_blob):
+                fp.write(bytes(blob))
+
+    @classmethod
+    def load(cls, path: str):
+        """Map a snapshot read-only; array sections are views into the mapping."""
+        with open(path, "rb") as fp:
+            mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, n_foods, n_keys, n_postings, processed_size, description_size = _HEADER.unpack_from(mapped)
+        if magic != _MAGIC:
+            mapped.close()
+            raise ValueError(f"{path} is not a food index snapshot")
+
+        offset = _HEADER.size
+
+        def take(dtype, count):
+            nonlocal offset
+            view = np.frombuffer(mapped, dtype=dtype, count=count, offset=offset)
+            offset += _align(view.nbytes)
+            return view
+
+        fdc_ids = take(np.int64, n_foods)
+        processed_offsets = take(np.int64, n_foods + 1)
+        description_offsets = take(np.int64, n_foods + 1)
+        keys = take(np.uint32, n_keys)
+        posting_offsets = take(np.int64, n_keys + 1)
+        postings = take(np.int32, n_postings)
+        view = memoryview(mapped)
+        processed_blob = view[offset:offset + processed_size]
+        description_blob = view[offset + processed_size:offset + processed_size + description_size]
+        return cls(
+            fdc_ids, processed_offsets, processed_blob, description_offsets, description_blob,
+            keys, posting_offsets, postings, _mmap=mapped
+        )
+
+    def processed_text(self, doc: int) -> str:
+        return bytes(self._processed_blob[self._processed_offsets[doc]:self._processed_offsets[doc + 1]]).decode("utf-8")
+
+    def description(self, doc: int) -> str:
+        return bytes(self._description_blob[self._description_offsets[doc]:self._description_offsets[doc + 1]]).decode("utf-8")
+
+    def candidates(self, processed_query: str, limit: int = 200):
+        """Documents sharing the most trigrams with the query, best first."""
+        codes = np.fromiter(_trigram_codes(processed_query), dtype=np.uint32)
+        positions = np.searchsorted(self.keys, codes)
+        found = positions < len(self.keys)
+        found[found] = self.keys[positions[found]] == codes[found]
+        positions = positions[found]
+        if not len(positions):
+            return np.zeros(0, dtype=np.int32)
+        starts = self._posting_offsets[positions]
+        lengths = self._posting_offsets[positions + 1] - starts
+        selective = lengths <= self._max_postings
+        if selective.any():
+            starts, lengths = starts[selective], lengths[selective]
+        docs = np.concatenate([self._postings[s:s + n] for s, n in zip(starts, lengths)])
+        docs, counts = np.unique(docs, return_counts=True)
+        if len(docs) > limit:
+            top = np.argpartition(-counts, limit - 1)[:limit]
+            docs, counts = docs[top], counts[top]
+        # Highest trigram overlap first, ties by document order
+        return docs[np.lexsort((docs, -counts))]
+
+    def search(self, query: str, limit: int = 20, candidates: int = 200):
+        """Return USDA-search-shaped foods ranked by fuzzy score."""
+        processed_query = process_text(query)
+        docs = self.candidates(processed_query, limit=candidates)
+        if not len(docs):
+            return []
+        scores = score_matrix([processed_query], [self.processed_text(doc) for doc in docs], processed=True)[0]
+        ranked = docs[np.argsort(-scores, kind="stable")][:limit]
+        return [{"fdcId": int(self.fdc_ids[doc]), "description": self.description(doc)} for doc in ranked]
+
+    def resolve(self, query: str, threshold: int = 60, candidates: int = 200):
+        """Return the best matching ``fdc_id`` for a dish name, or None."""
+        processed_query = process_text(query)
+        docs = self.candidates(processed_query, limit=candidates)
+        if not len(docs):
+            return None
+        scores = score_matrix([processed_query], [self.processed_text(doc) for doc in docs], processed=True)
+        best = best_match_indices(scores, threshold)[0]
+        return None if best < 0 else int(self.fdc_ids[docs[best]])
+
+    def close(self):
+        if self._mmap is not None:
+            # Drop views into the mapping before closing it
+            self.fdc_ids = self._processed_offsets = self._description_offsets = None
+            self.keys = self._posting_offsets = self._postings = None
+            self._processed_blob = self._description_blob = None
+            self._mmap.close()
+            self._mmap = None
+
+
+def get_index():
+    return _index
+
+
+def set_index(index):
+    global _index
+    _index = index
+
+
+def load_index(db: Session = None):
+    """Load the configured snapshot or build from the local mirror at startup."""
+    if FOOD_INDEX_PATH and os.path.exists(FOOD_INDEX_PATH):
+        set_index(FoodIndex.load(FOOD_INDEX_PATH))
+    elif FOOD_INDEX_BUILD_ON_STARTUP and db is not None:
+        set_index(FoodIndex.build_from_db(db))
+    return _index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a food index snapshot from the local FoodData Central mirror")
+    parser.add_argument("command", choices=["build"])
+    parser.add_argument("path", help="snapshot file to write")
+    args = parser.parse_args()
+
+    from database import SessionLocal
+    db = SessionLocal()
+    try:
+        index = FoodIndex.build_from_db(db)
+    finally:
+        db.close()
+    index.save(args.path)
+    print(f"Wrote {len(index)} foods to {args.path}")
+
+
+if __name__ == "__main__":
+    main()
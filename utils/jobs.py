@@ -0,0 +1,251 @@
+"""Database-backed queue for bulk calorie lookups.
+
+A job stores one ``job_items`` row per dish. Workers claim open items in
+batches, resolve them through the same pipeline as ``/get-calories``
+(``utils.lookup.lookup_food`` and ``build_calorie_result``) with
+background rate-limit priority, and write each result back to its row.
+Claims use ``FOR UPDATE SKIP LOCKED`` on PostgreSQL so any number of
+workers can share the queue; every claim also carries a token, so a
+row is only ever completed by the worker that holds it. Items whose
+worker disappeared are claimed again once their lease expires.
+
+Workers run in the API process with ``JOBS_IN_PROCESS=true``, or as
+separate processes so bulk traffic stays off the API workers::
+
+    python -m utils.jobs worker
+"""
+import argparse
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.orm import Session
+from models import Job, JobItem
+from schemas import CalorieRequest
+from utils import lookup
+from utils.nutrients import parse_views
+from utils.ratelimit import background_priority
+
+load_dotenv()
+
+JOBS_IN_PROCESS = os.getenv("JOBS_IN_PROCESS", "false").lower() == "true"
+JOB_BATCH_SIZE = int(os.getenv("JOB_BATCH_SIZE", "50"))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+
+# Rows per INSERT when a job is created
+_INSERT_CHUNK = 1000
+
+
+def create_job(db: Session, user_id: int, requests, views: str = None) -> Job:
+    """Queue one item per ``CalorieRequest``; ``views`` is stored as given."""
+    job = Job(user_id=user_id, views=views, total_items=len(requests))
+    db.add(job)
+    db.flush()
+    rows = [
+        {"job_id": job.id, "position": position, "request": request.model_dump(exclude={"log"})}
+        for position, request in enumerate(requests)
+    ]
+    for start in range(0, len(rows), _INSERT_CHUNK):
+        db.execute(insert(JobItem), rows[start:start + _INSERT_CHUNK])
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: int, user_id: int):
+    return db.execute(select(Job).where(Job.id == job_id, Job.user_id == user_id)).scalar_one_or_none()
+
+
+def list_results(db: Session, job_id: int, limit: int = 100, after: int = None):
+    """A page of a job's items in submission order.
+
+    Returns ``(items, next_after)``; ``next_after`` is None on the last page.
+    """
+    stmt = select(JobItem).where(JobItem.job_id == job_id)
+    if after is not None:
+        stmt = stmt.where(JobItem.position > after)
+    items = db.execute(stmt.order_by(JobItem.position).limit(limit + 1)).scalars().all()
+    next_after = items[limit - 1].position if len(items) > limit else None
+    return items[:limit], next_after
+
+
+def _claimable(now: datetime):
+    expired = now - timedelta(seconds=JOB_LEASE_SECONDS)
+    return or_(JobItem.status == "queued", and_(JobItem.status == "running", JobItem.claimed_at < expired))
+
+
+def claim_items(db: Session, limit: int = JOB_BATCH_SIZE):
+    """Claim up to ``limit`` open items, oldest first.
+
+    Returns ``(token, [(item id, job id, request, attempts, views)])``.
+    """
+    now = datetime.utcnow()
+    token = uuid.uuid4().hex
+    candidates = select(JobItem.id).where(_claimable(now)).order_by(JobItem.id).limit(limit)
+    if db.get_bind().dialect.name == "postgresql":
+        candidates = candidates.with_for_update(skip_locked=True)
+    ids = db.execute(candidates).scalars().all()
+    if not ids:
+        db.commit()
+        return token, []
+    # Re-checking the condition keeps two workers from claiming the same row
+    # where SKIP LOCKED is not available
+    db.execute(
+        update(JobItem)
+        .where(JobItem.id.in_(ids), _claimable(now))
+        .values(status="running", claim_token=token, claimed_at=now, attempts=JobItem.attempts + 1)
+        .execution_options(synchronize_session=False)
+    )
+    rows = db.execute(
+        select(JobItem.id, JobItem.job_id, JobItem.request, JobItem.attempts, Job.views)
+        .join(Job, Job.id == JobItem.job_id)
+        .where(JobItem.claim_token == token)
+        .order_by(JobItem.id)
+    ).all()
+    db.execute(
+        update(Job)
+        .where(Job.id.in_({row.job_id for row in rows}), Job.status == "queued")
+        .values(status="running", started_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return token, [tuple(row) for row in rows]
+
+
+def complete_items(db: Session, token: str, results) -> int:
+    """Store ``(item id, job id, status_code, result, error)`` tuples for a claim.
+
+    Items that were claimed again by another worker in the meantime are left
+    alone. Returns the number of items stored.
+    """
+    now = datetime.utcnow()
+    counts = {}
+    for item_id, job_id, status_code, result, error in results:
+        stored = db.execute(
+            update(JobItem)
+            .where(JobItem.id == item_id, JobItem.claim_token == token, JobItem.status == "running")
+            .values(status="done", status_code=status_code, result=result, error=error)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if stored:
+            done, failed = counts.get(job_id, (0, 0))
+            counts[job_id] = (done + 1, failed + (status_code != 200))
+    for job_id, (done, failed) in counts.items():
+        db.execute(
+            update(Job)
+            .where(Job.id == job_id)
+            .values(done_items=Job.done_items + done, failed_items=Job.failed_items + failed)
+            .execution_options(synchronize_session=False)
+        )
+        db.execute(
+            update(Job)
+            .where(Job.id == job_id, Job.status != "completed", Job.done_items >= Job.total_items)
+            .values(status="completed", finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+    db.commit()
+    return sum(done for done, _ in counts.values())
+
+
+async def resolve_item(request: dict, attempts: int, views: str, session_factory):
+    """``(status_code, result, error)`` for one claimed item."""
+    if attempts > JOB_MAX_ATTEMPTS:
+        return 500, None, f"Gave up after {JOB_MAX_ATTEMPTS} attempts"
+    try:
+        item = CalorieRequest.model_validate(request)
+        if item.servings <= 0:
+            raise HTTPException(status_code=400, detail="Invalid servings: must be positive")
+        db = session_factory()
+        try:
+            best_food, food_details = await lookup.lookup_food(item.dish_name, db)
+        finally:
+            db.close()
+        return 200, lookup.build_calorie_result(item, best_food, food_details, views=parse_views(views)), None
+    except HTTPException as e:
+        return e.status_code, None, e.detail
+    except Exception as e:
+        return 500, None, f"Error in get_calories: {str(e)}"
+
+
+def _run_sync(session_factory, fn, *args):
+    db = session_factory()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+async def process_batch(session_factory, batch_size: int = JOB_BATCH_SIZE,
+                        concurrency: int = JOB_WORKER_CONCURRENCY) -> int:
+    """Claim and resolve one batch; returns the number of items claimed."""
+    token, claimed = await run_in_threadpool(_run_sync, session_factory, claim_items, batch_size)
+    if not claimed:
+        return 0
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def resolve(item_id, job_id, request, attempts, views):
+        async with semaphore:
+            return (item_id, job_id, *await resolve_item(request, attempts, views, session_factory))
+
+    with background_priority():
+        results = await asyncio.gather(*(resolve(*row) for row in claimed))
+    await run_in_threadpool(_run_sync, session_factory, complete_items, token, results)
+    return len(claimed)
+
+
+async def drain(session_factory, batch_size: int = JOB_BATCH_SIZE,
+                concurrency: int = JOB_WORKER_CONCURRENCY) -> int:
+    """Process batches until no open items are left; returns the items processed."""
+    processed = 0
+    while True:
+        claimed = await process_batch(session_factory, batch_size, concurrency)
+        if not claimed:
+            return processed
+        processed += claimed
+
+
+async def run_worker(session_factory, batch_size: int = JOB_BATCH_SIZE,
+                     concurrency: int = JOB_WORKER_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+    """Process batches forever, polling every ``poll_interval`` seconds when idle."""
+    while True:
+        try:
+            claimed = await process_batch(session_factory, batch_size, concurrency)
+        except Exception:
+            # A database hiccup should not stop the worker; claimed items are retried after their lease
+            claimed = 0
+        if not claimed:
+            await asyncio.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve queued calorie jobs")
+    parser.add_argument("command", choices=["worker", "drain"])
+    parser.add_argument("--batch-size", type=int, default=JOB_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    args = parser.parse_args()
+
+    from database import Base, SessionLocal, engine
+    from utils import usda
+    Base.metadata.create_all(bind=engine)
+
+    async def work():
+        try:
+            if args.command == "drain":
+                return await drain(SessionLocal, args.batch_size, args.concurrency)
+            await run_worker(SessionLocal, args.batch_size, args.concurrency)
+        finally:
+            await usda.close_client()
+
+    processed = asyncio.run(work())
+    print(f"Processed {processed} job items")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Resolve dish names to foods and scale their nutrients.
+
+``lookup_food`` and ``build_calorie_result`` are the lookup behind
+``/get-calories``, the batch, stream and job endpoints, the cache warm-up
+and recipes.
+"""
+import os
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from database import SessionLocal
+from schemas import CalorieRequest
+from utils import food_cache, metrics, providers
+from utils.cache import MISSING
+from utils.calories import select_best_food
+from utils.nutrients import ALL_VIEWS, NutrientTable
+
+load_dotenv()
+
+# "usda" queries the live API, "local" the ingested FoodData Central mirror and
+# "static" the STATIC_FOODS_PATH fixture; several, comma separated, are queried
+# in parallel (see utils.providers)
+FOOD_DATA_SOURCE = os.getenv("FOOD_DATA_SOURCE", "usda")
+
+
+async def fetch_search_results(dish_name: str, db: Session):
+    """Candidate foods for a dish from the first provider in FOOD_DATA_SOURCE."""
+    return await providers.get_resolver(FOOD_DATA_SOURCE).providers[0].search(dish_name, db)
+
+
+async def fetch_food_details(fdc_id, db: Session):
+    return await providers.get_resolver(FOOD_DATA_SOURCE).details(fdc_id, db)
+
+
+async def lookup_food(dish_name: str, db: Session = None):
+    """Resolve a dish name to its best matching food and that food's details.
+
+    Without ``db``, a provider that needs the database gets a session of its
+    own for the lookup, so concurrent lookups never share one.
+    """
+    resolver = providers.get_resolver(FOOD_DATA_SOURCE)
+    if len(resolver.providers) > 1:
+        with metrics.stage("provider_fanout"):
+            return await resolver.resolve(dish_name, db, SessionLocal)
+    provider = resolver.providers[0]
+    if db is None and provider.uses_db:
+        db = SessionLocal()
+        try:
+            return await _lookup_one(resolver, provider, dish_name, db)
+        finally:
+            await run_in_threadpool(db.close)
+    return await _lookup_one(resolver, provider, dish_name, db)
+
+
+async def _lookup_one(resolver, provider, dish_name: str, db: Session):
+    try:
+        with metrics.stage(f"{provider.name}_search"):
+            foods = await provider.search(dish_name, db)
+    except Exception as e:
+        if isinstance(e, HTTPException):
+            raise
+        raise HTTPException(status_code=500, detail=f"Error in get_calories: {str(e)}")
+
+    if not foods:
+        raise HTTPException(status_code=404, detail="Dish not found")
+
+    # Dishes scored before (or by the warm-up job) skip the fuzzy match; the
+    # entry is dropped whenever the cached USDA candidates are replaced
+    use_resolved = FOOD_DATA_SOURCE == "usda"
+    best_food = food_cache.get_resolved(dish_name) if use_resolved else MISSING
+    if best_food is MISSING:
+        with metrics.stage("match"):
+            best_food = select_best_food(foods, dish_name)
+        if best_food is None:
+            raise HTTPException(status_code=404, detail="Dish not found")
+        if use_resolved:
+            food_cache.set_resolved(dish_name, best_food)
+
+    # Fetch full details
+    with metrics.stage(f"{provider.name}_details"):
+        food_details = await resolver.details(best_food['fdcId'], db)
+    return best_food, food_details
+
+
+def parse_nutrients(food_details: dict):
+    return NutrientTable.parse(food_details.get('foodNutrients', []))
+
+
+def build_calorie_result(request: CalorieRequest, best_food: dict, food_details: dict, views=ALL_VIEWS,
+                         cache_table: bool = True):
+    """Calorie result with nutrient lists for the requested ``views`` only.
+
+    ``cache_table=False`` parses the details without going through
+    ``food_cache.get_table``, for details that are not the cached ones
+    (e.g. recipe snapshots), which would otherwise replace the live entry.
+    """
+    fdc_id = best_food['fdcId']
+
+    serving_size = food_details.get('servingSize', 100.0)
+    serving_unit = food_details.get('servingSizeUnit', 'g')
+    household_text = food_details.get('householdServingFullText', 'N/A')
+
+    if cache_table:
+        table = food_cache.get_table(fdc_id, food_details, parse_nutrients)
+    else:
+        table = parse_nutrients(food_details)
+    if not len(table):
+        raise HTTPException(status_code=404, detail="No nutrient data available for this food")
+
+    scale_factor_serving = serving_size / 100.0 if serving_unit == 'g' else 1.0
+    per_serving = table.scale(table.per_100g, scale_factor_serving)
+
+    if request.mode == 'servings':
+        total_servings = request.servings
+    elif request.mode == 'grams':
+        if serving_unit == 'g':
+            total_servings = request.servings / serving_size
+        else:
+            total_servings = request.servings / 100.0
+    else:
+        total_servings = request.servings
+    result = {
+        'dish_name': request.dish_name,
+        'selected_food': best_food.get('description', 'N/A'),
+        'fdc_id': fdc_id,
+        'serving_size': f"{serving_size} {serving_unit}",
+        'household_serving_text': household_text,
+        'total_servings': total_servings,
+    }
+    if 'per_100g' in views:
+        result['per_100g_nutrients'] = table.records(table.values)
+    if 'per_serving' in views:
+        result['per_serving_nutrients'] = table.records(per_serving)
+    if 'total' in views:
+        result['total_nutrients'] = table.records(table.scale(per_serving, total_servings))
+    result['mode'] = request.mode
+    result['amount'] = request.servings
+    return result
@@ -0,0 +1,78 @@
+"""Incremental readers for uploaded meal plans.
+
+A meal plan is NDJSON (one ``{"dish_name", "mode", "servings"}`` object per
+line) or CSV with a header row naming the same columns. Both are read line
+by line from the request body, so memory stays bounded by the longest line
+rather than the size of the upload. CSV fields may be quoted but must not
+contain line breaks.
+"""
+import csv
+import json
+
+MAX_LINE_BYTES = 64 * 1024
+
+
+class PlanError(ValueError):
+    """A line that cannot be read as a meal plan row."""
+
+
+async def iter_lines(chunks, max_line_bytes: int = MAX_LINE_BYTES):
+    """Split an async stream of byte chunks into lines, without the line breaks.
+
+    Raises PlanError once a line grows past ``max_line_bytes``.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        lines = buffer.split(b"\n")
+        buffer = lines.pop()
+        for line in lines:
+            yield line.rstrip(b"\r")
+        if len(buffer) > max_line_bytes:
+            raise PlanError(f"Line longer than {max_line_bytes} bytes")
+    if buffer:
+        yield buffer.rstrip(b"\r")
+
+
+def _parse_ndjson(line: str) -> dict:
+    try:
+        row = json.loads(line)
+    except ValueError:
+        raise PlanError("Invalid JSON")
+    if not isinstance(row, dict):
+        raise PlanError("Each line must be a JSON object")
+    return row
+
+
+async def iter_rows(lines, fmt: str = "ndjson"):
+    """Yield ``(index, row)`` for each non-blank line.
+
+    ``row`` is a dict of the line's fields, or a PlanError for a line that
+    could not be parsed. Indexes count data rows from 0; blank lines and the
+    CSV header are not counted.
+    """
+    header = None
+    index = 0
+    async for raw in lines:
+        try:
+            # utf-8-sig drops the byte order mark spreadsheet exports start with
+            line = raw.decode("utf-8-sig" if header is None and index == 0 else "utf-8")
+        except UnicodeDecodeError:
+            yield index, PlanError("Line is not valid UTF-8")
+            index += 1
+            continue
+        if not line.strip():
+            continue
+        if fmt == "csv" and header is None:
+            header = [name.strip().lower() for name in next(csv.reader([line]))]
+            continue
+        try:
+            if fmt == "csv":
+                row = dict(zip(header, next(csv.reader([line]))))
+            else:
+                row = _parse_ndjson(line)
+        except (PlanError, csv.Error) as e:
+            yield index, PlanError(str(e))
+        else:
+            yield index, row
+        index += 1
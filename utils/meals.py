@@ -0,0 +1,102 @@
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.orm import Session
+from models import MealEntry, MealEntryNutrient
+from schemas import CalorieRequest
+from utils.rollups import ENERGY_NUTRIENT_ID, add_to_rollups
+
+
+def log_meals(db: Session, user_id: int, resolved, logged_at: datetime = None):
+    """Store ``(CalorieRequest, calorie result)`` pairs in one transaction."""
+    logged_at = logged_at or datetime.utcnow()
+    entries = []
+    for request, result in resolved:
+        entry = MealEntry(
+            user_id=user_id,
+            logged_at=logged_at,
+            dish_name=request.dish_name,
+            fdc_id=result['fdc_id'],
+            selected_food=result['selected_food'],
+            mode=request.mode,
+            amount=request.servings,
+            total_servings=result['total_servings'],
+            calories=next(
+                (n['value'] for n in result['total_nutrients'] if n['id'] == ENERGY_NUTRIENT_ID), None
+            ),
+        )
+        db.add(entry)
+        entries.append((entry, result['total_nutrients']))
+    db.flush()
+
+    rows = []
+    for entry, nutrients in entries:
+        seen = set()
+        for nut in nutrients:
+            if nut['id'] in seen:
+                continue
+            seen.add(nut['id'])
+            rows.append({
+                'meal_entry_id': entry.id,
+                'nutrient_id': nut['id'],
+                'name': nut['name'],
+                'unit': nut['unit'],
+                'amount': nut['value'],
+            })
+    if rows:
+        db.execute(insert(MealEntryNutrient), rows)
+    add_to_rollups(db, user_id, logged_at.date(), rows)
+    db.commit()
+    return [entry for entry, _ in entries]
+
+
+def log_meal(db: Session, user_id: int, request: CalorieRequest, result: dict, logged_at: datetime = None):
+    return log_meals(db, user_id, [(request, result)], logged_at=logged_at)[0]
+
+
+def encode_cursor(entry: MealEntry) -> str:
+    raw = f"{entry.logged_at.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    """Return ``(logged_at, id)`` from a cursor, raising ValueError when malformed."""
+    try:
+        logged_at, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(logged_at), int(entry_id)
+    except (UnicodeDecodeError, ValueError, binascii.Error) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def list_meals(db: Session, user_id: int, limit: int = 20, cursor: str = None):
+    """Newest-first page of a user's meals using keyset pagination.
+
+    Returns ``(entries, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    stmt = select(MealEntry).where(MealEntry.user_id == user_id)
+    if cursor:
+        logged_at, entry_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(
+            MealEntry.logged_at < logged_at,
+            and_(MealEntry.logged_at == logged_at, MealEntry.id < entry_id)
+        ))
+    stmt = stmt.order_by(MealEntry.logged_at.desc(), MealEntry.id.desc()).limit(limit + 1)
+    entries = db.execute(stmt).scalars().all()
+    next_cursor = encode_cursor(entries[limit - 1]) if len(entries) > limit else None
+    return entries[:limit], next_cursor
+
+
+def get_meal_nutrients(db: Session, entry_ids):
+    if not entry_ids:
+        return {}
+    rows = db.execute(
+        select(MealEntryNutrient).where(MealEntryNutrient.meal_entry_id.in_(entry_ids))
+    ).scalars()
+    nutrients = {}
+    for row in rows:
+        nutrients.setdefault(row.meal_entry_id, []).append(
+            {'id': row.nutrient_id, 'name': row.name, 'value': row.amount, 'unit': row.unit}
+        )
+    return nutrients
+
@@ -0,0 +1,202 @@
+"""Lightweight request instrumentation: counters, gauges, histograms and stage timers.
+
+Enable with ``METRICS_ENABLED=true``. ``GET /metrics`` then serves
+everything in the Prometheus text format, and each response carries a
+``Server-Timing`` header with the stages it went through. When disabled,
+``stage()`` returns a shared no-op context manager and ``inc``/``observe``
+return after one flag check.
+
+    with metrics.stage("usda_search"):
+        foods = await fetch_search_results(dish_name, db)
+"""
+import os
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from threading import Lock
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NULL_STAGE = nullcontext()
+_lock = Lock()
+_counters = {}    # name -> {labels: value}
+_gauges = {}      # name -> {labels: value}
+_histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+_help = {}
+# Stage durations (ms) of the current request, for Server-Timing
+_request_timings: ContextVar = ContextVar("request_timings", default=None)
+
+
+def _labels(labels: dict):
+    return tuple(sorted(labels.items()))
+
+
+def describe(name: str, text: str):
+    _help[name] = text
+
+
+def inc(name: str, amount: float = 1, **labels):
+    if not ENABLED:
+        return
+    key = _labels(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+
+def set_gauge(name: str, value: float, **labels):
+    if not ENABLED:
+        return
+    key = _labels(labels)
+    with _lock:
+        _gauges.setdefault(name, {})[key] = value
+
+
+def observe(name: str, value: float, **labels):
+    if not ENABLED:
+        return
+    key = _labels(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        state = series.get(key)
+        if state is None:
+            state = series[key] = [0] * (len(BUCKETS) + 2)
+        index = bisect_left(BUCKETS, value)
+        if index < len(BUCKETS):
+            state[index] += 1
+        state[-2] += value
+        state[-1] += 1
+
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        observe("stage_duration_seconds", elapsed, stage=self.name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[self.name] = timings.get(self.name, 0.0) + elapsed * 1000
+        return False
+
+
+def stage(name: str):
+    """Time a block as a named stage of the current request."""
+    if not ENABLED:
+        return _NULL_STAGE
+    return _Stage(name)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(_gauges.items()):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {value}")
+        for name, series in sorted(_histograms.items()):
+            if name in _help:
+                lines.append(f"# HELP {name} {_help[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, state in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, state):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {state[-1]}")
+                lines.append(f"{name}_sum{_format_labels(key)} {state[-2]}")
+                lines.append(f"{name}_count{_format_labels(key)} {state[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings: dict) -> str:
+    return ", ".join(f"{name};dur={duration:.1f}" for name, duration in timings.items())
+
+
+class MetricsMiddleware:
+    """Count and time requests, and add a ``Server-Timing`` header listing their stages."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                timings["total"] = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_timings.reset(token)
+            # Label by route template, not raw path, to keep cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", "unmatched")
+            method = scope["method"]
+            inc("http_requests_total", method=method, route=path, status=status_code)
+            observe("http_request_duration_seconds", time.perf_counter() - start, method=method, route=path)
+
+
+describe("http_requests_total", "HTTP requests by method, route template and status code")
+describe("http_request_duration_seconds", "HTTP request latency in seconds")
+describe("stage_duration_seconds", "Time spent in each instrumented stage of a request")
+describe("db_sessions_total", "Database sessions opened by the request dependencies")
+describe("auth_token_cache_total", "Bearer token verifications served from or added to the token cache")
+describe("usda_queue_depth", "USDA lookups waiting for a rate limit token, by priority")
+describe("usda_queue_wait_seconds", "Time USDA lookups waited for a rate limit token")
+describe("usda_rate_limited_total", "USDA lookups rejected because no token was free before their deadline")
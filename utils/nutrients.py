@@ -0,0 +1,142 @@
+"""Array-backed nutrient tables for calorie responses.
+
+A food's ``foodNutrients`` list is parsed once into parallel arrays. Each
+view (per 100 g, per serving, total) is then one vectorized multiply and
+round over all of them, and dicts are only built for the views a client
+asks for.
+"""
+import numpy as np
+
+ENERGY_NUTRIENT_ID = 1008
+VIEWS = ("per_100g", "per_serving", "total")
+ALL_VIEWS = frozenset(VIEWS)
+
+# Unit spellings of USDA search results and abridged foods, by their upper-case form
+_UNITS = {"G": "g", "MG": "mg", "UG": "\u00b5g", "KCAL": "kcal", "KJ": "kJ", "IU": "IU"}
+
+
+def parse_views(value: str = None):
+    """Parse a comma separated ``views`` query value, raising ValueError on unknown names."""
+    if not value:
+        return ALL_VIEWS
+    views = frozenset(view.strip() for view in value.split(",") if view.strip())
+    unknown = views - ALL_VIEWS
+    if unknown or not views:
+        raise ValueError(f"Unknown views: {', '.join(sorted(unknown))}. Choose from {', '.join(VIEWS)}")
+    return views
+
+
+def normalize_nutrients(food_nutrients):
+    """``foodNutrients`` in the USDA detail shape, whatever shape they came in.
+
+    Entries already shaped ``{'nutrient': {'id', 'name', 'unitName'}, 'amount'}``
+    are kept as they are. Flat entries, as in USDA search results
+    (``nutrientId``, ``nutrientName``, ``unitName``, ``value``) or fixture
+    files (``id``, ``name``, ``unit``, ``amount``), are converted and their
+    units spelled like the detail endpoint's. Entries without an id are dropped.
+    """
+    normalized = []
+    for entry in food_nutrients or ():
+        if not isinstance(entry, dict):
+            continue
+        if isinstance(entry.get('nutrient'), dict):
+            normalized.append(entry)
+            continue
+        nut_id = entry.get('nutrientId', entry.get('id'))
+        if nut_id is None:
+            continue
+        unit = entry.get('unitName', entry.get('unit')) or ''
+        normalized.append({
+            'nutrient': {
+                'id': nut_id,
+                'name': entry.get('nutrientName', entry.get('name')),
+                'unitName': _UNITS.get(unit.upper(), unit),
+            },
+            'amount': entry.get('amount', entry.get('value')),
+        })
+    return normalized
+
+
+def normalize_details(details: dict) -> dict:
+    """Food details with ``foodNutrients`` normalized; the same dict if they already were."""
+    food_nutrients = details.get('foodNutrients') or []
+    normalized = normalize_nutrients(food_nutrients)
+    if len(normalized) == len(food_nutrients) and all(a is b for a, b in zip(normalized, food_nutrients)):
+        return details
+    return dict(details, foodNutrients=normalized)
+
+
+def round2(values: np.ndarray) -> np.ndarray:
+    """Round to 2 decimals exactly like the builtin ``round(value, 2)``.
+
+    ``np.round`` scales by 100 first. When the scaled product lands on (or
+    next to) a half it can round the other way from Python's correctly
+    rounded result. Those few elements are redone with ``round``.
+    """
+    scaled = values * 100.0
+    rounded = np.rint(scaled)
+    ties = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    result = rounded / 100.0
+    for i in np.flatnonzero(ties):
+        result[i] = round(float(values[i]), 2)
+    return result
+
+
+class NutrientTable:
+    """Nutrient ids, names and units plus amounts per 100 g, in USDA order.
+
+    ``values`` keeps the amounts as USDA sent them for the per 100 g view;
+    ``per_100g`` is the same data as a float array for scaling.
+    """
+
+    __slots__ = ("ids", "names", "units", "values", "per_100g")
+
+    def __init__(self, ids, names, units, values):
+        self.ids = ids
+        self.names = names
+        self.units = units
+        self.values = values
+        self.per_100g = np.array(values, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def parse(cls, food_nutrients):
+        """Build a table from a USDA ``foodNutrients`` list.
+
+        Malformed entries and zero or missing amounts are skipped, and energy
+        in kJ is converted to kcal.
+        """
+        ids, names, units, values = [], [], [], []
+        for nutrient in food_nutrients or ():
+            try:
+                nut_id = nutrient['nutrient']['id']
+                nut_name = nutrient['nutrient']['name']
+                nut_value = nutrient.get('amount', 0.0)
+                nut_unit = nutrient['nutrient']['unitName']
+                if nut_value is None or nut_value == 0.0:
+                    continue
+                if nut_id == ENERGY_NUTRIENT_ID and nut_unit == 'kJ':
+                    nut_value = round(nut_value / 4.184, 2)
+                    nut_unit = 'kcal'
+                float(nut_value)
+            except (KeyError, TypeError, ValueError):
+                continue
+            ids.append(nut_id)
+            names.append(nut_name)
+            units.append(nut_unit)
+            values.append(nut_value)
+        return cls(ids, names, units, values)
+
+    def scale(self, amounts: np.ndarray, factor: float) -> np.ndarray:
+        return round2(amounts * factor)
+
+    def records(self, amounts):
+        """``[{'id', 'name', 'value', 'unit'}, ...]`` for one view."""
+        if isinstance(amounts, np.ndarray):
+            amounts = amounts.tolist()
+        return [
+            {'id': nut_id, 'name': name, 'value': value, 'unit': unit}
+            for nut_id, name, value, unit in zip(self.ids, self.names, amounts, self.units)
+        ]
@@ -0,0 +1,67 @@
+"""Run bcrypt hashing and verification outside the event loop.
+
+bcrypt is deliberately slow and holds the GIL for most of its run, so it
+runs in a process pool. The number of waiting and running jobs is capped.
+Once the cap is reached, new calls fail fast with ``PoolSaturated`` instead
+of queueing behind a login storm.
+"""
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dotenv import load_dotenv
+from utils import auth as auth_utils
+
+load_dotenv()
+
+# 0 runs hashing in the event loop's default thread pool instead of processes
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(PASSWORD_HASH_WORKERS, 1) * 8)))
+
+
+class PoolSaturated(Exception):
+    """Raised when too many password operations are already queued."""
+
+
+_executor = None
+_pending = 0
+
+
+def get_executor():
+    global _executor
+    if _executor is None and PASSWORD_HASH_WORKERS > 0:
+        _executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def pending():
+    return _pending
+
+
+async def _submit(fn, *args):
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise PoolSaturated()
+    _pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _submit(auth_utils.hash_password, password)
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await _submit(auth_utils.verify_password, plain_password, hashed_password)
@@ -0,0 +1,393 @@
+"""Food data providers and a resolver that queries several of them at once.
+
+A provider turns a dish name into candidate foods (at least ``fdcId`` and
+``description``) and an ``fdcId`` into food details in the USDA detail
+shape, with nutrients normalized by ``utils.nutrients.normalize_details``:
+
+- ``usda``: the live USDA API, behind ``utils.food_cache`` and single-flight
+- ``local``: the ingested FoodData Central mirror, or the food-name index
+  when one is loaded (``utils.fdc_mirror``, ``utils.food_index``)
+- ``static``: foods from the JSON fixture file at ``STATIC_FOODS_PATH``
+
+``FOOD_DATA_SOURCE`` names one provider or several, comma separated, in
+order of preference. With several, ``ProviderResolver`` asks all of them in
+parallel so one slow source does not hold a lookup up:
+
+- ``first`` takes the first provider to come back with a match;
+- ``best`` waits up to ``FOOD_PROVIDER_DEADLINE`` seconds and takes the
+  highest scoring match so far (the earlier provider on a tie), or the first
+  match after the deadline if none had arrived.
+
+The lookups that lose are cancelled, except those on the database, which
+run out so their session is not closed under a worker thread. Other sources can be plugged in with
+``register_provider``.
+"""
+import asyncio
+import json
+import os
+from abc import ABC, abstractmethod
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from utils import fdc_mirror, food_cache, food_index, metrics, usda
+from utils.cache import MISSING
+from utils.calories import best_match_indices, process_text, score_matrix
+from utils.nutrients import normalize_details
+from utils.singleflight import SingleFlight
+from utils.upstream import UpstreamUnavailable
+
+load_dotenv()
+
+# "first" or "best", for FOOD_DATA_SOURCE with several providers
+FOOD_PROVIDER_STRATEGY = os.getenv("FOOD_PROVIDER_STRATEGY", "first")
+# Seconds the "best" strategy waits for every provider before settling
+FOOD_PROVIDER_DEADLINE = float(os.getenv("FOOD_PROVIDER_DEADLINE", "1.0"))
+# JSON file with the foods of the "static" provider
+STATIC_FOODS_PATH = os.getenv("STATIC_FOODS_PATH")
+
+STRATEGIES = ("first", "best")
+# Candidates returned by a search, like the USDA search page size
+SEARCH_LIMIT = 20
+
+
+class FoodProvider(ABC):
+    """A source of foods; subclasses set ``name`` and implement both lookups.
+
+    ``name`` also names the lookup's metric stages, e.g. ``usda_search``.
+    Providers that query the database set ``uses_db``; the others are passed
+    whatever session the caller has, or None.
+    """
+
+    name = None
+    uses_db = False
+
+    @abstractmethod
+    async def search(self, dish_name: str, db: Session):
+        """Candidate foods for a dish name, best first where the source ranks them."""
+
+    @abstractmethod
+    async def details(self, fdc_id: int, db: Session):
+        """Details of one food; raises HTTPException(404) if the source does not have it."""
+
+
+def _usda_unavailable(e: UpstreamUnavailable):
+    retry_after = max(1, round(usda.policy.breaker.retry_after()))
+    return HTTPException(
+        status_code=503,
+        detail=f"USDA is temporarily unavailable: {str(e)}",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+class USDAProvider(FoodProvider):
+    """The USDA API. Responses are cached, and concurrent identical requests share one call."""
+
+    name = "usda"
+
+    def __init__(self):
+        self.search_flight = SingleFlight()
+        self.details_flight = SingleFlight()
+        # Background refreshes of stale cache entries, referenced until they finish
+        self._refresh_tasks = set()
+
+    async def _search(self, dish_name: str):
+        try:
+            response = await usda.search_foods(dish_name, page_size=SEARCH_LIMIT)
+        except UpstreamUnavailable as e:
+            raise _usda_unavailable(e)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Error in get_calories: {str(e)}")
+        if response.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"USDA API error: {response.status_code} - {response.text}")
+        return response.json().get("foods", [])
+
+    async def _details(self, fdc_id):
+        try:
+            details_response = await usda.get_food(fdc_id)
+        except UpstreamUnavailable as e:
+            raise _usda_unavailable(e)
+        except httpx.HTTPError as e:
+            raise HTTPException(status_code=500, detail=f"Error in get_calories: {str(e)}")
+        if details_response.status_code != 200:
+            raise HTTPException(status_code=500, detail="USDA details API error")
+        return normalize_details(details_response.json())
+
+    # Stored from inside the shared call, so the result is cached even if the
+    # request that started it goes away while others still wait for it
+
+    async def _search_and_store(self, dish_name: str):
+        foods = await self._search(dish_name)
+        await food_cache.set_search(dish_name, foods)
+        return foods
+
+    async def _details_and_store(self, fdc_id):
+        food_details = await self._details(fdc_id)
+        await food_cache.set_details(fdc_id, food_details)
+        return food_details
+
+    def _refresh_in_background(self, flight: SingleFlight, key, fetch, arg):
+        """Refetch a stale cache entry without making the caller wait for it."""
+        async def refresh():
+            try:
+                await flight.do(key, fetch, arg)
+            except Exception:
+                # Keep serving the stale entry; the circuit breaker counts the failure
+                pass
+
+        task = asyncio.create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def search(self, dish_name: str, db: Session):
+        foods = await food_cache.get_search(dish_name)
+        if foods is not MISSING:
+            return foods
+        key = food_cache.normalize_query(dish_name)
+        foods = await food_cache.get_stale_search(dish_name)
+        if foods is not MISSING:
+            self._refresh_in_background(self.search_flight, key, self._search_and_store, dish_name)
+            return foods
+        foods, _ = await self.search_flight.do(key, self._search_and_store, dish_name)
+        return foods
+
+    async def details(self, fdc_id: int, db: Session):
+        food_details = await food_cache.get_details(fdc_id)
+        if food_details is not MISSING:
+            return food_details
+        food_details = await food_cache.get_stale_details(fdc_id)
+        if food_details is not MISSING:
+            self._refresh_in_background(self.details_flight, fdc_id, self._details_and_store, fdc_id)
+            return food_details
+        food_details, _ = await self.details_flight.do(fdc_id, self._details_and_store, fdc_id)
+        return food_details
+
+
+class MirrorProvider(FoodProvider):
+    """The local FoodData Central mirror, searched through the food-name index when loaded."""
+
+    name = "local"
+    uses_db = True
+
+    async def search(self, dish_name: str, db: Session):
+        index = food_index.get_index()
+        if index is not None:
+            return index.search(dish_name, limit=SEARCH_LIMIT)
+        return await run_in_threadpool(fdc_mirror.search_foods, db, dish_name, SEARCH_LIMIT)
+
+    async def details(self, fdc_id: int, db: Session):
+        food_details = await run_in_threadpool(fdc_mirror.get_food_details, db, fdc_id)
+        if food_details is None:
+            raise HTTPException(status_code=404, detail="Food details not found")
+        return food_details
+
+
+class StaticProvider(FoodProvider):
+    """A fixed list of foods held in memory, e.g. house recipes or test fixtures.
+
+    Foods are USDA-detail-shaped dicts with an ``fdcId``; their nutrients
+    may be in any shape ``normalize_nutrients`` accepts.
+    """
+
+    name = "static"
+
+    def __init__(self, foods):
+        self.foods = {}
+        self._processed = []
+        for food in foods:
+            food = normalize_details(food)
+            self.foods[food['fdcId']] = food
+            self._processed.append((set(process_text(food.get('description', '')).split()), food))
+
+    @classmethod
+    def load(cls, path: str):
+        """Foods from a JSON file holding a list of foods or ``{"foods": [...]}``."""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get('foods', []) if isinstance(data, dict) else data)
+
+    async def search(self, dish_name: str, db: Session):
+        # Any shared token makes a candidate; the resolver does the ranking
+        tokens = set(process_text(dish_name).split())
+        return [
+            {'fdcId': food['fdcId'], 'description': food.get('description', '')}
+            for food_tokens, food in self._processed if tokens & food_tokens
+        ][:SEARCH_LIMIT]
+
+    async def details(self, fdc_id: int, db: Session):
+        food_details = self.foods.get(fdc_id)
+        if food_details is None:
+            raise HTTPException(status_code=404, detail="Food details not found")
+        return food_details
+
+
+def best_candidate(foods, dish_name: str, threshold: int = 60):
+    """``(food, score)`` for the best matching candidate, or ``(None, 0)``."""
+    if not foods:
+        return None, 0
+    scores = score_matrix([dish_name], [food.get('description', '') for food in foods])
+    index = best_match_indices(scores, threshold)[0]
+    if index < 0:
+        return None, 0
+    return foods[index], int(scores[0, index])
+
+
+class ProviderResolver:
+    """Resolve dish names against several providers at once."""
+
+    def __init__(self, providers, strategy: str = FOOD_PROVIDER_STRATEGY,
+                 deadline: float = FOOD_PROVIDER_DEADLINE, threshold: int = 60):
+        if not providers:
+            raise ValueError("At least one food data provider is required")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown provider strategy: {strategy}. Choose from {', '.join(STRATEGIES)}")
+        self.providers = list(providers)
+        self.strategy = strategy
+        self.deadline = deadline
+        self.threshold = threshold
+        # Losing lookups still running on sessions of their own, referenced until they finish
+        self._losers = set()
+
+    async def _match(self, order: int, provider: FoodProvider, dish_name: str, db: Session, session_factory=None):
+        """``(score, order, best_food, details)`` from one provider, in a new session
+        when a ``session_factory`` is given."""
+        own_session = session_factory is not None
+        if own_session:
+            db = session_factory()
+        try:
+            with metrics.stage(f"{provider.name}_search"):
+                foods = await provider.search(dish_name, db)
+            best_food, score = best_candidate(foods, dish_name, self.threshold)
+            if best_food is None:
+                raise HTTPException(status_code=404, detail="Dish not found")
+            with metrics.stage(f"{provider.name}_details"):
+                details = await provider.details(best_food['fdcId'], db)
+            return score, order, best_food, details
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error in get_calories: {str(e)}")
+        finally:
+            if own_session:
+                await run_in_threadpool(db.close)
+
+    @staticmethod
+    def _error(failed):
+        """The error to report once every provider failed: the preferred provider's,
+        unless it only had no match and another provider actually broke."""
+        failed = sorted(failed, key=lambda item: item[0])
+        for _, error in failed:
+            if error.status_code != 404:
+                return error
+        return failed[0][1]
+
+    async def _first(self, tasks, failed):
+        pending = set(tasks)
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            matches = []
+            for task in done:
+                if task.exception() is None:
+                    matches.append(task.result())
+                else:
+                    failed.append((tasks[task], task.exception()))
+            if matches:
+                return min(matches, key=lambda match: match[1])
+        raise self._error(failed)
+
+    async def resolve(self, dish_name: str, db: Session = None, session_factory=None):
+        """``(best_food, details)`` for a dish, like ``utils.lookup.lookup_food``.
+
+        A Session must not be used by two lookups at the same time. With a
+        ``session_factory`` every provider that ``uses_db`` gets a session of
+        its own, and those lookups finish in the background when they lose.
+        Without one the providers share ``db``, so they are waited for before
+        returning. Losing lookups that do not use the database are cancelled.
+        """
+        tasks = {}
+        for order, provider in enumerate(self.providers):
+            factory = session_factory if provider.uses_db else None
+            tasks[asyncio.create_task(self._match(order, provider, dish_name, db, factory))] = order
+        failed = []
+        try:
+            if self.strategy == "best":
+                done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+                matches = []
+                for task in done:
+                    if task.exception() is None:
+                        matches.append(task.result())
+                    else:
+                        failed.append((tasks[task], task.exception()))
+                if matches:
+                    match = max(matches, key=lambda match: (match[0], -match[1]))
+                else:
+                    match = await self._first({task: tasks[task] for task in pending}, failed)
+            else:
+                match = await self._first(tasks, failed)
+        finally:
+            losers = []
+            for task, order in tasks.items():
+                # Cancelling does not stop a worker thread that is querying a
+                # session, so lookups on the database run out instead
+                if self.providers[order].uses_db:
+                    losers.append(task)
+                else:
+                    task.cancel()
+            if session_factory is None:
+                await asyncio.gather(*losers, return_exceptions=True)
+            else:
+                for task in losers:
+                    if not task.done():
+                        self._losers.add(task)
+                        task.add_done_callback(self._losers.discard)
+        _, order, best_food, details = match
+        metrics.inc("food_provider_wins_total", provider=self.providers[order].name)
+        return best_food, details
+
+    async def details(self, fdc_id: int, db: Session):
+        """Details from the first provider that has the food."""
+        failed = []
+        for order, provider in enumerate(self.providers):
+            try:
+                return await provider.details(fdc_id, db)
+            except HTTPException as e:
+                failed.append((order, e))
+        raise self._error(failed)
+
+
+_providers = {}
+_resolvers = {}
+
+
+def register_provider(provider: FoodProvider):
+    """Make a provider available to ``FOOD_DATA_SOURCE`` under its ``name``."""
+    _providers[provider.name] = provider
+    _resolvers.clear()
+
+
+def get_provider(name: str) -> FoodProvider:
+    provider = _providers.get(name)
+    if provider is None:
+        if name == USDAProvider.name:
+            provider = USDAProvider()
+        elif name == MirrorProvider.name:
+            provider = MirrorProvider()
+        elif name == StaticProvider.name and STATIC_FOODS_PATH:
+            provider = StaticProvider.load(STATIC_FOODS_PATH)
+        elif name == StaticProvider.name:
+            raise ValueError("The static food data provider needs STATIC_FOODS_PATH")
+        else:
+            raise ValueError(f"Unknown food data provider: {name}")
+        _providers[name] = provider
+    return provider
+
+
+def get_resolver(names: str) -> ProviderResolver:
+    """The resolver for a comma separated list of provider names, created once per list."""
+    resolver = _resolvers.get(names)
+    if resolver is None:
+        resolver = _resolvers[names] = ProviderResolver(
+            [get_provider(name.strip()) for name in names.split(",") if name.strip()]
+        )
+    return resolver
@@ -0,0 +1,178 @@
+"""Client-side rate limiting and priority scheduling for upstream API keys.
+
+Each API key gets a token bucket sized to its quota. ``acquire`` hands out
+a key with a free token. Callers that have to wait queue by priority:
+interactive lookups are served before background work such as cache
+warmup. Background callers also leave a reserve of tokens untouched, so a
+burst of user traffic still finds headroom.
+
+Run background work with::
+
+    with background_priority():
+        await fetch_search_results(...)
+"""
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from utils import metrics
+from utils.upstream import UpstreamUnavailable
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+current_priority: ContextVar = ContextVar("upstream_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def background_priority():
+    token = current_priority.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+class RateLimited(UpstreamUnavailable):
+    """No API key had a free token before the caller's deadline."""
+
+
+class TokenBucket:
+    """``rate`` tokens per second up to ``capacity``; a rate of 0 or less never limits."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.rate <= 0
+
+    def available(self, now: float = None) -> float:
+        if self.unlimited:
+            return float("inf")
+        now = time.monotonic() if now is None else now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def take(self):
+        if not self.unlimited:
+            self.tokens -= 1
+
+    def time_until(self, tokens: float, now: float = None) -> float:
+        missing = tokens - self.available(now)
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def penalize(self, seconds: float):
+        """Empty the bucket for ``seconds``, e.g. after the upstream answered 429."""
+        if not self.unlimited:
+            self.available()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class PriorityScheduler:
+    def __init__(self, keys, rate_per_hour: float = 0, burst: float = 1, background_reserve: float = 0.0):
+        self.keys = list(keys) or [None]
+        self.buckets = [TokenBucket(rate_per_hour / 3600.0, burst) for _ in self.keys]
+        # Tokens background callers must leave in a bucket
+        self.reserve = background_reserve * burst
+        self._waiters = {INTERACTIVE: deque(), BACKGROUND: deque()}
+        self._timer = None
+        self._next = 0
+
+    def _take(self, priority: int):
+        """Take a token from the bucket with the most tokens, rotating between ties."""
+        now = time.monotonic()
+        needed = 1 + (self.reserve if priority == BACKGROUND else 0)
+        best = None
+        for offset in range(len(self.buckets)):
+            index = (self._next + offset) % len(self.buckets)
+            tokens = self.buckets[index].available(now)
+            if tokens >= needed and (best is None or tokens > self.buckets[best].tokens):
+                best = index
+                if self.buckets[index].unlimited:
+                    break
+        if best is None:
+            return None
+        self._next = best + 1
+        self.buckets[best].take()
+        return best
+
+    def _has_waiters(self, up_to_priority: int) -> bool:
+        return any(
+            any(not waiter.done() for waiter in self._waiters[priority])
+            for priority in self._waiters if priority <= up_to_priority
+        )
+
+    def _record_depth(self):
+        for priority, queue in self._waiters.items():
+            metrics.set_gauge("usda_queue_depth", sum(1 for waiter in queue if not waiter.done()),
+                              priority=PRIORITY_NAMES[priority])
+
+    def _dispatch(self):
+        self._timer = None
+        for priority in sorted(self._waiters):
+            queue = self._waiters[priority]
+            while queue:
+                if queue[0].done():
+                    queue.popleft()
+                    continue
+                index = self._take(priority)
+                if index is None:
+                    break
+                queue.popleft().set_result(index)
+            if queue:
+                # Lower priorities wait while a higher one is still queued
+                break
+        self._record_depth()
+        self._schedule()
+
+    def _schedule(self):
+        if self._timer is not None or not self._has_waiters(BACKGROUND):
+            return
+        now = time.monotonic()
+        priority = INTERACTIVE if self._has_waiters(INTERACTIVE) else BACKGROUND
+        needed = 1 + (self.reserve if priority == BACKGROUND else 0)
+        delay = min(bucket.time_until(needed, now) for bucket in self.buckets)
+        self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    async def acquire(self, priority: int = None, timeout: float = None):
+        """Wait for a token and return ``(key, bucket index)``; raise RateLimited after ``timeout``."""
+        priority = current_priority.get() if priority is None else priority
+        if not self._has_waiters(priority):
+            index = self._take(priority)
+            if index is not None:
+                return self.keys[index], index
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(waiter)
+        self._record_depth()
+        self._schedule()
+        start = time.monotonic()
+        try:
+            index = await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("usda_rate_limited_total", priority=PRIORITY_NAMES[priority])
+            raise RateLimited("USDA API quota exhausted, please retry later")
+        finally:
+            metrics.observe("usda_queue_wait_seconds", time.monotonic() - start, priority=PRIORITY_NAMES[priority])
+            self._record_depth()
+        return self.keys[index], index
+
+    def penalize(self, index: int, seconds: float):
+        self.buckets[index].penalize(seconds)
+
+    def stats(self):
+        return {
+            "keys": len(self.keys),
+            "queued": {
+                PRIORITY_NAMES[priority]: sum(1 for waiter in queue if not waiter.done())
+                for priority, queue in self._waiters.items()
+            },
+            "tokens": [None if bucket.unlimited else round(bucket.available(), 2) for bucket in self.buckets],
+        }
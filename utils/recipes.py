@@ -0,0 +1,243 @@
+"""Recipes with cached nutrient totals.
+
+A recipe's ingredients are foods (by ``fdc_id``) or other recipes. The
+totals for the whole recipe are stored on its row, so reading a recipe's
+nutrition is a single row read. They are recomputed only when the recipe is
+flagged ``stale``:
+
+- when its ingredients change, which also flags every recipe that includes
+  it, directly or through other recipes;
+- when the details of one of its foods change. Foods are snapshotted in
+  ``recipe_foods`` with a fingerprint, so a refetch that returns the same
+  nutrients invalidates nothing.
+
+Recomputation walks nested recipes depth first and memoizes each recipe's
+totals, so a sub-recipe shared by several branches is only summed once.
+Foods are scaled with ``build_calorie_result``, like ``/get-calories``.
+
+To pick up changed USDA data for every stored food and recompute the
+recipes it affects::
+
+    python -m utils.recipes refresh
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.orm import Session
+from models import Recipe, RecipeFood, RecipeIngredient
+from schemas import CalorieRequest
+from utils import lookup
+from utils.nutrients import ENERGY_NUTRIENT_ID, NutrientTable
+
+
+class RecipeCycleError(ValueError):
+    """A recipe would include itself."""
+
+
+def snapshot_details(details: dict) -> dict:
+    """The parts of USDA food details recipe totals depend on, in a stable shape."""
+    table = NutrientTable.parse(details.get('foodNutrients', []))
+    return {
+        # Floats, so 100 and 100.0 from different sources fingerprint the same
+        'servingSize': float(details.get('servingSize') or 100.0),
+        'servingSizeUnit': details.get('servingSizeUnit', 'g'),
+        'foodNutrients': [
+            {'nutrient': {'id': nut_id, 'name': name, 'unitName': unit}, 'amount': float(value)}
+            for nut_id, name, unit, value in zip(table.ids, table.names, table.units, table.values)
+        ],
+    }
+
+
+def _fingerprint(snapshot: dict) -> str:
+    return hashlib.sha256(json.dumps(snapshot, sort_keys=True).encode()).hexdigest()
+
+
+def store_food(db: Session, fdc_id: int, description: str, details: dict) -> RecipeFood:
+    """Upsert a food's snapshot, flagging the recipes that use it if its nutrients changed."""
+    snapshot = snapshot_details(details)
+    fingerprint = _fingerprint(snapshot)
+    food = db.get(RecipeFood, fdc_id)
+    if food is None:
+        food = RecipeFood(fdc_id=fdc_id, description=description, details=snapshot, fingerprint=fingerprint)
+        db.add(food)
+    elif food.fingerprint != fingerprint:
+        food.details = snapshot
+        food.fingerprint = fingerprint
+        food.updated_at = datetime.utcnow()
+        users = db.execute(
+            select(RecipeIngredient.recipe_id).where(RecipeIngredient.fdc_id == fdc_id)
+        ).scalars().all()
+        mark_stale(db, users)
+    return food
+
+
+def _parents(db: Session, recipe_ids) -> set:
+    return set(db.execute(
+        select(RecipeIngredient.recipe_id).where(RecipeIngredient.sub_recipe_id.in_(recipe_ids))
+    ).scalars())
+
+
+def _children(db: Session, recipe_ids) -> set:
+    return set(db.execute(
+        select(RecipeIngredient.sub_recipe_id).where(
+            RecipeIngredient.recipe_id.in_(recipe_ids), RecipeIngredient.sub_recipe_id.is_not(None)
+        )
+    ).scalars())
+
+
+def _closure(db: Session, recipe_ids, step) -> set:
+    seen = set()
+    frontier = set(recipe_ids)
+    while frontier:
+        seen |= frontier
+        frontier = step(db, frontier) - seen
+    return seen
+
+
+def mark_stale(db: Session, recipe_ids) -> set:
+    """Flag recipes and every recipe that includes them; returns the flagged ids."""
+    if not recipe_ids:
+        return set()
+    flagged = _closure(db, recipe_ids, _parents)
+    db.execute(
+        update(Recipe).where(Recipe.id.in_(flagged)).values(stale=True)
+        .execution_options(synchronize_session="fetch")
+    )
+    return flagged
+
+
+def check_no_cycle(db: Session, recipe_id: int, sub_recipe_ids):
+    """Raise RecipeCycleError if recipe_id is one of, or is included by, ``sub_recipe_ids``."""
+    if recipe_id is not None and sub_recipe_ids and recipe_id in _closure(db, sub_recipe_ids, _children):
+        raise RecipeCycleError("A recipe cannot include itself")
+
+
+def set_ingredients(db: Session, recipe: Recipe, ingredients):
+    """Replace a recipe's ingredients with ``(fdc_id, sub_recipe_id, mode, amount)`` tuples."""
+    check_no_cycle(db, recipe.id, {sub_id for _, sub_id, _, _ in ingredients if sub_id is not None})
+    db.execute(delete(RecipeIngredient).where(RecipeIngredient.recipe_id == recipe.id))
+    db.add_all(
+        RecipeIngredient(recipe_id=recipe.id, position=position, fdc_id=fdc_id,
+                         sub_recipe_id=sub_id, mode=mode, amount=amount)
+        for position, (fdc_id, sub_id, mode, amount) in enumerate(ingredients)
+    )
+    db.flush()
+    mark_stale(db, {recipe.id})
+
+
+def _food_totals(food: RecipeFood, mode: str, amount: float):
+    request = CalorieRequest(dish_name=food.description or str(food.fdc_id), mode=mode, servings=amount, log=False)
+    best_food = {'fdcId': food.fdc_id, 'description': food.description}
+    try:
+        return lookup.build_calorie_result(
+            request, best_food, food.details, views={'total'}, cache_table=False
+        )['total_nutrients']
+    except HTTPException:
+        # No nutrient data: the food adds nothing
+        return []
+
+
+def compute_totals(db: Session, recipe: Recipe, memo: dict = None, path: tuple = ()):
+    """The recipe's total nutrient records, recomputing them if the recipe is stale.
+
+    ``memo`` maps recipe ids to totals already known in this pass.
+    """
+    memo = {} if memo is None else memo
+    if recipe.id in memo:
+        return memo[recipe.id]
+    if recipe.id in path:
+        raise RecipeCycleError("A recipe cannot include itself")
+    if not recipe.stale and recipe.totals is not None:
+        memo[recipe.id] = recipe.totals
+        return recipe.totals
+
+    totals = {}
+    ingredients = db.execute(
+        select(RecipeIngredient).where(RecipeIngredient.recipe_id == recipe.id).order_by(RecipeIngredient.position)
+    ).scalars().all()
+    for ingredient in ingredients:
+        if ingredient.sub_recipe_id is not None:
+            sub_recipe = db.get(Recipe, ingredient.sub_recipe_id)
+            factor = ingredient.amount / sub_recipe.servings
+            records = [
+                dict(record, value=record['value'] * factor)
+                for record in compute_totals(db, sub_recipe, memo, path + (recipe.id,))
+            ]
+        else:
+            records = _food_totals(db.get(RecipeFood, ingredient.fdc_id), ingredient.mode, ingredient.amount)
+        for record in records:
+            total = totals.setdefault(record['id'], dict(record, value=0.0))
+            total['value'] += record['value']
+
+    recipe.totals = [dict(total, value=round(total['value'], 2)) for total in totals.values()]
+    recipe.calories = next((t['value'] for t in recipe.totals if t['id'] == ENERGY_NUTRIENT_ID), 0.0)
+    recipe.stale = False
+    recipe.computed_at = datetime.utcnow()
+    memo[recipe.id] = recipe.totals
+    return recipe.totals
+
+
+def recompute_stale(db: Session) -> int:
+    """Recompute every stale recipe in one memoized pass; returns how many were stale."""
+    stale = db.execute(select(Recipe).where(Recipe.stale.is_(True))).scalars().all()
+    memo = {}
+    for recipe in stale:
+        compute_totals(db, recipe, memo)
+    db.commit()
+    return len(stale)
+
+
+def per_serving(recipe: Recipe):
+    return [dict(total, value=round(total['value'] / recipe.servings, 2)) for total in recipe.totals or []]
+
+
+async def refresh_foods(session_factory) -> int:
+    """Refetch the details of every stored food; returns how many foods changed."""
+    db = session_factory()
+    try:
+        changed = 0
+        for food in db.execute(select(RecipeFood)).scalars().all():
+            fingerprint = food.fingerprint
+            try:
+                details = await lookup.fetch_food_details(food.fdc_id, db)
+            except HTTPException:
+                continue
+            store_food(db, food.fdc_id, food.description, details)
+            changed += food.fingerprint != fingerprint
+        db.commit()
+        return changed
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain cached recipe totals")
+    parser.add_argument("command", choices=["refresh", "recompute"])
+    args = parser.parse_args()
+
+    from database import Base, SessionLocal, engine
+    from utils import usda
+    Base.metadata.create_all(bind=engine)
+
+    if args.command == "refresh":
+        async def refresh():
+            try:
+                return await refresh_foods(SessionLocal)
+            finally:
+                await usda.close_client()
+        print(f"{asyncio.run(refresh())} foods changed")
+
+    db = SessionLocal()
+    try:
+        count = recompute_stale(db)
+    finally:
+        db.close()
+    print(f"Recomputed {count} recipes")
+
+
+if __name__ == "__main__":
+    main()
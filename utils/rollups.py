@@ -0,0 +1,150 @@
+"""Per-user daily nutrient rollups.
+
+``daily_nutrient_rollups`` holds one row per user, day and nutrient. It is
+updated in the same transaction that logs a meal, so summaries read
+O(days) rows however many meals a user logs. ``rebuild_rollups``
+recomputes it from the raw meal tables, for backfills or repairs::
+
+    python -m utils.rollups rebuild [--user-id 42]
+"""
+import argparse
+from datetime import date
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from models import DailyNutrientRollup, MealEntry, MealEntryNutrient
+
+ENERGY_NUTRIENT_ID = 1008
+
+
+def add_to_rollups(db: Session, user_id: int, day: date, nutrients):
+    """Add meal_entry_nutrients rows (``nutrient_id``, ``name``, ``unit``, ``amount``) to a day's rollups.
+
+    Does not commit; call it inside the transaction that stores the meal.
+    """
+    rows = {}
+    for nut in nutrients:
+        row = rows.setdefault(nut['nutrient_id'], {
+            'user_id': user_id, 'day': day, 'nutrient_id': nut['nutrient_id'],
+            'name': nut['name'], 'unit': nut['unit'], 'amount': 0.0,
+        })
+        row['amount'] += nut['amount'] or 0.0
+    if not rows:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        stmt = dialect_insert(DailyNutrientRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["user_id", "day", "nutrient_id"],
+            set_={"amount": DailyNutrientRollup.amount + stmt.excluded.amount},
+        )
+        db.execute(stmt, list(rows.values()))
+        return
+
+    for row in rows.values():
+        updated = db.execute(
+            update(DailyNutrientRollup)
+            .where(
+                DailyNutrientRollup.user_id == user_id,
+                DailyNutrientRollup.day == day,
+                DailyNutrientRollup.nutrient_id == row['nutrient_id'],
+            )
+            .values(amount=DailyNutrientRollup.amount + row['amount'])
+        )
+        if updated.rowcount == 0:
+            db.execute(insert(DailyNutrientRollup), [row])
+
+
+def rebuild_rollups(db: Session, user_id: int = None):
+    """Recompute rollups from meal_entries and meal_entry_nutrients."""
+    clear = delete(DailyNutrientRollup)
+    source = (
+        select(
+            MealEntry.user_id,
+            func.date(MealEntry.logged_at),
+            MealEntryNutrient.nutrient_id,
+            func.max(MealEntryNutrient.name),
+            func.max(MealEntryNutrient.unit),
+            func.sum(MealEntryNutrient.amount),
+        )
+        .join(MealEntryNutrient, MealEntryNutrient.meal_entry_id == MealEntry.id)
+        .group_by(MealEntry.user_id, func.date(MealEntry.logged_at), MealEntryNutrient.nutrient_id)
+    )
+    if user_id is not None:
+        clear = clear.where(DailyNutrientRollup.user_id == user_id)
+        source = source.where(MealEntry.user_id == user_id)
+    db.execute(clear)
+    result = db.execute(insert(DailyNutrientRollup).from_select(
+        ["user_id", "day", "nutrient_id", "name", "unit", "amount"], source
+    ))
+    db.commit()
+    return result.rowcount
+
+
+def period_start(db: Session, column, period: str):
+    """SQL expression truncating a date or timestamp column to its day or ISO week (Monday)."""
+    if period == "day":
+        return func.date(column)
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date(func.date_trunc("week", column))
+    # SQLite: move to the next Sunday (or stay), then back six days to Monday
+    return func.date(column, "weekday 0", "-6 days")
+
+
+def as_date(value) -> str:
+    return value.isoformat() if isinstance(value, date) else str(value)
+
+
+def rollup_totals(db: Session, user_id: int, start: date, end: date, period: str = "day"):
+    """Per-period nutrient totals for ``start <= day <= end`` read from the rollups."""
+    if period == "day":
+        bucket = DailyNutrientRollup.day.label("period_start")
+    else:
+        bucket = period_start(db, DailyNutrientRollup.day, period).label("period_start")
+    stmt = (
+        select(
+            bucket,
+            DailyNutrientRollup.nutrient_id,
+            func.max(DailyNutrientRollup.name),
+            func.max(DailyNutrientRollup.unit),
+            func.sum(DailyNutrientRollup.amount),
+        )
+        .where(
+            DailyNutrientRollup.user_id == user_id,
+            DailyNutrientRollup.day >= start,
+            DailyNutrientRollup.day <= end,
+        )
+        .group_by(bucket, DailyNutrientRollup.nutrient_id)
+        .order_by(bucket, DailyNutrientRollup.nutrient_id)
+    )
+    periods = {}
+    for bucket_start, nutrient_id, name, unit, amount in db.execute(stmt):
+        key = as_date(bucket_start)
+        summary = periods.setdefault(key, {'period_start': key, 'calories': 0.0, 'nutrients': []})
+        value = round(amount or 0.0, 2)
+        summary['nutrients'].append({'id': nutrient_id, 'name': name, 'value': value, 'unit': unit})
+        if nutrient_id == ENERGY_NUTRIENT_ID:
+            summary['calories'] = value
+    return list(periods.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain per-user daily nutrient rollups")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--user-id", type=int, help="only rebuild this user's rollups")
+    args = parser.parse_args()
+
+    from database import Base, SessionLocal, engine
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        count = rebuild_rollups(db, user_id=args.user_id)
+    finally:
+        db.close()
+    print(f"Rebuilt {count} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""Cache shared by all worker processes on a host through an mmap'd file.
+
+``ShmCache`` has the same interface as ``utils.cache.TTLCache``, so
+``utils.food_cache`` can use either (``FOOD_CACHE_BACKEND=shm``). With
+``uvicorn --workers N`` every worker then reads the same entries instead
+of keeping, and warming, N private copies.
+
+The file (under ``/dev/shm`` by default, so it never touches a disk) is a
+set-associative table of fixed-size slots: a key hashes to one set of
+``ways`` slots, and a write that finds no free slot in its set evicts the
+least recently read one. The byte budget is fixed when the file is created.
+Values are stored as zlib-compressed JSON. Values that do not fit in a slot
+are not cached.
+
+Concurrency:
+
+- Writers lock the set they write with ``fcntl.lockf``, plus a thread
+  lock, because POSIX record locks do not exclude threads of one process.
+- Readers take no lock. Each slot carries a sequence number that writers
+  make odd while they write and even again when done. A reader decompresses
+  straight from the mapping and only accepts the value if the sequence
+  number was even and unchanged from before to after the read (a seqlock).
+
+Each process also keeps the last ``decoded_size`` values it decoded, keyed
+by slot and sequence number, so re-reading an unchanged entry returns the
+same object without decompressing it again.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from utils.cache import MISSING
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+_MAGIC = b"SHMCACH1"
+# magic, ways, sets, slot size
+_HEADER = struct.Struct("<8sIQQ")
+_HEADER_SIZE = 64
+# sequence, key hash, expires at, last access, key length, value length
+_SLOT = struct.Struct("<QQddII")
+_LAST_ACCESS_OFFSET = 24
+_READ_ATTEMPTS = 4
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class ShmCache:
+    """TTL cache in a shared mmap'd file, LRU within each set of ``ways`` slots."""
+
+    def __init__(self, path: str, size_bytes: int = 64 * 1024 * 1024, slot_size: int = 16384,
+                 ways: int = 8, ttl: float = 3600.0, stale_ttl: float = 0.0, decoded_size: int = 256):
+        if fcntl is None:
+            raise RuntimeError("ShmCache needs fcntl (POSIX)")
+        if slot_size <= _SLOT.size:
+            raise ValueError(f"slot_size must be larger than {_SLOT.size} bytes")
+        self.path = path
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._lock = threading.Lock()
+        self._decoded = OrderedDict()  # key -> (slot offset, sequence, value)
+        self._decoded_size = decoded_size
+        self._decoded_lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        sets = max(size_bytes // (slot_size * ways), 1)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            if len(header) == _HEADER.size and header.startswith(_MAGIC):
+                # Another worker created the file; its geometry wins
+                _, ways, sets, slot_size = _HEADER.unpack(header)
+            else:
+                os.ftruncate(self._fd, _HEADER_SIZE + sets * ways * slot_size)
+                os.pwrite(self._fd, _HEADER.pack(_MAGIC, ways, sets, slot_size), 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+        self.ways = ways
+        self.sets = sets
+        self.slot_size = slot_size
+        self._mm = mmap.mmap(self._fd, _HEADER_SIZE + sets * ways * slot_size)
+
+    @property
+    def maxsize(self) -> int:
+        return self.sets * self.ways
+
+    def close(self):
+        self._mm.close()
+        os.close(self._fd)
+
+    def _set_offset(self, key_hash: int) -> int:
+        return _HEADER_SIZE + (key_hash % self.sets) * self.ways * self.slot_size
+
+    def _read(self, key: str):
+        """``(value, expires_at)`` for a key, or ``(MISSING, None)``."""
+        mm = self._mm
+        with self._decoded_lock:
+            decoded = self._decoded.get(key)
+        if decoded is not None:
+            offset, seq, value = decoded
+            slot = _SLOT.unpack_from(mm, offset)
+            if slot[0] == seq:
+                with self._decoded_lock:
+                    if key in self._decoded:
+                        self._decoded.move_to_end(key)
+                struct.pack_into("<d", mm, offset + _LAST_ACCESS_OFFSET, time.time())
+                return value, slot[2]
+        raw_key = key.encode()
+        key_hash = _hash(raw_key)
+        set_offset = self._set_offset(key_hash)
+        for way in range(self.ways):
+            offset = set_offset + way * self.slot_size
+            for _ in range(_READ_ATTEMPTS):
+                seq, slot_hash, expires_at, _, key_len, value_len = _SLOT.unpack_from(mm, offset)
+                if seq & 1:
+                    # A write is in progress
+                    time.sleep(0)
+                    continue
+                if slot_hash != key_hash or key_len != len(raw_key):
+                    break
+                start = offset + _SLOT.size
+                try:
+                    with memoryview(mm) as view:
+                        if view[start:start + key_len] != raw_key:
+                            break
+                        payload = zlib.decompress(view[start + key_len:start + key_len + value_len])
+                    value = json.loads(payload)
+                except (zlib.error, ValueError):
+                    # Torn read of a slot being rewritten; the check below retries it
+                    value = MISSING
+                if _SLOT.unpack_from(mm, offset)[0] == seq and value is not MISSING:
+                    struct.pack_into("<d", mm, offset + _LAST_ACCESS_OFFSET, time.time())
+                    self._remember(key, offset, seq, value)
+                    return value, expires_at
+        return MISSING, None
+
+    def _remember(self, key: str, offset: int, seq: int, value):
+        if self._decoded_size <= 0:
+            return
+        with self._decoded_lock:
+            self._decoded[key] = (offset, seq, value)
+            self._decoded.move_to_end(key)
+            while len(self._decoded) > self._decoded_size:
+                self._decoded.popitem(last=False)
+
+    def __len__(self):
+        now = time.time()
+        count = 0
+        for index in range(self.sets * self.ways):
+            _, _, expires_at, _, key_len, _ = _SLOT.unpack_from(self._mm, _HEADER_SIZE + index * self.slot_size)
+            count += key_len > 0 and expires_at > now
+        return count
+
+    def get(self, key):
+        value, expires_at = self._read(key)
+        if value is MISSING or expires_at <= time.time():
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return value
+
+    def get_stale(self, key):
+        """The entry's value even if expired, within its stale window, or MISSING."""
+        value, expires_at = self._read(key)
+        if value is MISSING or expires_at + self.stale_ttl <= time.time():
+            return MISSING
+        self.stale_hits += 1
+        return value
+
+    @contextmanager
+    def _locked(self, offset: int, length: int):
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, offset)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, offset)
+
+    def _write_slot(self, offset: int, key_hash: int, expires_at: float, key: bytes, payload: bytes):
+        mm = self._mm
+        # Odd while writing; a writer that died mid-write left it odd already
+        seq = _SLOT.unpack_from(mm, offset)[0] | 1
+        struct.pack_into("<Q", mm, offset, seq)
+        start = offset + _SLOT.size
+        mm[start:start + len(key) + len(payload)] = key + payload
+        _SLOT.pack_into(mm, offset, seq, key_hash, expires_at, time.time(), len(key), len(payload))
+        struct.pack_into("<Q", mm, offset, seq + 1)
+
+    def set(self, key, value, ttl: float = None):
+        raw_key = key.encode()
+        payload = zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 1)
+        if _SLOT.size + len(raw_key) + len(payload) > self.slot_size:
+            return False
+        key_hash = _hash(raw_key)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        set_offset = self._set_offset(key_hash)
+        with self._locked(set_offset, self.ways * self.slot_size):
+            now = time.time()
+            victim = None
+            victim_rank = None
+            for way in range(self.ways):
+                offset = set_offset + way * self.slot_size
+                _, slot_hash, slot_expires, last_access, key_len, _ = _SLOT.unpack_from(self._mm, offset)
+                start = offset + _SLOT.size
+                if slot_hash == key_hash and self._mm[start:start + key_len] == raw_key:
+                    victim = offset
+                    break
+                # Free and dead slots go first, then the least recently read
+                rank = (-1.0 if key_len == 0 or slot_expires + self.stale_ttl <= now else last_access)
+                if victim_rank is None or rank < victim_rank:
+                    victim, victim_rank = offset, rank
+            self._write_slot(victim, key_hash, expires_at, raw_key, payload)
+        return True
+
+    def delete(self, key):
+        raw_key = key.encode()
+        key_hash = _hash(raw_key)
+        set_offset = self._set_offset(key_hash)
+        with self._locked(set_offset, self.ways * self.slot_size):
+            for way in range(self.ways):
+                offset = set_offset + way * self.slot_size
+                _, slot_hash, _, _, key_len, _ = _SLOT.unpack_from(self._mm, offset)
+                start = offset + _SLOT.size
+                if slot_hash == key_hash and self._mm[start:start + key_len] == raw_key:
+                    self._write_slot(offset, 0, 0.0, b"", b"")
+
+    def clear(self):
+        with self._locked(_HEADER_SIZE, self.sets * self.ways * self.slot_size):
+            for index in range(self.sets * self.ways):
+                offset = _HEADER_SIZE + index * self.slot_size
+                if _SLOT.unpack_from(self._mm, offset)[4]:
+                    self._write_slot(offset, 0, 0.0, b"", b"")
+            self.hits = 0
+            self.misses = 0
+            self.stale_hits = 0
+        with self._decoded_lock:
+            self._decoded.clear()
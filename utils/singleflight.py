@@ -0,0 +1,54 @@
+import asyncio
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key.
+
+    The first caller for a key starts the work as a separate task and later
+    callers await the same task. Every caller receives the result or the
+    raised exception. A cancelled caller only stops waiting; the shared task
+    is cancelled once no callers are left waiting for it. Side effects such
+    as storing the result belong in ``fn`` itself, so they happen even if the
+    caller that started it is cancelled.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    def __len__(self):
+        return len(self._calls)
+
+    async def do(self, key, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` once per key at a time.
+
+        Returns ``(result, leader)`` where ``leader`` is True only for the
+        caller whose call started the shared task.
+        """
+        call = self._calls.get(key)
+        leader = call is None
+        if leader:
+            task = asyncio.ensure_future(fn(*args, **kwargs))
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda done: self._finish(key, done))
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task), leader
+        except asyncio.CancelledError:
+            if not task.done() and call[1] == 1:
+                # Forget the call now, so a caller arriving before the task has
+                # finished cancelling starts a new one instead of joining it
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                task.cancel()
+            raise
+        finally:
+            call[1] -= 1
+
+    def _finish(self, key, task):
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+        # Mark the exception as retrieved when every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,180 @@
+"""Call policy for upstream HTTP APIs: deadlines, retries and a circuit breaker.
+
+``UpstreamPolicy.get`` wraps one idempotent GET. It retries transport
+errors and 429/5xx responses with full-jitter exponential backoff, and the
+whole call, retries included, must finish within ``deadline`` seconds.
+After ``failure_threshold`` consecutive failed calls the circuit opens,
+and calls fail fast with ``CircuitOpenError`` for ``reset_timeout``
+seconds. Then a single probe call decides whether it closes again.
+"""
+import asyncio
+import random
+import time
+import httpx
+from utils import metrics
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream could not be reached within the policy's limits."""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    pass
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.reset()
+
+    def reset(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.failure_threshold <= 0 or self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        # Half open: let one probe through at a time
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or (
+            self.failure_threshold > 0 and self.failures >= self.failure_threshold
+        ):
+            if self.state != self.OPEN:
+                metrics.inc("upstream_circuit_opened_total")
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give up a probe slot without a verdict, e.g. when the caller was cancelled."""
+        self._probing = False
+
+    def retry_after(self) -> float:
+        """Seconds until the next probe is allowed."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+
+class UpstreamPolicy:
+    """See the module docstring.
+
+    With a ``scheduler`` (``utils.ratelimit.PriorityScheduler``), every
+    attempt first waits for a rate limit token and sends the key it was
+    given as the ``key_param`` query parameter.
+    """
+
+    def __init__(self, name: str, deadline: float = 8.0, retries: int = 2, backoff: float = 0.1,
+                 backoff_max: float = 1.0, breaker: CircuitBreaker = None, scheduler=None,
+                 key_param: str = "api_key", rate_limit_penalty: float = 60.0):
+        self.name = name
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+        self.scheduler = scheduler
+        self.key_param = key_param
+        self.rate_limit_penalty = rate_limit_penalty
+
+    def _retry_after(self, response) -> float:
+        try:
+            return float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError, AttributeError):
+            return self.rate_limit_penalty
+
+    def _delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff * 2 ** attempt))
+
+    async def get(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+        """GET ``url`` under the policy.
+
+        Returns the last response, which may be an error status once retries
+        run out. Raises the last ``httpx.HTTPError`` if no attempt got a
+        response. Raises ``CircuitOpenError`` or ``DeadlineExceeded`` when the
+        policy gives up before that.
+        """
+        if not self.breaker.allow():
+            metrics.inc("upstream_requests_total", upstream=self.name, outcome="circuit_open")
+            raise CircuitOpenError(f"{self.name} circuit is open")
+
+        # Admitted while half open, this call is the probe
+        probing = self.breaker.state == CircuitBreaker.HALF_OPEN
+        try:
+            return await self._get(client, url, **kwargs)
+        finally:
+            # Without a verdict (cancelled, out of quota, an unexpected error)
+            # the slot goes back for the next probe
+            if probing and self.breaker.state == CircuitBreaker.HALF_OPEN:
+                self.breaker.release()
+
+    async def _get(self, client: httpx.AsyncClient, url: str, **kwargs) -> httpx.Response:
+        deadline = time.monotonic() + self.deadline
+        response = error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                delay = self._delay(attempt - 1)
+                if time.monotonic() + delay >= deadline:
+                    break
+                metrics.inc("upstream_retries_total", upstream=self.name)
+                await asyncio.sleep(delay)
+            remaining = deadline - time.monotonic()
+            key_index = None
+            if self.scheduler is not None:
+                try:
+                    key, key_index = await self.scheduler.acquire(timeout=remaining)
+                except UpstreamUnavailable:
+                    # Our own quota, not an upstream failure: leave the breaker alone
+                    raise
+                kwargs["params"] = dict(kwargs.get("params") or {}, **{self.key_param: key})
+                remaining = deadline - time.monotonic()
+            try:
+                response = await asyncio.wait_for(client.get(url, **kwargs), timeout=remaining)
+                error = None
+            except asyncio.TimeoutError:
+                self.breaker.record_failure()
+                metrics.inc("upstream_requests_total", upstream=self.name, outcome="deadline")
+                raise DeadlineExceeded(f"{self.name} did not respond within {self.deadline}s")
+            except httpx.HTTPError as e:
+                response, error = None, e
+                continue
+            if response.status_code == 429 and key_index is not None:
+                self.scheduler.penalize(key_index, self._retry_after(response))
+            if response.status_code not in RETRY_STATUSES:
+                self.breaker.record_success()
+                metrics.inc("upstream_requests_total", upstream=self.name, outcome="ok")
+                return response
+
+        self.breaker.record_failure()
+        metrics.inc("upstream_requests_total", upstream=self.name, outcome="error")
+        if error is not None:
+            raise error
+        if response is None:
+            raise DeadlineExceeded(f"{self.name} did not respond within {self.deadline}s")
+        return response
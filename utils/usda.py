@@ -0,0 +1,92 @@
+import httpx
+import os
+from dotenv import load_dotenv
+from utils.ratelimit import PriorityScheduler
+from utils.upstream import CircuitBreaker, UpstreamPolicy
+
+load_dotenv()
+
+USDA_SEARCH_URL = "https://api.nal.usda.gov/fdc/v1/foods/search"
+USDA_FOOD_URL = "https://api.nal.usda.gov/fdc/v1/food"
+USDA_API_KEY = os.getenv("USDA_API_KEY")
+# Comma separated keys to spread lookups over; defaults to USDA_API_KEY
+USDA_API_KEYS = [key.strip() for key in os.getenv("USDA_API_KEYS", "").split(",") if key.strip()] or [USDA_API_KEY]
+
+# Connection pool and timeout settings for the shared USDA client
+USDA_MAX_CONNECTIONS = int(os.getenv("USDA_MAX_CONNECTIONS", "100"))
+USDA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("USDA_MAX_KEEPALIVE_CONNECTIONS", "20"))
+USDA_KEEPALIVE_EXPIRY = float(os.getenv("USDA_KEEPALIVE_EXPIRY", "30"))
+USDA_CONNECT_TIMEOUT = float(os.getenv("USDA_CONNECT_TIMEOUT", "5"))
+USDA_READ_TIMEOUT = float(os.getenv("USDA_READ_TIMEOUT", "10"))
+USDA_POOL_TIMEOUT = float(os.getenv("USDA_POOL_TIMEOUT", "5"))
+
+# Whole-call deadline, retries and circuit breaker (see utils.upstream)
+USDA_DEADLINE = float(os.getenv("USDA_DEADLINE", "8"))
+USDA_RETRIES = int(os.getenv("USDA_RETRIES", "2"))
+USDA_RETRY_BACKOFF = float(os.getenv("USDA_RETRY_BACKOFF", "0.1"))
+USDA_RETRY_BACKOFF_MAX = float(os.getenv("USDA_RETRY_BACKOFF_MAX", "1.0"))
+USDA_BREAKER_THRESHOLD = int(os.getenv("USDA_BREAKER_THRESHOLD", "5"))  # 0 disables the breaker
+USDA_BREAKER_RESET = float(os.getenv("USDA_BREAKER_RESET", "30"))
+
+# Client-side quota per key (see utils.ratelimit); USDA's default quota is 1000/hour, 0 disables
+USDA_RATE_LIMIT_PER_HOUR = float(os.getenv("USDA_RATE_LIMIT_PER_HOUR", "0"))
+USDA_RATE_LIMIT_BURST = float(os.getenv("USDA_RATE_LIMIT_BURST", "50"))
+USDA_BACKGROUND_RESERVE = float(os.getenv("USDA_BACKGROUND_RESERVE", "0.2"))  # share of the burst
+
+scheduler = PriorityScheduler(
+    USDA_API_KEYS,
+    rate_per_hour=USDA_RATE_LIMIT_PER_HOUR,
+    burst=USDA_RATE_LIMIT_BURST,
+    background_reserve=USDA_BACKGROUND_RESERVE,
+)
+
+policy = UpstreamPolicy(
+    "usda",
+    deadline=USDA_DEADLINE,
+    retries=USDA_RETRIES,
+    backoff=USDA_RETRY_BACKOFF,
+    backoff_max=USDA_RETRY_BACKOFF_MAX,
+    breaker=CircuitBreaker(failure_threshold=USDA_BREAKER_THRESHOLD, reset_timeout=USDA_BREAKER_RESET),
+    scheduler=scheduler,
+)
+
+_client = None
+
+
+def get_client():
+    """Return the process-wide USDA client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=USDA_MAX_CONNECTIONS,
+                max_keepalive_connections=USDA_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=USDA_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(
+                USDA_READ_TIMEOUT,
+                connect=USDA_CONNECT_TIMEOUT,
+                pool=USDA_POOL_TIMEOUT,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def search_foods(query: str, page_size: int = 20):
+    # The scheduler fills in api_key
+    params = {
+        "query": query,
+        "pageSize": page_size
+    }
+    return await policy.get(get_client(), USDA_SEARCH_URL, params=params)
+
+
+async def get_food(fdc_id):
+    return await policy.get(get_client(), f"{USDA_FOOD_URL}/{fdc_id}", params={})
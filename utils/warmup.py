@@ -0,0 +1,161 @@
+"""Cache warm-up for the most requested dishes.
+
+The top ``WARMUP_TOP_N`` dishes, taken from ``WARMUP_SEED_FILE`` (one dish
+per line, ``#`` comments allowed) followed by the most logged dish names,
+are resolved ahead of traffic: their USDA search results and details are
+fetched into ``utils.food_cache``, the best match is pre-scored and the
+per-100g nutrient table is parsed once, so the first real request for a
+popular dish is a cache hit end to end.
+
+With ``WARMUP_ENABLED=true`` the app runs this as a background task from
+its lifespan; startup does not wait for it. It can also be run on its own::
+
+    python -m utils.warmup --top 500
+
+which only benefits the app when the shared cache tier
+(``FOOD_CACHE_DB_ENABLED=true``) is on. Lookups run with background
+priority (see ``utils.ratelimit``) so they never take quota from users.
+"""
+import argparse
+import asyncio
+import os
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from models import MealEntry
+from utils import food_cache, lookup
+from utils.cache import MISSING
+from utils.ratelimit import background_priority
+
+load_dotenv()
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "false").lower() == "true"
+WARMUP_TOP_N = int(os.getenv("WARMUP_TOP_N", "200"))
+WARMUP_SEED_FILE = os.getenv("WARMUP_SEED_FILE")
+WARMUP_CONCURRENCY = int(os.getenv("WARMUP_CONCURRENCY", "4"))
+
+last_run = {}
+
+
+def read_seed_file(path: str) -> list:
+    with open(path) as fp:
+        lines = (line.strip() for line in fp)
+        return [line for line in lines if line and not line.startswith("#")]
+
+
+def popular_dishes(db: Session, limit: int) -> list:
+    """The most logged dish names, most frequent first."""
+    name = func.lower(func.trim(MealEntry.dish_name))
+    rows = db.execute(
+        select(name, func.count())
+        .group_by(name)
+        .order_by(func.count().desc(), name)
+        .limit(limit)
+    )
+    return [dish for dish, _ in rows]
+
+
+def dishes_to_warm(db: Session, limit: int = WARMUP_TOP_N, seed_file: str = WARMUP_SEED_FILE) -> list:
+    """Seed file dishes first, then the most logged ones, without duplicates."""
+    dishes = {}
+    if seed_file:
+        for dish in read_seed_file(seed_file):
+            dishes.setdefault(food_cache.normalize_query(dish), dish)
+    if len(dishes) < limit:
+        for dish in popular_dishes(db, limit):
+            dishes.setdefault(food_cache.normalize_query(dish), dish)
+    return list(dishes.values())[:limit]
+
+
+async def _is_warm(dish_name: str) -> bool:
+    best_food = food_cache.get_resolved(dish_name)
+    if best_food is MISSING or await food_cache.get_search(dish_name) is MISSING:
+        return False
+    return await food_cache.get_details(best_food["fdcId"]) is not MISSING
+
+
+async def warm_dish(dish_name: str, db: Session) -> str:
+    """Resolve one dish into the caches; returns how it went."""
+    if lookup.FOOD_DATA_SOURCE == "usda" and await _is_warm(dish_name):
+        return "skipped"
+    try:
+        best_food, food_details = await lookup.lookup_food(dish_name, db)
+        food_cache.get_table(best_food["fdcId"], food_details, lookup.parse_nutrients)
+    except HTTPException as e:
+        return "not_found" if e.status_code == 404 else "failed"
+    except Exception:
+        return "failed"
+    return "warmed"
+
+
+async def warm_up(dishes: list, session_factory, concurrency: int = WARMUP_CONCURRENCY) -> dict:
+    """Warm the caches for ``dishes``, at most ``concurrency`` at a time."""
+    counts = {"warmed": 0, "skipped": 0, "not_found": 0, "failed": 0}
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def warm(dish_name):
+        async with semaphore:
+            # A session per dish: the local mirror is queried from worker threads
+            db = session_factory()
+            try:
+                counts[await warm_dish(dish_name, db)] += 1
+            finally:
+                db.close()
+
+    with background_priority():
+        await asyncio.gather(*(warm(dish_name) for dish_name in dishes))
+    return counts
+
+
+async def run(session_factory, limit: int = WARMUP_TOP_N, seed_file: str = WARMUP_SEED_FILE,
+              concurrency: int = WARMUP_CONCURRENCY) -> dict:
+    """Pick the dishes to warm and warm them; the result is kept in ``last_run``."""
+    last_run.clear()
+    last_run["status"] = "running"
+
+    def pick():
+        db = session_factory()
+        try:
+            return dishes_to_warm(db, limit, seed_file)
+        finally:
+            db.close()
+
+    try:
+        dishes = await run_in_threadpool(pick)
+        last_run["dishes"] = len(dishes)
+        last_run.update(await warm_up(dishes, session_factory, concurrency))
+    except BaseException:
+        last_run["status"] = "failed"
+        raise
+    last_run["status"] = "done"
+    return dict(last_run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch and pre-score the most requested dishes")
+    parser.add_argument("--top", type=int, default=WARMUP_TOP_N, help="number of dishes to warm")
+    parser.add_argument("--seed-file", default=WARMUP_SEED_FILE, help="file with one dish per line")
+    parser.add_argument("--concurrency", type=int, default=WARMUP_CONCURRENCY)
+    args = parser.parse_args()
+
+    from database import Base, SessionLocal, engine
+    from utils import usda
+    if not food_cache.FOOD_CACHE_DB_ENABLED:
+        print("FOOD_CACHE_DB_ENABLED is off: warmed entries only live in this process")
+    Base.metadata.create_all(bind=engine)
+
+    async def warm():
+        try:
+            return await run(SessionLocal, args.top, args.seed_file, args.concurrency)
+        finally:
+            await usda.close_client()
+
+    result = asyncio.run(warm())
+    print(f"Warmed {result['warmed']} of {result['dishes']} dishes "
+          f"({result['skipped']} already cached, {result['not_found']} not found, {result['failed']} failed)")
+
+
+if __name__ == "__main__":
+    main()